@@ -0,0 +1,246 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import (
+    Counter,
+    defaultdict
+)
+from pathlib import Path
+
+from src.benchmark.library import (
+    build_library,
+    write_manifest
+)
+from src.benchmark.stub_tool import install_stub_tools
+
+REPOSITORY_ROOT = Path(__file__).resolve().parent.parent.parent
+STAGES = ("bootstrap", "scan", "prescan", "probe", "edit", "persist", "move")
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.busy = defaultdict(float)
+        self.calls = Counter()
+        self.queries = Counter()
+
+    @contextlib.contextmanager
+    def measure(self, stage):
+        previous_stage = getattr(self.local, "stage", None)
+        self.local.stage = stage
+        started = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.local.stage = previous_stage
+            with self.lock:
+                self.busy[stage] += elapsed
+                self.calls[stage] += 1
+
+    def count_query(self, *args):
+        with self.lock:
+            self.queries[getattr(self.local, "stage", None) or "other"] += 1
+
+
+def configure_environment(workdir, folders, arguments):
+    bin_folder = workdir / "bin"
+    install_stub_tools(bin_folder, REPOSITORY_ROOT)
+
+    # Set before any application module loads, since configuration is read once and cached
+    os.environ.update({
+        "PATH": f"{bin_folder}{os.pathsep}{os.environ.get('PATH', '')}",
+        "ENV": arguments.schema,
+        "DATABASE": arguments.database or f"sqlite:///{workdir / 'media.db'}",
+        "STATE_FOLDER": str(workdir / "state"),
+        "DECISIONS_FILE": str(workdir / "state" / "decisions.json"),
+        "METRICS_EVENTS_FILE": str(workdir / "state" / "events.jsonl"),
+        "METRICS_TEXTFILE": str(workdir / "state" / "media_analyser.prom"),
+        "METRICS_SUMMARY_FILE": str(workdir / "state" / "run_summary.json"),
+        "BENCHMARK_MANIFEST": str(workdir / "manifest.json"),
+        "BENCHMARK_CALL_LOG": str(workdir / "calls.log"),
+        "BENCHMARK_LATENCY": str(arguments.latency),
+        **{key.upper(): str(folder) for key, folder in folders.items()}
+    })
+
+    for tool_latency in arguments.tool_latency:
+        tool, seconds = tool_latency.split("=", 1)
+        os.environ[f"BENCHMARK_LATENCY_{tool.upper().replace('-', '_')}"] = seconds
+
+
+def run_benchmark(workdir, folders, metrics):
+    # Imported only now so every module sees the benchmark environment
+    from sqlalchemy import event, text
+
+    from src.common.metrics import (
+        build_summary,
+        write_run_metrics
+    )
+    from src.infrastructure.connection import get_engine, is_sqlite
+    from src.infrastructure.infrastructure import ensure_infrastructure
+    from src.main import (
+        collect_process_queue,
+        process_batch
+    )
+    from src.processor.pipeline import Pipeline
+
+    class TimedPipeline(Pipeline):
+        def run_stage(self, stage, file_path, *args):
+            with metrics.measure(stage):
+                return super().run_stage(stage, file_path, *args)
+
+    engine = get_engine()
+    event.listen(engine, "before_cursor_execute", metrics.count_query)
+
+    schema = os.environ["ENV"]
+    if not is_sqlite(os.environ["DATABASE"]):
+        # A previous run's rows would turn every insert into a conflict, so the schema starts empty
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+
+    started = time.perf_counter()
+
+    with metrics.measure("bootstrap"):
+        ensure_infrastructure()
+
+    with metrics.measure("scan"):
+        process_queue = collect_process_queue(list(folders.values()))
+
+    # The real batch path, ordering and resume handling included; only the stages are timed from here
+    process_batch(process_queue, interactive=False, pipeline_class=TimedPipeline)
+
+    prescan = build_summary()["timings"].get("stage_seconds", {}).get("stage=prescan")
+    if prescan:
+        metrics.busy["prescan"] += prescan["seconds"]
+        metrics.calls["prescan"] += prescan["count"]
+
+    elapsed = time.perf_counter() - started
+    write_run_metrics()
+
+    if not is_sqlite(os.environ["DATABASE"]):
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+
+    return len(process_queue), elapsed
+
+
+def read_call_log(call_log):
+    calls, seconds = Counter(), defaultdict(float)
+
+    if call_log.exists():
+        with open(call_log, mode="r") as file:
+            for line in file:
+                mode, elapsed = line.rstrip("\n").split("\t")
+                calls[mode] += 1
+                seconds[mode] += float(elapsed)
+
+    return calls, seconds
+
+
+def build_report(file_count, queued, moved, elapsed, metrics, tool_calls, tool_seconds):
+    per_file = max(file_count, 1)
+
+    return {
+        "files": file_count,
+        "queued": queued,
+        "moved": moved,
+        "wall_seconds": round(elapsed, 3),
+        "files_per_hour": round(moved / elapsed * 3600, 1) if elapsed else None,
+        "stages": {
+            stage: {
+                "calls": metrics.calls[stage],
+                "busy_seconds": round(metrics.busy[stage], 3),
+                "ms_per_call": round(metrics.busy[stage] / metrics.calls[stage] * 1000, 2) if metrics.calls[stage] else None,
+                "db_round_trips": metrics.queries[stage]
+            }
+            for stage in STAGES
+        },
+        "subprocesses": {
+            mode: {
+                "calls": count,
+                "per_file": round(count / per_file, 2),
+                "seconds": round(tool_seconds[mode], 3)
+            }
+            for mode, count in sorted(tool_calls.items())
+        },
+        "subprocesses_per_file": round(sum(tool_calls.values()) / per_file, 2),
+        "db_round_trips_per_file": round(sum(metrics.queries.values()) / per_file, 2)
+    }
+
+
+def print_report(report):
+    print(f"{report['moved']} of {report['files']} files processed in {report['wall_seconds']}s ({report['files_per_hour']} files/hour)")
+    print(f"{'Stage':<10}{'Calls':>8}{'Busy (s)':>12}{'ms/call':>10}{'DB trips':>10}")
+    for stage, values in report["stages"].items():
+        ms_per_call = f"{values['ms_per_call']:.2f}" if values["ms_per_call"] is not None else "-"
+        print(f"{stage:<10}{values['calls']:>8}{values['busy_seconds']:>12.3f}{ms_per_call:>10}{values['db_round_trips']:>10}")
+
+    for mode, values in report["subprocesses"].items():
+        print(f"Subprocess {mode}: {values['calls']} calls, {values['per_file']} per file, {values['seconds']}s")
+    print(f"Per file: {report['subprocesses_per_file']} subprocesses, {report['db_round_trips_per_file']} DB round trips")
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Benchmark the processing pipeline on a synthetic library with stub media tools")
+    parser.add_argument("--files", type=int, default=240, help="number of synthetic files to generate")
+    parser.add_argument("--file-size", type=int, default=1, help="size of each synthetic file in MiB")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds every stub tool waits before answering")
+    parser.add_argument(
+        "--tool-latency",
+        action="append",
+        default=[],
+        help="per-tool latency as NAME=SECONDS, e.g. mkvmerge-remux=2.5 (mediainfo, mkvmerge-identify, mkvmerge-remux, mkvpropedit, ffprobe)"
+    )
+    parser.add_argument("--database", help="database URL; defaults to a SQLite file inside the work folder")
+    parser.add_argument("--schema", default="benchmark", help="schema for the run; on Postgres it is dropped before and after")
+    parser.add_argument("--workdir", help="folder for the synthetic library; defaults to a temporary folder")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary work folder after the run")
+    parser.add_argument("--json", help="also write the report to this path")
+    parser.add_argument("--verbose", action="store_true", help="show the pipeline's own output")
+
+    arguments = parser.parse_args()
+    if not arguments.schema.startswith("benchmark"):
+        parser.error("--schema must start with 'benchmark', since it is dropped")
+
+    return arguments
+
+
+def main():
+    arguments = parse_arguments()
+    workdir = Path(arguments.workdir or tempfile.mkdtemp(prefix="media-analyser-benchmark-")).resolve()
+    workdir.mkdir(parents=True, exist_ok=True)
+
+    try:
+        folders, manifest = build_library(workdir, arguments.files, arguments.file_size * 1024 * 1024)
+        write_manifest(workdir / "manifest.json", manifest)
+        configure_environment(workdir, folders, arguments)
+
+        metrics = Metrics()
+        output = contextlib.nullcontext() if arguments.verbose else contextlib.redirect_stdout(io.StringIO())
+        with output:
+            queued, elapsed = run_benchmark(workdir, folders, metrics)
+
+        moved = sum(1 for _ in (workdir / "Plex").rglob("*.mkv"))
+        tool_calls, tool_seconds = read_call_log(workdir / "calls.log")
+        report = build_report(len(manifest), queued, moved, elapsed, metrics, tool_calls, tool_seconds)
+
+        print_report(report)
+        if arguments.json:
+            with open(arguments.json, mode="w") as file:
+                json.dump(report, file, indent=4)
+    finally:
+        # Only a temporary folder is removed; one given with --workdir belongs to the caller
+        if not arguments.keep and not arguments.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
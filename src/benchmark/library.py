@@ -0,0 +1,55 @@
+import json
+from pathlib import Path
+
+# Each layout mirrors a processing folder and the naming build_media_record parses for it
+LAYOUTS = [
+    ("Show/{content}/Season 1/[Netflix] {content} - S01E{episode:02d}.mkv", "show"),
+    ("Show/{content}/Specials/[Netflix] {content} - S00E{episode:02d}.mkv", "show_remux"),
+    ("Cartoon/{content}/Season 1/[Netflix] {content} - S01E{episode:02d}.mkv", "show"),
+    ("Anime/Show/{content}/Season 1/[Crunchyroll] {content} - S01E{episode:02d}.mkv", "anime"),
+    ("Movie/[Netflix] {serial:04d} - {content}.mkv", "movie_no_duration"),
+    ("Anime/Movie/[Crunchyroll] {serial:04d} - {content}.mkv", "anime")
+]
+FOLDERS = {
+    "processing_show_folder": "Show",
+    "processing_cartoon_folder": "Cartoon",
+    "processing_anime_show_folder": "Anime/Show",
+    "processing_movie_folder": "Movie",
+    "processing_anime_movie_folder": "Anime/Movie"
+}
+EPISODES_PER_CONTENT = 12
+PLACEHOLDER_HEADER = b"media_analyser benchmark placeholder\n"
+
+
+def build_library(root, file_count, file_size):
+    processing_root = Path(root) / "Processing"
+    manifest = {}
+
+    for index in range(file_count):
+        layout = index % len(LAYOUTS)
+        pattern, profile = LAYOUTS[layout]
+        serial = index // len(LAYOUTS)
+        content = f"Benchmark {layout}-{serial // EPISODES_PER_CONTENT:03d}"
+        file_path = processing_root / pattern.format(content=content, episode=serial % EPISODES_PER_CONTENT + 1, serial=serial)
+
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        write_placeholder(file_path, file_size)
+        manifest[file_path.name] = profile
+
+    (Path(root) / "Plex").mkdir(exist_ok=True)
+
+    return {key: processing_root / folder for key, folder in FOLDERS.items()}, manifest
+
+
+def write_placeholder(file_path, file_size):
+    # Not Matroska on purpose, so every probe goes through the stub tools; the rest stays sparse
+    # The name makes each file's content unique, or every one would fingerprint as a duplicate
+    header = PLACEHOLDER_HEADER + file_path.name.encode() + b"\n"
+    with open(file_path, mode="wb") as file:
+        file.write(header)
+        file.truncate(max(file_size, len(header)))
+
+
+def write_manifest(path, manifest):
+    with open(path, mode="w") as file:
+        json.dump(manifest, file)
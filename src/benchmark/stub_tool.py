@@ -0,0 +1,117 @@
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+RECORDINGS_FOLDER = Path(__file__).resolve().parent / "json"
+STUB_TOOLS = ("mediainfo", "mkvmerge", "mkvpropedit", "ffprobe")
+
+
+def main(tool, arguments):
+    started = time.perf_counter()
+    mode = get_mode(tool, arguments)
+    time.sleep(get_latency(mode))
+
+    code = RUNNERS[mode](arguments)
+
+    log_call(mode, time.perf_counter() - started)
+    return code
+
+
+def get_mode(tool, arguments):
+    if tool == "mkvmerge":
+        return "mkvmerge-remux" if "-o" in arguments else "mkvmerge-identify"
+
+    return tool
+
+
+def get_latency(mode):
+    key = mode.upper().replace("-", "_")
+    return float(os.environ.get(f"BENCHMARK_LATENCY_{key}", os.environ.get("BENCHMARK_LATENCY", "0")))
+
+
+def log_call(mode, seconds):
+    call_log = os.environ.get("BENCHMARK_CALL_LOG")
+    if not call_log:
+        return
+
+    # A single short O_APPEND write, so concurrent stubs never interleave their lines
+    with open(call_log, mode="a") as file:
+        file.write(f"{mode}\t{seconds:.6f}\n")
+
+
+def load_recording(file_path):
+    name = Path(file_path).name.removeprefix(".partial-")
+
+    with open(os.environ["BENCHMARK_MANIFEST"], mode="r") as file:
+        profile = json.load(file)[name]
+
+    with open(RECORDINGS_FOLDER / f"{profile}.json", mode="r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def run_media_info(arguments):
+    file_path = arguments[-1]
+    media_info = load_recording(file_path)["mediainfo"]
+
+    media_info["media"]["@ref"] = file_path
+    for track in media_info["media"]["track"]:
+        if track["@type"] == "General":
+            track["FileSize"] = str(os.path.getsize(file_path))
+
+    print(json.dumps(media_info))
+    return 0
+
+
+def run_mkvmerge_identify(arguments):
+    file_path = arguments[-1]
+    track_list = load_recording(file_path)["mkvmerge"]
+    track_list["file_name"] = file_path
+
+    print(json.dumps(track_list))
+    return 0
+
+
+def run_mkvmerge_remux(arguments):
+    # The output only has to exist with a realistic size; its content is never inspected
+    shutil.copyfile(arguments[-1], arguments[arguments.index("-o") + 1])
+    print("Multiplexing took 0 seconds.")
+    return 0
+
+
+def run_mkvpropedit(arguments):
+    # A header edit rewrites the file in place, which is what invalidates cached probes
+    os.utime(arguments[0])
+    print("Done.")
+    return 0
+
+
+def run_ffprobe(arguments):
+    print(json.dumps(load_recording(arguments[-1])["ffprobe"]))
+    return 0
+
+
+RUNNERS = {
+    "mediainfo": run_media_info,
+    "mkvmerge-identify": run_mkvmerge_identify,
+    "mkvmerge-remux": run_mkvmerge_remux,
+    "mkvpropedit": run_mkvpropedit,
+    "ffprobe": run_ffprobe
+}
+
+
+def install_stub_tools(bin_folder, repository_root):
+    bin_folder.mkdir(parents=True, exist_ok=True)
+
+    for tool in STUB_TOOLS:
+        stub_path = bin_folder / tool
+        stub_path.write_text(
+            f"#!{sys.executable}\n"
+            "import sys\n"
+            f"sys.path.insert(0, {str(repository_root)!r})\n"
+            "from src.benchmark.stub_tool import main\n"
+            f"sys.exit(main({tool!r}, sys.argv[1:]))\n"
+        )
+        stub_path.chmod(0o755)
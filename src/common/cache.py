@@ -0,0 +1,229 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from src.common.configuration import (
+    get_int_configuration,
+    get_state_folder
+)
+from src.common.metrics import (
+    increment,
+    timed
+)
+
+EVICTION_INTERVAL = 100
+
+_lock = threading.Lock()
+_connection = None
+_memory = OrderedDict()
+_stores_since_eviction = 0
+
+
+@lru_cache(maxsize=None)
+def get_max_entries():
+    return get_int_configuration("probe_cache_max_entries", 50000)
+
+
+def get_connection():
+    global _connection
+
+    if _connection is None:
+        _connection = sqlite3.connect(get_state_folder() / "probe_cache.db", check_same_thread=False)
+        _connection.execute("PRAGMA journal_mode=WAL")
+        _connection.execute("PRAGMA synchronous=NORMAL")
+        _connection.execute("""
+            CREATE TABLE IF NOT EXISTS probe_cache (
+                tool TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                result TEXT NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (tool, path)
+            )
+        """)
+        _connection.execute("CREATE INDEX IF NOT EXISTS ix_probe_cache_last_access ON probe_cache (last_access)")
+        _connection.commit()
+
+    return _connection
+
+
+def file_fingerprint(file_path):
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+
+def cached_probe(tool, file_path, runner, parse=None, memory=True):
+    path = os.path.abspath(str(file_path))
+
+    try:
+        fingerprint = file_fingerprint(path)
+    except OSError:
+        return parse_result(runner(file_path), parse)
+
+    cached = lookup(tool, path, fingerprint, parse, memory)
+    if cached is not None:
+        increment("probe_cache_total", tool=tool, result="hit")
+        return cached
+
+    increment("probe_cache_total", tool=tool, result="miss")
+    with timed("probe_seconds", tool=tool):
+        result = runner(file_path)
+
+    # Failed probes return an empty payload; keep them out so the next call retries the tool
+    if result:
+        return store(tool, path, fingerprint, result, parse, memory)
+
+    return parse_result(result, parse)
+
+
+async def async_cached_probe(tool, file_path, runner, parse=None):
+    path = os.path.abspath(str(file_path))
+
+    try:
+        fingerprint = file_fingerprint(path)
+    except OSError:
+        return parse_result(await runner(file_path), parse)
+
+    cached = lookup(tool, path, fingerprint, parse)
+    if cached is not None:
+        increment("probe_cache_total", tool=tool, result="hit")
+        return cached
+
+    increment("probe_cache_total", tool=tool, result="miss")
+    with timed("probe_seconds", tool=tool):
+        result = await runner(file_path)
+
+    if result:
+        return store(tool, path, fingerprint, result, parse)
+
+    return parse_result(result, parse)
+
+
+def cached_view(tool, file_path, view, build):
+    path = os.path.abspath(str(file_path))
+
+    try:
+        fingerprint = file_fingerprint(path)
+    except OSError:
+        return build()
+
+    # Views derived from a tool's output live in memory only, next to it and keyed on the same file state
+    memory_key = (tool, path, view)
+    with _lock:
+        entry = _memory.get(memory_key)
+        if entry and entry[0] == fingerprint:
+            _memory.move_to_end(memory_key)
+            return entry[1]
+
+    result = build()
+
+    with _lock:
+        remember(memory_key, fingerprint, result)
+
+    return result
+
+
+def parse_result(result, parse):
+    # The database keeps the tool's raw output; memory keeps the parsed form callers actually use
+    return parse(result) if parse else result
+
+
+def lookup(tool, path, fingerprint, parse=None, memory=True):
+    memory_key = (tool, path)
+
+    with _lock:
+        entry = _memory.get(memory_key) if memory else None
+        if entry and entry[0] == fingerprint:
+            _memory.move_to_end(memory_key)
+            return entry[1]
+
+        connection = get_connection()
+        row = connection.execute(
+            "SELECT size, mtime_ns, inode, result FROM probe_cache WHERE tool = ? AND path = ?",
+            (tool, path)
+        ).fetchone()
+
+        if not row:
+            return None
+
+        if tuple(row[:3]) != fingerprint:
+            connection.execute("DELETE FROM probe_cache WHERE tool = ? AND path = ?", (tool, path))
+            connection.commit()
+            _memory.pop(memory_key, None)
+            return None
+
+        connection.execute(
+            "UPDATE probe_cache SET last_access = ? WHERE tool = ? AND path = ?",
+            (time.time(), tool, path)
+        )
+        connection.commit()
+
+        result = parse_result(json.loads(row[3]), parse)
+        if memory:
+            remember(memory_key, fingerprint, result)
+
+        return result
+
+
+def store(tool, path, fingerprint, result, parse=None, memory=True):
+    global _stores_since_eviction
+    parsed = parse_result(result, parse)
+
+    with _lock:
+        connection = get_connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO probe_cache (tool, path, size, mtime_ns, inode, result, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (tool, path, *fingerprint, json.dumps(result), time.time())
+        )
+        connection.commit()
+        if memory:
+            remember((tool, path), fingerprint, parsed)
+
+        _stores_since_eviction += 1
+        if _stores_since_eviction >= EVICTION_INTERVAL:
+            _stores_since_eviction = 0
+            evict(connection)
+
+    return parsed
+
+
+def remember(memory_key, fingerprint, result):
+    _memory[memory_key] = (fingerprint, result)
+    _memory.move_to_end(memory_key)
+
+    while len(_memory) > get_max_entries():
+        _memory.popitem(last=False)
+
+
+def evict(connection):
+    max_entries = get_max_entries()
+    count = connection.execute("SELECT COUNT(*) FROM probe_cache").fetchone()[0]
+
+    if count <= max_entries:
+        return
+
+    connection.execute(
+        "DELETE FROM probe_cache WHERE rowid IN "
+        "(SELECT rowid FROM probe_cache ORDER BY last_access ASC LIMIT ?)",
+        (count - max_entries,)
+    )
+    connection.commit()
+
+
+def invalidate(file_path):
+    path = os.path.abspath(str(file_path))
+
+    with _lock:
+        connection = get_connection()
+        connection.execute("DELETE FROM probe_cache WHERE path = ?", (path,))
+        connection.commit()
+
+        for key in [key for key in _memory if key[1] == path]:
+            del _memory[key]
@@ -1,5 +1,20 @@
+import asyncio
 import subprocess
 import json
+import struct
+
+from src.common.cache import (
+    cached_probe,
+    cached_view,
+    async_cached_probe
+)
+from src.common.metrics import log_event
+from src.common.matroska import (
+    read_matroska,
+    to_media_info,
+    to_mkvmerge_identify
+)
+from src.common.probe import parse_media_info
 
 
 LANGUAGES = {
@@ -27,11 +42,24 @@ ISO_639_2 = {
 LANGUAGE_MAP = {alias.lower(): lang for lang, aliases in LANGUAGES.items() for alias in aliases}
 ISO_639_2_MAP = {lang.lower(): codes[0] for lang, codes in ISO_639_2.items()}
 
+# Fields each consumer needs per track type; the native reader falls back to mediainfo when one is missing.
+# BitRate_Mode and FrameRate_Mode are nullable and only mediainfo reports them, so they are stored when it ran
+TRACK_LIST_FIELDS = {
+    "Audio": ("UniqueID",),
+    "Text": ("UniqueID", "FrameCount")
+}
+MEDIA_RECORD_FIELDS = {
+    "General": ("FileSize", "FileExtension", "OverallBitRate"),
+    "Video": ("Format", "Duration", "Width", "Height", "FrameRate", "BitDepth"),
+    "Audio": ("Format", "Channels")
+}
+
 CODEC_MAP = {
     "H264": ["avc", "h264", "h.264", "h264", "avc"],
     "H265": ["h265", "hevc", "h.265", "hevc"],
     "AV1": ["av1"]
 }
+CODEC_SYNONYM_MAP = {synonym.lower(): codec for codec, synonyms in CODEC_MAP.items() for synonym in synonyms}
 
 def detect_iso_language_code(language):
     return ISO_639_2_MAP.get(language.lower(), "und")
@@ -43,16 +71,66 @@ def detect_language(lang_code):
 
 
 def normalize_codec(codec):
-    codec_lower = codec.lower() if codec else ""
+    return CODEC_SYNONYM_MAP.get(codec.lower() if codec else "", "Unknown")
+
+
+def read_media_probe(file_path, required_fields):
+    return read_native_media_probe(file_path, required_fields) or run_media_info(file_path)
+
+
+def read_native_media_probe(file_path, required_fields):
+    # Each stage asks again for the same file; the parsed probe is reused until the file changes
+    return cached_view(
+        "matroska",
+        file_path,
+        tuple(required_fields.items()),
+        lambda: complete_native_media_info(run_matroska_reader(file_path), file_path, required_fields)
+    )
+
+
+def complete_native_media_info(parsed, file_path, required_fields):
+    if not parsed:
+        return None
+
+    media_info = to_media_info(parsed, file_path)
+    tracks = media_info["media"]["track"]
+
+    if all(field in track for track in tracks for field in required_fields.get(track["@type"], ())):
+        return parse_media_info(media_info)
+
+    return None
+
 
-    for normalized_codec, synonyms in CODEC_MAP.items():
-        if codec_lower in map(str.lower, synonyms):
-            return normalized_codec
+def read_track_list(file_path):
+    track_list = cached_view("matroska", file_path, "track_list", lambda: read_native_track_list(file_path))
 
-    return "Unknown"
+    return track_list or run_mkvmerge_identify(file_path)
+
+
+def read_native_track_list(file_path):
+    parsed = run_matroska_reader(file_path)
+
+    return to_mkvmerge_identify(parsed) if parsed else None
+
+
+def run_matroska_reader(file_path):
+    # Only the views built from it stay in memory; the raw header dump is read back from disk when a new view needs it
+    return cached_probe("matroska", file_path, execute_matroska_reader, memory=False)
 
 
 def run_media_info(file_path):
+    return cached_probe("mediainfo", file_path, execute_media_info, parse=parse_media_info)
+
+
+def run_ffprobe(file_path):
+    return cached_probe("ffprobe", file_path, execute_ffprobe)
+
+
+def run_mkvmerge_identify(file_path):
+    return cached_probe("mkvmerge", file_path, execute_mkvmerge_identify)
+
+
+def execute_media_info(file_path):
     result = subprocess.run([
         "mediainfo", "--Language=raw", "--Output=JSON", file_path
     ], capture_output=True, text=True)
@@ -62,7 +140,7 @@ def run_media_info(file_path):
     return json_result
 
 
-def run_ffprobe(file_path):
+def execute_ffprobe(file_path):
     result = subprocess.run(
         [
             "ffprobe", "-v", "error", "-show_entries", "format=duration",
@@ -74,3 +152,63 @@ def run_ffprobe(file_path):
     json_result = json.loads(result.stdout) if result.stdout else {}
 
     return json_result
+
+
+def execute_mkvmerge_identify(file_path):
+    result = subprocess.run(["mkvmerge", "-J", str(file_path)], capture_output=True, text=True)
+
+    if result.returncode != 0:
+        log_event("probe_failed", f"Error processing {file_path}: {result.stderr}", file=str(file_path), tool="mkvmerge")
+        return {}
+
+    json_result = json.loads(result.stdout) if result.stdout else {}
+
+    return json_result
+
+
+def execute_matroska_reader(file_path):
+    try:
+        return read_matroska(file_path) or {}
+    except (OSError, ValueError, IndexError, struct.error) as e:
+        log_event("native_probe_fallback", f"Falling back to external tools for {file_path}: {e}", file=str(file_path), error=str(e))
+        return {}
+
+
+async def async_read_media_probe(file_path, required_fields):
+    media_probe = await asyncio.to_thread(read_native_media_probe, file_path, required_fields)
+
+    return media_probe or await async_run_media_info(file_path)
+
+
+async def async_run_media_info(file_path):
+    return await async_cached_probe("mediainfo", file_path, async_execute_media_info, parse=parse_media_info)
+
+
+async def async_run_ffprobe(file_path):
+    return await async_cached_probe("ffprobe", file_path, async_execute_ffprobe)
+
+
+async def async_execute_media_info(file_path):
+    stdout, _, _ = await async_execute(["mediainfo", "--Language=raw", "--Output=JSON", str(file_path)])
+
+    return json.loads(stdout) if stdout else {}
+
+
+async def async_execute_ffprobe(file_path):
+    stdout, _, _ = await async_execute([
+        "ffprobe", "-v", "error", "-show_entries", "format=duration",
+        "-of", "json", str(file_path)
+    ])
+
+    return json.loads(stdout) if stdout else {}
+
+
+async def async_execute(cmd):
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+
+    return stdout.decode(), stderr.decode(), process.returncode
@@ -1,19 +1,40 @@
 import os
 import platform
+from functools import lru_cache
 from dotenv import load_dotenv
 from pathlib import Path
 
 
-def get_configuration(key):
+@lru_cache(maxsize=None)
+def load_configuration():
     env_path = Path(__file__).resolve().parent.parent.parent / 'config.env'
     load_dotenv(dotenv_path=env_path)
-    value = os.getenv(key.upper())
+    system = platform.system()
+    instance = os.getenv("INSTANCE")
 
-    if "localhost" in value:
-        if platform.system() == "Windows":
-            return value
-        elif platform.system() == "Darwin":
-            instance = os.getenv("INSTANCE")
-            return value.replace("localhost", instance)
+    return {key: resolve_value(value, system, instance) for key, value in os.environ.items()}
 
-    return value
\ No newline at end of file
+
+def resolve_value(value, system, instance):
+    if "localhost" in value and system == "Darwin":
+        return value.replace("localhost", instance)
+
+    return value
+
+
+def get_configuration(key, default=None):
+    return load_configuration().get(key.upper(), default)
+
+
+def get_int_configuration(key, default):
+    return int(get_configuration(key, default))
+
+
+def get_float_configuration(key, default):
+    return float(get_configuration(key, default))
+
+
+def get_state_folder():
+    folder = Path(get_configuration("state_folder", "./.state")).expanduser()
+    folder.mkdir(parents=True, exist_ok=True)
+    return folder
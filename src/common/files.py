@@ -0,0 +1,114 @@
+import errno
+import os
+import shutil
+
+COPY_CHUNK_SIZE = 64 * 1024 * 1024
+FALLBACK_ERRORS = (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF)
+
+
+def staging_path(destination):
+    # Dot-prefixed so folder scans skip it, and the extension is kept for the probes that run on it
+    return destination.with_name(f".partial-{destination.name}")
+
+
+def same_device(source, destination_folder):
+    return os.stat(source).st_dev == os.stat(destination_folder).st_dev
+
+
+def move_file(source, destination, scheduler=None):
+    destination.parent.mkdir(parents=True, exist_ok=True)
+
+    if same_device(source, destination.parent):
+        os.rename(source, destination)
+        return "rename"
+
+    if scheduler is None:
+        copy_file_atomically(source, destination)
+    else:
+        with scheduler.reserve([source, destination.parent], os.stat(source).st_size) as throttle:
+            copy_file_atomically(source, destination, throttle)
+    os.remove(source)
+    return "copy"
+
+
+def copy_file_atomically(source, destination, throttle=None):
+    temp_destination = staging_path(destination)
+    try:
+        copy_file(source, temp_destination, throttle)
+        shutil.copystat(source, temp_destination)
+        os.replace(temp_destination, destination)
+    except BaseException:
+        if temp_destination.exists():
+            temp_destination.unlink()
+        raise
+
+
+def copy_file(source, destination, throttle=None):
+    with open(source, "rb") as source_file, open(destination, "wb") as destination_file:
+        size = os.fstat(source_file.fileno()).st_size
+        source_fd, destination_fd = source_file.fileno(), destination_file.fileno()
+
+        copied = copy_with_copy_file_range(source_fd, destination_fd, size, throttle)
+        if copied < size:
+            copied += copy_with_sendfile(source_fd, destination_fd, copied, size, throttle)
+        if copied < size:
+            copy_with_buffer(source_file, destination_file, copied, throttle)
+
+        destination_file.flush()
+        os.fsync(destination_fd)
+
+
+def copy_with_copy_file_range(source_fd, destination_fd, size, throttle=None):
+    # Lets NFS 4.2 / SMB servers copy server-side instead of pulling the data through this host
+    if not hasattr(os, "copy_file_range"):
+        return 0
+
+    copied = 0
+    while copied < size:
+        try:
+            count = os.copy_file_range(source_fd, destination_fd, min(COPY_CHUNK_SIZE, size - copied))
+        except OSError as e:
+            if e.errno in FALLBACK_ERRORS:
+                break
+            raise
+
+        if count == 0:
+            break
+        copied += count
+        if throttle:
+            throttle(count)
+
+    return copied
+
+
+def copy_with_sendfile(source_fd, destination_fd, offset, size, throttle=None):
+    copied = 0
+    os.lseek(destination_fd, offset, os.SEEK_SET)
+
+    while offset + copied < size:
+        try:
+            count = os.sendfile(destination_fd, source_fd, offset + copied, min(COPY_CHUNK_SIZE, size - offset - copied))
+        except OSError as e:
+            if e.errno in FALLBACK_ERRORS:
+                break
+            raise
+
+        if count == 0:
+            break
+        copied += count
+        if throttle:
+            throttle(count)
+
+    return copied
+
+
+def copy_with_buffer(source_file, destination_file, offset, throttle=None):
+    source_file.seek(offset)
+    destination_file.seek(offset)
+    if not throttle:
+        shutil.copyfileobj(source_file, destination_file, COPY_CHUNK_SIZE)
+        return
+
+    while chunk := source_file.read(COPY_CHUNK_SIZE):
+        destination_file.write(chunk)
+        throttle(len(chunk))
@@ -0,0 +1,35 @@
+import hashlib
+import os
+
+from src.common.cache import cached_probe
+
+SAMPLE_SIZE = 512 * 1024
+SAMPLE_COUNT = 6
+
+
+def sample_offsets(file_size):
+    if file_size <= SAMPLE_SIZE * SAMPLE_COUNT:
+        return range(0, file_size, SAMPLE_SIZE)
+
+    # Head and tail, plus evenly spaced blocks in between
+    step = (file_size - SAMPLE_SIZE) / (SAMPLE_COUNT - 1)
+    return [round(index * step) for index in range(SAMPLE_COUNT)]
+
+
+def compute_content_fingerprint(file_path):
+    # pread instead of mmap, since mapping files on NFS/SMB mounts faults in far more than the samples
+    fd = os.open(file_path, os.O_RDONLY)
+    try:
+        file_size = os.fstat(fd).st_size
+        digest = hashlib.blake2b(file_size.to_bytes(8, "big"), digest_size=16)
+
+        for offset in sample_offsets(file_size):
+            digest.update(os.pread(fd, SAMPLE_SIZE, offset))
+    finally:
+        os.close(fd)
+
+    return {"fingerprint": digest.hexdigest()}
+
+
+def read_content_fingerprint(file_path):
+    return cached_probe("content_fingerprint", file_path, compute_content_fingerprint).get("fingerprint")
@@ -0,0 +1,121 @@
+import itertools
+import os
+import shutil
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import (
+    lru_cache,
+    partial
+)
+
+from src.common.configuration import get_int_configuration
+from src.common.metrics import (
+    add_gauge,
+    observe
+)
+
+
+class InsufficientSpace(OSError):
+    pass
+
+
+class IoScheduler:
+    def __init__(self, concurrency, bandwidth=0, free_space_margin=0):
+        self.concurrency = max(1, concurrency)
+        self.bandwidth = max(0, bandwidth)
+        self.free_space_margin = max(0, free_space_margin)
+        self.condition = threading.Condition()
+        self.sequence = itertools.count()
+        self.active = Counter()
+        self.reserved_space = Counter()
+        self.waiting = []
+        self.budget_lock = threading.Lock()
+        self.next_free = {}
+
+    @contextmanager
+    def reserve(self, paths, size, space_folder=None):
+        # Disks behind one mount slow down together, so jobs are limited per device rather than per folder
+        devices = frozenset(os.stat(path).st_dev for path in paths)
+        space_device = os.stat(space_folder).st_dev if space_folder else None
+        entry = (size, next(self.sequence), devices)
+        started = time.perf_counter()
+
+        with self.condition:
+            self.waiting.append(entry)
+            add_gauge("io_jobs_waiting", 1)
+            try:
+                self.condition.wait_for(lambda: self.can_start(entry))
+            finally:
+                self.waiting.remove(entry)
+                add_gauge("io_jobs_waiting", -1)
+                self.condition.notify_all()
+
+            if space_device is not None:
+                self.check_free_space(space_folder, space_device, size)
+                self.reserved_space[space_device] += size
+            for device in devices:
+                self.active[device] += 1
+
+        observe("io_wait_seconds", time.perf_counter() - started)
+        try:
+            yield partial(self.throttle, devices)
+        finally:
+            with self.condition:
+                for device in devices:
+                    self.active[device] -= 1
+                if space_device is not None:
+                    self.reserved_space[space_device] -= size
+                self.condition.notify_all()
+
+    def can_start(self, entry):
+        size, sequence, devices = entry
+        if any(self.active[device] >= self.concurrency for device in devices):
+            return False
+
+        # Smallest first among jobs sharing a device, so a short episode never queues behind a 60 GB movie
+        return not any(other[:2] < (size, sequence) and other[2] & devices for other in self.waiting)
+
+    def check_free_space(self, folder, device, size):
+        # Space promised to remuxes still running on the device is not free yet
+        available = shutil.disk_usage(folder).free - self.reserved_space[device]
+        if available < size + self.free_space_margin:
+            raise InsufficientSpace(
+                f"{folder} has {available} bytes available, {size + self.free_space_margin} are needed"
+            )
+
+    def throttle(self, devices, size):
+        if not self.bandwidth or not size:
+            return
+
+        # Each device hands out bandwidth as a timeline; a transfer books the next slot and sleeps until it is due
+        with self.budget_lock:
+            now = time.monotonic()
+            due = now
+            for device in devices:
+                start = max(now, self.next_free.get(device, now))
+                self.next_free[device] = start + size / self.bandwidth
+                due = max(due, self.next_free[device])
+
+        if due > now:
+            time.sleep(due - now)
+
+
+def smallest_first(file_paths):
+    def size(file_path):
+        try:
+            return file_path.stat().st_size
+        except OSError:
+            return 0
+
+    return sorted(file_paths, key=size)
+
+
+@lru_cache(maxsize=None)
+def get_io_scheduler():
+    return IoScheduler(
+        get_int_configuration("io_device_concurrency", 2),
+        get_int_configuration("io_device_bandwidth_mb", 0) * 1024 * 1024,
+        get_int_configuration("io_free_space_margin_mb", 1024) * 1024 * 1024
+    )
@@ -0,0 +1,679 @@
+import os
+import struct
+
+EBML_ID = 0x1A45DFA3
+DOC_TYPE_ID = 0x4282
+SEGMENT_ID = 0x18538067
+SEEK_HEAD_ID = 0x114D9B74
+SEEK_ID = 0x4DBB
+SEEK_ID_ID = 0x53AB
+SEEK_POSITION_ID = 0x53AC
+INFO_ID = 0x1549A966
+TIMESTAMP_SCALE_ID = 0x2AD7B1
+DURATION_ID = 0x4489
+SEGMENT_UID_ID = 0x73A4
+TRACKS_ID = 0x1654AE6B
+TRACK_ENTRY_ID = 0xAE
+TRACK_NUMBER_ID = 0xD7
+TRACK_UID_ID = 0x73C5
+TRACK_TYPE_ID = 0x83
+FLAG_DEFAULT_ID = 0x88
+FLAG_FORCED_ID = 0x55AA
+NAME_ID = 0x536E
+LANGUAGE_ID = 0x22B59C
+LANGUAGE_BCP47_ID = 0x22B59D
+CODEC_ID_ID = 0x86
+CODEC_PRIVATE_ID = 0x63A2
+DEFAULT_DURATION_ID = 0x23E383
+VIDEO_ID = 0xE0
+PIXEL_WIDTH_ID = 0xB0
+PIXEL_HEIGHT_ID = 0xBA
+COLOUR_ID = 0x55B0
+BITS_PER_CHANNEL_ID = 0x55B2
+AUDIO_ID = 0xE1
+CHANNELS_ID = 0x9F
+TAGS_ID = 0x1254C367
+TAG_ID = 0x7373
+TARGETS_ID = 0x63C0
+TAG_TRACK_UID_ID = 0x63C5
+SIMPLE_TAG_ID = 0x67C8
+TAG_NAME_ID = 0x45A3
+TAG_STRING_ID = 0x4487
+CLUSTER_ID = 0x1F43B675
+VOID_ID = 0xEC
+CRC32_ID = 0xBF
+
+TRACK_TYPES = {1: "Video", 2: "Audio", 17: "Text"}
+MKVMERGE_TRACK_TYPES = {"Video": "video", "Audio": "audio", "Text": "subtitles"}
+
+# Header elements are a few KB on a typical remux; anything larger is not worth reading through this path
+MAX_ELEMENT_SIZE = 16 * 1024 * 1024
+HEADER_READ_SIZE = 64
+
+VIDEO_FORMATS = {
+    "V_MPEG4/ISO/AVC": "AVC",
+    "V_MPEGH/ISO/HEVC": "HEVC",
+    "V_AV1": "AV1",
+    "V_VP9": "VP9",
+    "V_VP8": "VP8",
+    "V_MPEG2": "MPEG Video",
+    "V_MPEG4/ISO/ASP": "MPEG-4 Visual"
+}
+AUDIO_FORMATS = {
+    "A_AAC": "AAC",
+    "A_AC3": "AC-3",
+    "A_EAC3": "E-AC-3",
+    "A_DTS": "DTS",
+    "A_TRUEHD": "MLP FBA",
+    "A_OPUS": "Opus",
+    "A_FLAC": "FLAC",
+    "A_VORBIS": "Vorbis",
+    "A_MPEG/L3": "MPEG Audio",
+    "A_MPEG/L2": "MPEG Audio",
+    "A_PCM/INT/LIT": "PCM",
+    "A_PCM/INT/BIG": "PCM",
+    "A_PCM/FLOAT/IEEE": "PCM"
+}
+TEXT_FORMATS = {
+    "S_TEXT/UTF8": "UTF-8",
+    "S_TEXT/ASS": "ASS",
+    "S_TEXT/SSA": "SSA",
+    "S_TEXT/WEBVTT": "WebVTT",
+    "S_HDMV/PGS": "PGS",
+    "S_VOBSUB": "VobSub"
+}
+
+# mediainfo --Language=raw reports ISO 639-1 where one exists, so the reader does the same
+ISO_639_1 = {
+    "eng": "en", "por": "pt", "jpn": "ja", "spa": "es", "fre": "fr", "fra": "fr",
+    "ger": "de", "deu": "de", "ita": "it", "kor": "ko", "chi": "zh", "zho": "zh",
+    "rus": "ru", "dut": "nl", "nld": "nl", "ara": "ar", "tur": "tr", "hin": "hi",
+    "pol": "pl", "swe": "sv", "nor": "no", "dan": "da", "fin": "fi", "tha": "th",
+    "vie": "vi", "ind": "id", "may": "ms", "msa": "ms", "heb": "he", "gre": "el",
+    "ell": "el", "hun": "hu", "cze": "cs", "ces": "cs", "rum": "ro", "ron": "ro",
+    "ukr": "uk", "cat": "ca", "tam": "ta", "tel": "te", "fil": "fil"
+}
+
+
+def read_vint(data, pos, keep_marker=False):
+    first = data[pos]
+    length = 1
+    mask = 0x80
+
+    while length <= 8 and not first & mask:
+        mask >>= 1
+        length += 1
+
+    if length > 8:
+        raise ValueError(f"Invalid EBML variable-length integer at {pos}")
+
+    if len(data) < pos + length:
+        raise ValueError(f"Truncated EBML variable-length integer at {pos}")
+
+    value = first if keep_marker else first & (mask - 1)
+    unknown = not keep_marker and value == mask - 1
+
+    for byte in data[pos + 1:pos + length]:
+        value = (value << 8) | byte
+        unknown = unknown and byte == 0xFF
+
+    return value, length, unknown
+
+
+def read_element_header(data, pos):
+    element_id, id_length, _ = read_vint(data, pos, keep_marker=True)
+    size, size_length, unknown = read_vint(data, pos + id_length)
+    return element_id, None if unknown else size, id_length + size_length
+
+
+def iter_children(data, start=0, end=None):
+    end = len(data) if end is None else end
+    pos = start
+
+    while pos < end:
+        element_id, size, header_length = read_element_header(data, pos)
+        data_start = pos + header_length
+        data_end = end if size is None else min(data_start + size, end)
+        yield element_id, data_start, data_end
+        pos = data_end
+
+
+def decode_uint(data):
+    return int.from_bytes(data, "big") if data else 0
+
+
+def decode_float(data):
+    if len(data) == 4:
+        return struct.unpack(">f", data)[0]
+    if len(data) == 8:
+        return struct.unpack(">d", data)[0]
+    return 0.0
+
+
+def decode_string(data):
+    return data.rstrip(b"\x00").decode("utf-8", errors="replace")
+
+
+def read_at(file, offset, size):
+    file.seek(offset)
+    return file.read(size)
+
+
+def read_top_level_element(file, offset, file_size):
+    header = read_at(file, offset, HEADER_READ_SIZE)
+    if not header:
+        return None
+
+    element_id, size, header_length = read_element_header(header, 0)
+    if size is None:
+        size = file_size - offset - header_length
+
+    return element_id, offset + header_length, size
+
+
+def open_segment(file, file_size):
+    header = read_at(file, 0, HEADER_READ_SIZE)
+
+    if len(header) < 4 or read_vint(header, 0, keep_marker=True)[0] != EBML_ID:
+        return None
+
+    element_id, ebml_start, ebml_size = read_top_level_element(file, 0, file_size)
+    ebml = read_at(file, ebml_start, ebml_size)
+    doc_type = next((decode_string(ebml[s:e]) for i, s, e in iter_children(ebml) if i == DOC_TYPE_ID), "matroska")
+
+    if doc_type not in ("matroska", "webm"):
+        return None
+
+    segment = read_top_level_element(file, ebml_start + ebml_size, file_size)
+    if not segment or segment[0] != SEGMENT_ID:
+        return None
+
+    _, segment_start, segment_size = segment
+    return doc_type, segment_start, min(segment_start + segment_size, file_size)
+
+
+def read_matroska(file_path):
+    with open(file_path, "rb") as file:
+        file_size = os.fstat(file.fileno()).st_size
+        segment = open_segment(file, file_size)
+        if not segment:
+            return None
+
+        doc_type, segment_start, segment_end = segment
+        elements = {}
+        seek_positions = {}
+
+        offset = segment_start
+        while offset < segment_end:
+            element = read_top_level_element(file, offset, file_size)
+            if not element:
+                break
+
+            element_id, data_start, size = element
+            if element_id == CLUSTER_ID:
+                break
+
+            if element_id in (SEEK_HEAD_ID, INFO_ID, TRACKS_ID, TAGS_ID) and element_id not in elements:
+                if size > MAX_ELEMENT_SIZE:
+                    return None
+                elements[element_id] = read_at(file, data_start, size)
+
+                if element_id == SEEK_HEAD_ID:
+                    seek_positions.update(parse_seek_head(elements[element_id], segment_start))
+
+            offset = data_start + size
+
+        # Tags (and sometimes Tracks) live after the clusters; the SeekHead tells us where to jump
+        for element_id in (INFO_ID, TRACKS_ID, TAGS_ID):
+            if element_id in elements or element_id not in seek_positions:
+                continue
+
+            element = read_top_level_element(file, seek_positions[element_id], file_size)
+            if element and element[0] == element_id and element[2] <= MAX_ELEMENT_SIZE:
+                elements[element_id] = read_at(file, element[1], element[2])
+
+    if INFO_ID not in elements or TRACKS_ID not in elements:
+        return None
+
+    info = parse_info(elements[INFO_ID])
+    tracks = parse_tracks(elements[TRACKS_ID])
+    track_tags = parse_tags(elements[TAGS_ID]) if TAGS_ID in elements else {}
+
+    for track in tracks:
+        track["tags"] = track_tags.get(track.get("uid"), {})
+
+    return {
+        "doc_type": doc_type,
+        "file_size": file_size,
+        "duration": info["duration"],
+        "segment_uid": info["segment_uid"],
+        "tracks": tracks
+    }
+
+
+def parse_seek_head(data, segment_start):
+    positions = {}
+
+    for element_id, start, end in iter_children(data):
+        if element_id != SEEK_ID:
+            continue
+
+        seek_id, seek_position = None, None
+        for child_id, child_start, child_end in iter_children(data, start, end):
+            if child_id == SEEK_ID_ID:
+                seek_id = decode_uint(data[child_start:child_end])
+            elif child_id == SEEK_POSITION_ID:
+                seek_position = decode_uint(data[child_start:child_end])
+
+        if seek_id is not None and seek_position is not None:
+            positions.setdefault(seek_id, segment_start + seek_position)
+
+    return positions
+
+
+def parse_info(data):
+    timestamp_scale = 1000000
+    duration = None
+    segment_uid = None
+
+    for element_id, start, end in iter_children(data):
+        if element_id == TIMESTAMP_SCALE_ID:
+            timestamp_scale = decode_uint(data[start:end])
+        elif element_id == DURATION_ID:
+            duration = decode_float(data[start:end])
+        elif element_id == SEGMENT_UID_ID:
+            segment_uid = data[start:end].hex()
+
+    return {
+        "duration": duration * timestamp_scale / 1000000000 if duration else None,
+        "segment_uid": segment_uid
+    }
+
+
+def read_segment_info(file_path):
+    # Only the Info element is read, so the check costs a few KB however large the file is
+    with open(file_path, "rb") as file:
+        file_size = os.fstat(file.fileno()).st_size
+        segment = open_segment(file, file_size)
+        if not segment:
+            return None
+
+        _, segment_start, segment_end = segment
+        seek_positions = {}
+
+        offset = segment_start
+        while offset < segment_end:
+            element = read_top_level_element(file, offset, file_size)
+            if not element or element[0] == CLUSTER_ID:
+                break
+
+            element_id, data_start, size = element
+            if element_id == INFO_ID:
+                return describe_segment_info(file, offset, data_start, size, file_size)
+
+            if element_id == SEEK_HEAD_ID and size <= MAX_ELEMENT_SIZE:
+                seek_positions.update(parse_seek_head(read_at(file, data_start, size), segment_start))
+
+            offset = data_start + size
+
+        if INFO_ID in seek_positions:
+            offset = seek_positions[INFO_ID]
+            element = read_top_level_element(file, offset, file_size)
+            if element and element[0] == INFO_ID:
+                return describe_segment_info(file, offset, element[1], element[2], file_size)
+
+    return None
+
+
+def describe_segment_info(file, offset, data_start, size, file_size):
+    if size > MAX_ELEMENT_SIZE:
+        return None
+
+    data = read_at(file, data_start, size)
+    children = list(iter_child_headers(data))
+    voids = [
+        (data_start + start - header_length, end - start + header_length)
+        for element_id, start, end, header_length in children
+        if element_id == VOID_ID
+    ]
+
+    trailing_void = None
+    data_end = data_start + size
+    if data_end < file_size:
+        element = read_top_level_element(file, data_end, file_size)
+        if element and element[0] == VOID_ID:
+            trailing_void = (data_end, element[1] + element[2] - data_end)
+
+    return {
+        "segment_uid": parse_info(data)["segment_uid"],
+        "offset": offset,
+        "data_start": data_start,
+        "size": size,
+        "size_length": data_start - offset - len(encode_id(INFO_ID)),
+        "voids": voids,
+        "trailing_void": trailing_void,
+        "has_crc32": any(element_id == CRC32_ID for element_id, _, _, _ in children)
+    }
+
+
+def iter_child_headers(data):
+    pos = 0
+
+    while pos < len(data):
+        element_id, size, header_length = read_element_header(data, pos)
+        data_start = pos + header_length
+        data_end = len(data) if size is None else min(data_start + size, len(data))
+        yield element_id, data_start, data_end, header_length
+        pos = data_end
+
+
+def encode_id(element_id):
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, "big")
+
+
+def encode_vint(value, length):
+    if length < 1 or length > 8 or value >= (1 << (7 * length)) - 1:
+        return None
+
+    return (value | (1 << (7 * length))).to_bytes(length, "big")
+
+
+def encode_void(total_length):
+    for size_length in range(1, 9):
+        payload_length = total_length - 1 - size_length
+        size = encode_vint(payload_length, size_length) if payload_length >= 0 else None
+        if size:
+            return encode_id(VOID_ID) + size + bytes(payload_length)
+
+    return None
+
+
+def encode_segment_uid(segment_uid, size_length=1):
+    size = encode_vint(len(segment_uid), size_length)
+    return encode_id(SEGMENT_UID_ID) + size + segment_uid if size else None
+
+
+def fill_void(void_length, segment_uid):
+    # A Void is at least two bytes, so a one-byte leftover is absorbed by a wider size on the UID instead
+    for size_length in range(1, 9):
+        element = encode_segment_uid(segment_uid, size_length)
+        remaining = void_length - len(element)
+        if remaining == 0:
+            return element
+        if remaining >= 2:
+            return element + encode_void(remaining)
+
+    return None
+
+
+def plan_segment_uid_injection(info, segment_uid):
+    # Writes that add a SegmentUID without moving any other byte of the file, or None when there is no room
+    if info["has_crc32"]:
+        # The checksum covers every byte of Info and could not change in the same write as the UID; mkvmerge redoes both
+        return None
+
+    for void_offset, void_length in info["voids"]:
+        content = fill_void(void_length, segment_uid)
+        if content:
+            return [(void_offset, content)]
+
+    if info["trailing_void"]:
+        void_offset, void_length = info["trailing_void"]
+
+        # Info grows into the Void that follows it, keeping its size field the same width
+        for size_length in range(1, 9):
+            element = encode_segment_uid(segment_uid, size_length)
+            remaining = void_length - len(element)
+            if remaining != 0 and remaining < 2:
+                continue
+
+            size = encode_vint(info["size"] + len(element), info["size_length"])
+            if size:
+                content = element + (encode_void(remaining) if remaining else b"")
+                # The new bytes land before the size that exposes them, so an interrupted write leaves Info as it was
+                return [(void_offset, content), (info["data_start"] - info["size_length"], size)]
+            break
+
+    return None
+
+
+def write_segment_uid(file_path, writes):
+    fd = os.open(file_path, os.O_WRONLY)
+    try:
+        for offset, content in writes:
+            os.pwrite(fd, content, offset)
+            os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def parse_tracks(data):
+    tracks = []
+
+    for element_id, start, end in iter_children(data):
+        if element_id != TRACK_ENTRY_ID:
+            continue
+
+        track = {"language": "eng", "forced": False, "default": True}
+        for child_id, child_start, child_end in iter_children(data, start, end):
+            value = data[child_start:child_end]
+
+            if child_id == TRACK_NUMBER_ID:
+                track["number"] = decode_uint(value)
+            elif child_id == TRACK_UID_ID:
+                track["uid"] = decode_uint(value)
+            elif child_id == TRACK_TYPE_ID:
+                track["type"] = TRACK_TYPES.get(decode_uint(value))
+            elif child_id == FLAG_DEFAULT_ID:
+                track["default"] = bool(decode_uint(value))
+            elif child_id == FLAG_FORCED_ID:
+                track["forced"] = bool(decode_uint(value))
+            elif child_id == NAME_ID:
+                track["name"] = decode_string(value)
+            elif child_id == LANGUAGE_ID:
+                track["language"] = decode_string(value)
+            elif child_id == LANGUAGE_BCP47_ID:
+                track["language_bcp47"] = decode_string(value)
+            elif child_id == CODEC_ID_ID:
+                track["codec_id"] = decode_string(value)
+            elif child_id == CODEC_PRIVATE_ID:
+                track["codec_private"] = bytes(value)
+            elif child_id == DEFAULT_DURATION_ID:
+                track["default_duration"] = decode_uint(value)
+            elif child_id == VIDEO_ID:
+                track.update(parse_video(data, child_start, child_end))
+            elif child_id == AUDIO_ID:
+                track.update(parse_audio(data, child_start, child_end))
+
+        # Only the bit depth is needed from CodecPrivate; dropping the blob keeps the result JSON-friendly
+        bit_depth = detect_bit_depth(track)
+        track.pop("codec_private", None)
+        if bit_depth:
+            track["bit_depth"] = bit_depth
+
+        tracks.append(track)
+
+    return tracks
+
+
+def parse_video(data, start, end):
+    video = {}
+
+    for element_id, child_start, child_end in iter_children(data, start, end):
+        if element_id == PIXEL_WIDTH_ID:
+            video["width"] = decode_uint(data[child_start:child_end])
+        elif element_id == PIXEL_HEIGHT_ID:
+            video["height"] = decode_uint(data[child_start:child_end])
+        elif element_id == COLOUR_ID:
+            for colour_id, colour_start, colour_end in iter_children(data, child_start, child_end):
+                if colour_id == BITS_PER_CHANNEL_ID and decode_uint(data[colour_start:colour_end]):
+                    video["bit_depth"] = decode_uint(data[colour_start:colour_end])
+
+    return video
+
+
+def parse_audio(data, start, end):
+    audio = {"channels": 1}
+
+    for element_id, child_start, child_end in iter_children(data, start, end):
+        if element_id == CHANNELS_ID:
+            audio["channels"] = decode_uint(data[child_start:child_end])
+
+    return audio
+
+
+def parse_tags(data):
+    track_tags = {}
+
+    for element_id, start, end in iter_children(data):
+        if element_id != TAG_ID:
+            continue
+
+        track_uids, values = [], {}
+        for child_id, child_start, child_end in iter_children(data, start, end):
+            if child_id == TARGETS_ID:
+                track_uids.extend(
+                    decode_uint(data[s:e]) for i, s, e in iter_children(data, child_start, child_end) if i == TAG_TRACK_UID_ID
+                )
+            elif child_id == SIMPLE_TAG_ID:
+                name, value = None, None
+                for tag_id, tag_start, tag_end in iter_children(data, child_start, child_end):
+                    if tag_id == TAG_NAME_ID:
+                        name = decode_string(data[tag_start:tag_end])
+                    elif tag_id == TAG_STRING_ID:
+                        value = decode_string(data[tag_start:tag_end])
+                if name and value is not None:
+                    values[name] = value
+
+        for track_uid in track_uids:
+            track_tags.setdefault(track_uid, {}).update(values)
+
+    return track_tags
+
+
+def detect_bit_depth(track):
+    if track.get("bit_depth"):
+        return track["bit_depth"]
+
+    private = track.get("codec_private") or b""
+    codec_id = track.get("codec_id", "")
+
+    if codec_id == "V_MPEGH/ISO/HEVC" and len(private) > 17:
+        return (private[17] & 0x07) + 8
+
+    if codec_id == "V_AV1" and len(private) > 2:
+        high_bitdepth, twelve_bit = (private[2] >> 6) & 1, (private[2] >> 5) & 1
+        return 12 if high_bitdepth and twelve_bit else 10 if high_bitdepth else 8
+
+    if codec_id == "V_MPEG4/ISO/AVC" and len(private) > 1:
+        # Baseline, Main, Extended and High are 8-bit only; High 10 and above need the avcC extension
+        return 8 if private[1] in (66, 77, 88, 100) else None
+
+    return None
+
+
+def detect_raw_language(track):
+    if track.get("language_bcp47"):
+        return track["language_bcp47"]
+
+    language = track.get("language", "und")
+    if language == "und":
+        return None
+
+    return ISO_639_1.get(language, language)
+
+
+def format_number(value):
+    return f"{value:.3f}".rstrip("0").rstrip(".")
+
+
+def to_media_info(parsed, file_path):
+    duration = parsed["duration"]
+    general = {
+        "@type": "General",
+        "FileSize": str(parsed["file_size"]),
+        "FileExtension": os.path.splitext(str(file_path))[1].lstrip(".")
+    }
+
+    if duration:
+        general["Duration"] = format_number(duration)
+        # mediainfo derives a Matroska file's overall bitrate the same way, from its size and duration
+        general["OverallBitRate"] = str(int(parsed["file_size"] * 8 / duration))
+
+    media_tracks = [general]
+
+    for track in parsed["tracks"]:
+        track_type = track.get("type")
+        if not track_type:
+            continue
+
+        media_track = {"@type": track_type, "UniqueID": str(track.get("uid", ""))}
+
+        if track.get("name"):
+            media_track["Title"] = track["name"]
+
+        language = detect_raw_language(track)
+        if language:
+            media_track["Language"] = language
+
+        media_track["Default"] = "Yes" if track.get("default") else "No"
+        media_track["Forced"] = "Yes" if track.get("forced") else "No"
+
+        if track_type == "Video":
+            format_name = VIDEO_FORMATS.get(track.get("codec_id"))
+            if duration:
+                media_track["Duration"] = format_number(duration)
+            if track.get("width"):
+                media_track["Width"] = str(track["width"])
+            if track.get("height"):
+                media_track["Height"] = str(track["height"])
+            if track.get("default_duration"):
+                media_track["FrameRate"] = format_number(1000000000 / track["default_duration"])
+            if track.get("bit_depth"):
+                media_track["BitDepth"] = str(track["bit_depth"])
+        elif track_type == "Audio":
+            format_name = AUDIO_FORMATS.get(track.get("codec_id"))
+            if not format_name and track.get("codec_id", "").startswith("A_AAC"):
+                format_name = "AAC"
+            media_track["Channels"] = str(track.get("channels", 1))
+        else:
+            format_name = TEXT_FORMATS.get(track.get("codec_id"))
+
+        if format_name:
+            media_track["Format"] = format_name
+
+        frame_count = track["tags"].get("NUMBER_OF_FRAMES")
+        if frame_count is not None:
+            media_track["FrameCount"] = frame_count
+
+        media_tracks.append(media_track)
+
+    return {"media": {"@ref": str(file_path), "track": media_tracks}}
+
+
+def to_mkvmerge_identify(parsed):
+    tracks = []
+
+    for track_id, track in enumerate(parsed["tracks"]):
+        properties = {
+            "number": track.get("number"),
+            "uid": track.get("uid"),
+            "language": track.get("language", "eng"),
+            "codec_id": track.get("codec_id"),
+            "default_track": track.get("default", True),
+            "forced_track": track.get("forced", False)
+        }
+
+        if track.get("name"):
+            properties["track_name"] = track["name"]
+
+        if track.get("language_bcp47"):
+            properties["language_ietf"] = track["language_bcp47"]
+
+        tracks.append({
+            "id": track_id,
+            "type": MKVMERGE_TRACK_TYPES.get(track.get("type"), "unknown"),
+            "properties": properties
+        })
+
+    return {"tracks": tracks}
@@ -0,0 +1,208 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import (
+    datetime,
+    timezone
+)
+from pathlib import Path
+
+from src.common.configuration import (
+    get_configuration,
+    get_state_folder
+)
+
+PREFIX = "media_analyser"
+HELP = {
+    "files_total": "Files that left the pipeline, by outcome",
+    "stage_seconds": "Time spent in each pipeline stage",
+    "probe_seconds": "Time spent running a probe tool on a cache miss",
+    "probe_cache_total": "Probe cache lookups, by tool and result",
+    "tool_seconds": "Time spent in mkvpropedit and mkvmerge",
+    "bytes_rewritten_total": "Bytes written by remuxes",
+    "bytes_moved_total": "Bytes moved into the Plex folder, by method",
+    "db_statement_seconds": "Database statement latency",
+    "queue_depth": "Work items waiting for a pipeline stage",
+    "files_in_flight": "Files between the probe and move stages",
+    "files_awaiting_decision": "Files deferred until their duplicate-track decisions are filled in",
+    "pending_decisions": "Duplicate-track decisions without an answer",
+    "duplicates_total": "Incoming files whose content fingerprint matched stored media, by action",
+    "files_fingerprinted_total": "Library files fingerprinted by the bulk fingerprint command",
+    "segment_uid_files_total": "Files handled by the segment UID fixer, by action",
+    "io_wait_seconds": "Time remuxes and copies waited for a device slot",
+    "io_jobs_waiting": "Remuxes and copies waiting for a device slot",
+    "last_run_timestamp_seconds": "When these metrics were last written"
+}
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_timings = {}
+_gauges = {}
+_files = defaultdict(dict)
+_events_file = None
+_started_at = time.time()
+
+
+def label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def increment(name, amount=1, **labels):
+    with _lock:
+        _counters[(name, label_key(labels))] += amount
+
+
+def add_gauge(name, amount, **labels):
+    with _lock:
+        key = (name, label_key(labels))
+        _gauges[key] = _gauges.get(key, 0) + amount
+
+
+def set_gauge(name, value, **labels):
+    with _lock:
+        _gauges[(name, label_key(labels))] = value
+
+
+def observe(name, seconds, **labels):
+    with _lock:
+        timing = _timings.setdefault((name, label_key(labels)), [0, 0.0, 0.0])
+        timing[0] += 1
+        timing[1] += seconds
+        timing[2] = max(timing[2], seconds)
+
+
+@contextmanager
+def timed(name, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def record_file_stage(file_name, stage, seconds):
+    with _lock:
+        stages = _files[file_name].setdefault("stage_seconds", {})
+        stages[stage] = round(stages.get(stage, 0) + seconds, 6)
+
+
+def record_file(file_name, **values):
+    with _lock:
+        _files[file_name].update(values)
+
+
+def get_metrics_path(key, default_name):
+    return Path(get_configuration(key, str(get_state_folder() / default_name)))
+
+
+def log_event(event, message=None, **fields):
+    global _events_file
+
+    if message:
+        print(message)
+
+    line = json.dumps({"time": datetime.now(timezone.utc).isoformat(), "event": event, **fields}, default=str, ensure_ascii=False)
+
+    with _lock:
+        if _events_file is None:
+            path = get_metrics_path("metrics_events_file", "events.jsonl")
+            path.parent.mkdir(parents=True, exist_ok=True)
+            _events_file = open(path, mode="a", encoding="utf-8", buffering=1)
+        _events_file.write(line + "\n")
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in labels) + "}"
+
+
+def escape_label_value(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_prometheus():
+    lines = []
+
+    def header(name, metric_type):
+        lines.append(f"# HELP {PREFIX}_{name} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {PREFIX}_{name} {metric_type}")
+
+    with _lock:
+        counters, timings, gauges = dict(_counters), {key: list(value) for key, value in _timings.items()}, dict(_gauges)
+
+    for name in sorted({name for name, _ in counters}):
+        header(name, "counter")
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f"{PREFIX}_{name}{format_labels(labels)} {format_value(value)}")
+
+    for name in sorted({name for name, _ in timings}):
+        header(name, "summary")
+        for (metric, labels), (count, total, _) in sorted(timings.items()):
+            if metric == name:
+                lines.append(f"{PREFIX}_{name}_count{format_labels(labels)} {count}")
+                lines.append(f"{PREFIX}_{name}_sum{format_labels(labels)} {total:.6f}")
+
+    for name in sorted({name for name, _ in gauges}):
+        header(name, "gauge")
+        for (metric, labels), value in sorted(gauges.items()):
+            if metric == name:
+                lines.append(f"{PREFIX}_{name}{format_labels(labels)} {format_value(value)}")
+
+    header("last_run_timestamp_seconds", "gauge")
+    lines.append(f"{PREFIX}_last_run_timestamp_seconds {time.time():.0f}")
+
+    return "\n".join(lines) + "\n"
+
+
+def build_summary():
+    finished_at = time.time()
+
+    def group(items, convert):
+        grouped = defaultdict(dict)
+        for (name, labels), value in sorted(items):
+            grouped[name][",".join(f"{label}={value}" for label, value in labels) or "total"] = convert(value)
+        return dict(grouped)
+
+    with _lock:
+        return {
+            "started_at": datetime.fromtimestamp(_started_at, timezone.utc).isoformat(),
+            "finished_at": datetime.fromtimestamp(finished_at, timezone.utc).isoformat(),
+            "duration_seconds": round(finished_at - _started_at, 3),
+            "counters": group(_counters.items(), lambda value: value),
+            "timings": group(
+                _timings.items(),
+                lambda value: {"count": value[0], "seconds": round(value[1], 6), "max_seconds": round(value[2], 6)}
+            ),
+            "gauges": group(_gauges.items(), lambda value: value),
+            "files": {name: dict(values) for name, values in sorted(_files.items())}
+        }
+
+
+def write_atomically(path, content):
+    # The textfile collector may read at any moment, so it must never see a half-written file
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f".{path.name}.tmp")
+
+    with open(temp_path, mode="w", encoding="utf-8") as file:
+        file.write(content)
+
+    os.replace(temp_path, path)
+
+
+def write_run_metrics():
+    write_atomically(get_metrics_path("metrics_textfile", "media_analyser.prom"), render_prometheus())
+    write_atomically(get_metrics_path("metrics_summary_file", "run_summary.json"), json.dumps(build_summary(), indent=4, ensure_ascii=False))
+
+    # Counters keep growing for the scraper, but a long-running watcher reports files batch by batch
+    with _lock:
+        _files.clear()
@@ -0,0 +1,98 @@
+class GeneralTrack:
+    __slots__ = ("file_size", "file_extension", "overall_bitrate")
+
+    def __init__(self, track):
+        self.file_size = to_int(track.get("FileSize"))
+        self.file_extension = track.get("FileExtension")
+        self.overall_bitrate = to_int(track.get("OverallBitRate")) or 0
+
+
+class VideoTrack:
+    __slots__ = ("format", "duration", "bitrate_mode", "width", "height", "framerate_mode", "framerate", "bitdepth")
+
+    def __init__(self, track):
+        self.format = track.get("Format")
+        self.duration = to_int(track.get("Duration"))
+        self.bitrate_mode = track.get("BitRate_Mode")
+        self.width = to_int(track.get("Width"))
+        self.height = to_int(track.get("Height"))
+        self.framerate_mode = track.get("FrameRate_Mode")
+        self.framerate = to_float(track.get("FrameRate"))
+        self.bitdepth = to_int(track.get("BitDepth"))
+
+
+class AudioTrack:
+    __slots__ = ("unique_id", "format", "channels", "title", "language", "forced", "frame_count")
+    track_type = "Audio"
+
+    def __init__(self, track):
+        self.unique_id = track.get("UniqueID")
+        self.format = track.get("Format")
+        self.channels = int(track.get("Channels", 0))
+        self.title = track.get("Title")
+        self.language = track.get("Language")
+        self.forced = track.get("Forced") == "Yes"
+        self.frame_count = int(track.get("FrameCount", 0))
+
+
+class TextTrack:
+    __slots__ = ("unique_id", "format", "title", "language", "forced", "frame_count")
+    track_type = "Text"
+
+    def __init__(self, track):
+        self.unique_id = track.get("UniqueID")
+        self.format = track.get("Format")
+        self.title = track.get("Title")
+        self.language = track.get("Language")
+        self.forced = track.get("Forced") == "Yes"
+        self.frame_count = int(track.get("FrameCount", 0))
+
+
+class MediaProbe:
+    __slots__ = ("general", "video", "audios", "texts")
+
+    def __init__(self, general, video, audios, texts):
+        self.general = general
+        self.video = video
+        self.audios = audios
+        self.texts = texts
+
+    @property
+    def communication_tracks(self):
+        return self.audios + self.texts
+
+
+TRACK_TYPES = {
+    "Audio": AudioTrack,
+    "Text": TextTrack
+}
+EMPTY_TRACK = {}
+
+
+def parse_media_info(media_info):
+    general, video, tracks = None, None, {"Audio": [], "Text": []}
+
+    # One pass over mediainfo's track list; only the first General and Video tracks are used, as before
+    for track in media_info.get("media", {}).get("track", []):
+        track_type = track.get("@type")
+        if track_type in TRACK_TYPES:
+            tracks[track_type].append(TRACK_TYPES[track_type](track))
+        elif track_type == "General" and general is None:
+            general = GeneralTrack(track)
+        elif track_type == "Video" and video is None:
+            video = VideoTrack(track)
+
+    return MediaProbe(
+        general or GeneralTrack(EMPTY_TRACK),
+        video or VideoTrack(EMPTY_TRACK),
+        tuple(tracks["Audio"]),
+        tuple(tracks["Text"])
+    )
+
+
+def to_int(value):
+    return int(float(value)) if value else None
+
+
+def to_float(value):
+    return float(value) if value else None
@@ -0,0 +1,95 @@
+from sqlalchemy import (
+    case,
+    delete,
+    func,
+    insert,
+    select
+)
+
+from src.infrastructure.models import (
+    Content,
+    ContentRollup,
+    ContentSubtitleRollup,
+    Media,
+    MediaRollup,
+    Source,
+    Subtitle
+)
+
+
+def rebuild_rollups(conn):
+    for model in (MediaRollup, ContentRollup, ContentSubtitleRollup):
+        conn.execute(delete(model))
+
+    bitrate = case((Media.overall_bitrate > 0, Media.overall_bitrate), else_=0)
+    conn.execute(insert(MediaRollup).from_select(
+        ["category", "source_id", "codec", "media_count", "total_size", "total_duration", "bitrate_total", "bitrate_count"],
+        select(
+            Content.category,
+            Media.source_id,
+            Media.codec,
+            func.count(),
+            func.coalesce(func.sum(Media.file_size), 0),
+            func.coalesce(func.sum(Media.duration), 0),
+            func.coalesce(func.sum(bitrate), 0),
+            func.count(case((Media.overall_bitrate > 0, 1)))
+        )
+        .join(Content, Content.id == Media.content_id)
+        .group_by(Content.category, Media.source_id, Media.codec)
+    ))
+
+    conn.execute(insert(ContentRollup).from_select(
+        ["content_id", "media_count", "total_size"],
+        select(Media.content_id, func.count(), func.coalesce(func.sum(Media.file_size), 0)).group_by(Media.content_id)
+    ))
+
+    conn.execute(insert(ContentSubtitleRollup).from_select(
+        ["content_id", "language", "media_count"],
+        select(Media.content_id, Subtitle.language, func.count(func.distinct(Media.id)))
+        .join(Subtitle, Subtitle.media_id == Media.id)
+        .group_by(Media.content_id, Subtitle.language)
+    ))
+
+
+def get_size_by_codec(session):
+    query = (
+        select(MediaRollup.codec, func.sum(MediaRollup.media_count), func.sum(MediaRollup.total_size))
+        .group_by(MediaRollup.codec)
+        .order_by(func.sum(MediaRollup.total_size).desc())
+    )
+    return session.execute(query).all()
+
+
+def get_codec_share_by_category(session, codec):
+    codec_count = func.sum(case((MediaRollup.codec == codec, MediaRollup.media_count), else_=0))
+    query = (
+        select(MediaRollup.category, codec_count, func.sum(MediaRollup.media_count))
+        .group_by(MediaRollup.category)
+        .order_by(MediaRollup.category)
+    )
+    return session.execute(query).all()
+
+
+def get_bitrate_by_source(session):
+    query = (
+        select(Source.name, func.sum(MediaRollup.bitrate_total), func.sum(MediaRollup.bitrate_count))
+        .join(Source, Source.id == MediaRollup.source_id)
+        .group_by(Source.name)
+        .order_by(Source.name)
+    )
+    return session.execute(query).all()
+
+
+def get_contents_missing_subtitles(session, language):
+    with_subtitles = func.coalesce(ContentSubtitleRollup.media_count, 0)
+    query = (
+        select(Content.name, Content.category, ContentRollup.media_count, with_subtitles)
+        .join(Content, Content.id == ContentRollup.content_id)
+        .outerjoin(
+            ContentSubtitleRollup,
+            (ContentSubtitleRollup.content_id == ContentRollup.content_id) & (ContentSubtitleRollup.language == language)
+        )
+        .where(with_subtitles < ContentRollup.media_count)
+        .order_by(Content.name)
+    )
+    return session.execute(query).all()
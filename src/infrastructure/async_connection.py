@@ -0,0 +1,53 @@
+from functools import lru_cache
+from sqlalchemy.ext.asyncio import (
+    create_async_engine,
+    async_sessionmaker
+)
+from src.common.configuration import get_configuration
+from src.infrastructure.connection import (
+    is_sqlite,
+    configure_sqlite,
+    instrument_engine
+)
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite"
+}
+
+
+def get_async_database_url(database_url):
+    scheme, rest = database_url.split("://", 1)
+    dialect = scheme.split("+", 1)[0]
+    return f"{ASYNC_DRIVERS.get(dialect, scheme)}://{rest}"
+
+
+def build_async_engine(database_url):
+    engine = create_async_engine(
+        get_async_database_url(database_url),
+        echo=False
+    )
+
+    if is_sqlite(database_url):
+        configure_sqlite(engine.sync_engine, database_url, [get_configuration("env")])
+
+    instrument_engine(engine.sync_engine)
+
+    return engine
+
+
+@lru_cache(maxsize=None)
+def get_async_engine():
+    return build_async_engine(get_configuration("database"))
+
+
+@lru_cache(maxsize=None)
+def get_async_session_factory():
+    return async_sessionmaker(
+        get_async_engine(),
+        expire_on_commit=False
+    )
+
+
+def get_async_session():
+    return get_async_session_factory()()
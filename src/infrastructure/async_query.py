@@ -0,0 +1,76 @@
+from src.infrastructure.models.audio import Audio
+from src.infrastructure.models.subtitle import Subtitle
+from src.infrastructure.query import (
+    build_content_upsert,
+    build_media_insert,
+    build_media_name_by_fingerprint_query,
+    build_rollup_statements,
+    build_source_id_query,
+    build_track_insert,
+    remember_references,
+    CONTENT_REFERENCES,
+    SOURCE_REFERENCES
+)
+from src.infrastructure.reference_cache import get_reference_cache
+
+
+async def load_references(session):
+    cache = get_reference_cache(session.bind)
+    if not cache.loaded:
+        sources = (await session.execute(SOURCE_REFERENCES)).all()
+        contents = (await session.execute(CONTENT_REFERENCES)).all()
+        cache.load(sources, contents)
+
+    return cache
+
+
+async def get_media_name_by_fingerprint(session, fingerprint):
+    result = await session.execute(build_media_name_by_fingerprint_query(fingerprint))
+    return result.scalar_one_or_none()
+
+
+async def insert_media_bundle(session, content_name, category, source_name, media, audios, subtitles):
+    references = await load_references(session)
+    content = references.get_content(content_name)
+    source_id = references.get_source_id(source_name)
+
+    try:
+        if content is None:
+            result = await session.execute(build_content_upsert(session, content_name, category))
+            content = result.one()
+        content_id, content_category = content
+
+        if source_id is None:
+            result = await session.execute(build_source_id_query(source_name))
+            source_id = result.scalar_one_or_none()
+
+        result = await session.execute(build_media_insert(session, source_id, content_id, media))
+        media_id = result.scalar_one_or_none()
+
+        if media_id is None:
+            await session.rollback()
+            return None
+
+        for statement in build_rollup_statements(session, content_category, source_id, content_id, media, subtitles):
+            await session.execute(statement)
+
+        if audios:
+            await session.scalars(
+                build_track_insert(Audio),
+                [dict(audio, media_id=media_id) for audio in audios]
+            )
+
+        if subtitles:
+            await session.scalars(
+                build_track_insert(Subtitle),
+                [dict(subtitle, media_id=media_id) for subtitle in subtitles]
+            )
+
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+
+    remember_references(references, content_name, content_id, content_category, source_name, source_id)
+
+    return media_id
@@ -0,0 +1,224 @@
+import io
+import uuid
+
+from sqlalchemy import (
+    bindparam,
+    delete,
+    func,
+    insert,
+    select,
+    text,
+    update
+)
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from src.infrastructure.models import (
+    Audio,
+    Content,
+    Media,
+    Source,
+    Subtitle
+)
+from src.common.configuration import get_configuration
+
+SCHEMA = get_configuration("env")
+MEDIA_COLUMNS = [
+    "media_type", "codec", "duration", "bitrate_mode", "overall_bitrate", "width", "height",
+    "framerate_mode", "framerate", "bitdepth", "file_size", "file_extension", "fingerprint"
+]
+STAGING_COLUMNS = {
+    "staging_media": ["id", "name", "content_id", "content_name", "category", "source_name", *MEDIA_COLUMNS],
+    "staging_audio": ["id", "media_name", "format", "channels", "title", "language"],
+    "staging_subtitle": ["id", "media_name", "title", "language", "is_forced"]
+}
+
+
+def flatten_records(records):
+    content_ids = {}
+    rows = {table: [] for table in STAGING_COLUMNS}
+
+    for record in records:
+        media = record["media"]
+        content_id = content_ids.setdefault(record["content_name"], uuid.uuid4())
+
+        rows["staging_media"].append({
+            **{column: media.get(column) for column in MEDIA_COLUMNS},
+            "id": uuid.uuid4(),
+            "name": media["name"],
+            "content_id": content_id,
+            "content_name": record["content_name"],
+            "category": record["category"],
+            "source_name": record["source_name"]
+        })
+        rows["staging_audio"] += [dict(audio, id=uuid.uuid4(), media_name=media["name"]) for audio in record["audios"]]
+        rows["staging_subtitle"] += [dict(subtitle, id=uuid.uuid4(), media_name=media["name"]) for subtitle in record["subtitles"]]
+
+    return rows
+
+
+def merge_records(conn, records, refresh=False):
+    rows = flatten_records(records)
+
+    if conn.dialect.name == "postgresql" and conn.dialect.driver in ("psycopg2", "psycopg"):
+        return merge_with_copy(conn, rows, refresh)
+
+    return merge_with_statements(conn, rows, refresh)
+
+
+def create_staging_tables(conn):
+    # Plain text columns: COPY never rejects a value, and the merge casts each one to the media column's type
+    for table, columns in STAGING_COLUMNS.items():
+        conn.execute(text(
+            f"CREATE TEMP TABLE IF NOT EXISTS {table} ({', '.join(f'{column} TEXT' for column in columns)}) ON COMMIT DELETE ROWS"
+        ))
+    conn.execute(text("CREATE TEMP TABLE IF NOT EXISTS staging_merged (id UUID, name TEXT) ON COMMIT DELETE ROWS"))
+
+
+def copy_rows(conn, table, columns, rows):
+    cursor = conn.connection.cursor()
+    values = [[row.get(column) for column in columns] for row in rows]
+
+    statement = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+
+    try:
+        if hasattr(cursor, "copy_expert"):
+            buffer = io.StringIO("".join("\t".join(format_copy_value(value) for value in row) + "\n" for row in values))
+            cursor.copy_expert(statement, buffer)
+        else:
+            with cursor.copy(statement) as copy:
+                for row in values:
+                    copy.write_row([None if value is None else str(value) for value in row])
+    finally:
+        cursor.close()
+
+
+def format_copy_value(value):
+    # COPY's text format: \N is NULL, so an empty title stays an empty string as it would through the ORM
+    if value is None:
+        return "\\N"
+
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def cast_column(conn, model, column, source):
+    column_type = model.__table__.c[column].type.compile(dialect=conn.dialect)
+
+    # Through numeric, so a framerate like 23.976 rounds into an integer column the way an ORM insert would
+    if column_type in ("INTEGER", "BIGINT"):
+        return f"CAST(CAST({source} AS NUMERIC) AS {column_type})"
+
+    return f"CAST({source} AS {column_type})"
+
+
+def merge_with_copy(conn, rows, refresh):
+    create_staging_tables(conn)
+
+    for table, columns in STAGING_COLUMNS.items():
+        if rows[table]:
+            copy_rows(conn, table, columns, rows[table])
+
+    conn.execute(text(f"""
+        INSERT INTO {SCHEMA}.content (id, name, category, created_at)
+        SELECT DISTINCT ON (content_name) CAST(content_id AS UUID), content_name, category, now()
+        FROM staging_media
+        ORDER BY content_name
+        ON CONFLICT (name) DO NOTHING
+    """))
+
+    media_columns = ", ".join(MEDIA_COLUMNS)
+    media_values = ", ".join(cast_column(conn, Media, column, f"staging.{column}") for column in MEDIA_COLUMNS)
+    if refresh:
+        # A stored fingerprint was taken before the edit, so a hash of the edited file never replaces it
+        on_conflict = "DO UPDATE SET " + ", ".join(
+            f"{column} = COALESCE(media.{column}, excluded.{column})" if column == "fingerprint" else f"{column} = excluded.{column}"
+            for column in ("source_id", "content_id", *MEDIA_COLUMNS)
+        )
+    else:
+        on_conflict = "DO NOTHING"
+
+    # Unknown sources drop out of the join, as their rows would fail media.source_id NOT NULL anyway
+    conn.execute(text(f"""
+        WITH merged AS (
+            INSERT INTO {SCHEMA}.media (id, source_id, content_id, name, {media_columns}, created_at)
+            SELECT CAST(staging.id AS UUID), source_row.id, content_row.id, staging.name, {media_values}, now()
+            FROM staging_media AS staging
+            JOIN {SCHEMA}.content AS content_row ON content_row.name = staging.content_name
+            JOIN {SCHEMA}.source AS source_row ON source_row.name = staging.source_name
+            ON CONFLICT (name) {on_conflict}
+            RETURNING id, name
+        )
+        INSERT INTO staging_merged (id, name) SELECT id, name FROM merged
+    """))
+
+    if refresh:
+        for model in (Audio, Subtitle):
+            conn.execute(text(f"DELETE FROM {SCHEMA}.{model.__tablename__} WHERE media_id IN (SELECT id FROM staging_merged)"))
+
+    for model, table in ((Audio, "staging_audio"), (Subtitle, "staging_subtitle")):
+        columns = [column for column in STAGING_COLUMNS[table] if column not in ("id", "media_name")]
+        conn.execute(text(f"""
+            INSERT INTO {SCHEMA}.{model.__tablename__} (id, media_id, {', '.join(columns)}, created_at)
+            SELECT CAST(staging.id AS UUID), merged.id, {', '.join(cast_column(conn, model, column, f'staging.{column}') for column in columns)}, now()
+            FROM {table} AS staging
+            JOIN staging_merged AS merged ON merged.name = staging.media_name
+        """))
+
+    return conn.execute(text("SELECT count(*) FROM staging_merged")).scalar_one()
+
+
+def merge_with_statements(conn, rows, refresh):
+    media_rows = rows["staging_media"]
+    dialect_insert = sqlite_insert if conn.dialect.name == "sqlite" else postgresql_insert
+
+    contents = {row["content_name"]: row for row in media_rows}
+    conn.execute(
+        dialect_insert(Content).on_conflict_do_nothing(index_elements=[Content.name]),
+        [{"id": row["content_id"], "name": name, "category": row["category"]} for name, row in contents.items()]
+    )
+    content_ids = dict(conn.execute(select(Content.name, Content.id).where(Content.name.in_(contents))).all())
+    source_ids = dict(conn.execute(select(Source.name, Source.id)).all())
+    existing_ids = dict(conn.execute(
+        select(Media.name, Media.id).where(Media.name.in_([row["name"] for row in media_rows]))
+    ).all())
+
+    merged, new_rows, changed_rows = {}, [], []
+    for row in media_rows:
+        if row["source_name"] not in source_ids:
+            continue
+
+        values = {
+            **{column: row[column] for column in MEDIA_COLUMNS if column != "fingerprint"},
+            "source_id": source_ids[row["source_name"]],
+            "content_id": content_ids[row["content_name"]]
+        }
+        if row["name"] not in existing_ids:
+            merged[row["name"]] = row["id"]
+            new_rows.append({**values, "id": row["id"], "name": row["name"], "fingerprint": row["fingerprint"]})
+        elif refresh:
+            merged[row["name"]] = existing_ids[row["name"]]
+            changed_rows.append({**values, "media_id": existing_ids[row["name"]], "new_fingerprint": row["fingerprint"]})
+
+    if new_rows:
+        conn.execute(insert(Media), new_rows)
+
+    if changed_rows:
+        media = Media.__table__
+        conn.execute(
+            update(media)
+            .where(media.c.id == bindparam("media_id"))
+            .values(fingerprint=func.coalesce(media.c.fingerprint, bindparam("new_fingerprint"))),
+            changed_rows
+        )
+        for model in (Audio, Subtitle):
+            conn.execute(delete(model).where(model.media_id.in_([row["media_id"] for row in changed_rows])))
+
+    for model, table in ((Audio, "staging_audio"), (Subtitle, "staging_subtitle")):
+        children = [
+            {**{key: value for key, value in row.items() if key != "media_name"}, "media_id": merged[row["media_name"]]}
+            for row in rows[table] if row["media_name"] in merged
+        ]
+        if children:
+            conn.execute(insert(model), children)
+
+    return len(merged)
@@ -1,17 +1,104 @@
-import platform
-from sqlalchemy import create_engine
+import time
+from functools import lru_cache
+from pathlib import Path
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
 from src.common.configuration import get_configuration
+from src.common.metrics import observe
 
-engine = create_engine(
-    get_configuration("database"),
-    echo=False
-)
+# Tuned for bulk ingest from a single writer; WAL lets readers keep going while a batch commits
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "cache_size": "-65536",
+    "mmap_size": "268435456"
+}
+SQLITE_CONNECTION_PRAGMAS = {
+    "foreign_keys": "ON",
+    "busy_timeout": "30000"
+}
+
+
+def is_sqlite(database_url):
+    return make_url(database_url).get_backend_name() == "sqlite"
+
+
+def get_schema_database_path(database_url, schema):
+    database = make_url(database_url).database
+
+    if not database or database == ":memory:":
+        return ":memory:"
+
+    # Each Postgres schema maps to its own attached database file next to the main one
+    path = Path(database)
+    return str(path.with_name(f"{path.stem}_{schema}{path.suffix or '.db'}"))
+
+
+def configure_sqlite(engine, database_url, schemas):
+    attachments = {schema: get_schema_database_path(database_url, schema) for schema in schemas}
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+
+        for name, value in SQLITE_CONNECTION_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+
+        for schema, path in attachments.items():
+            cursor.execute("ATTACH DATABASE ? AS " + schema, (path,))
+
+        for database in ["main", *attachments]:
+            for name, value in SQLITE_PRAGMAS.items():
+                cursor.execute(f"PRAGMA {database}.{name}={value}")
+
+        cursor.close()
+
+    event.listen(engine, "connect", on_connect)
+
+
+def instrument_engine(engine):
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info["statement_started"] = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("statement_started", None)
+        if started is None:
+            return
+
+        observe("db_statement_seconds", time.perf_counter() - started, operation=statement.lstrip().split(None, 1)[0].upper())
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+
+def build_engine(database_url):
+    engine = create_engine(
+        database_url,
+        echo=False
+    )
+
+    if is_sqlite(database_url):
+        configure_sqlite(engine, database_url, [get_configuration("env")])
+
+    instrument_engine(engine)
+
+    return engine
+
+
+@lru_cache(maxsize=None)
+def get_engine():
+    # Built on first use, so runs that never touch the database never pay for the driver import or pool
+    return build_engine(get_configuration("database"))
+
+
+@lru_cache(maxsize=None)
+def get_session_factory():
+    return sessionmaker(
+        get_engine(),
+        expire_on_commit=False
+    )
 
-SessionFactory = sessionmaker(
-    engine,
-    expire_on_commit=False
-)
 
 def get_session():
-    return SessionFactory()
+    return get_session_factory()()
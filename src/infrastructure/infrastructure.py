@@ -1,52 +1,110 @@
 import sys
 from pathlib import Path
+import hashlib
 import json
 
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
-from sqlalchemy import text
+from sqlalchemy import (
+    inspect,
+    select,
+    text,
+    update,
+    insert
+)
 
 from src.infrastructure.connection import (
-    engine,
-    get_session
+    get_engine,
+    get_session,
+    is_sqlite
 )
-from src.infrastructure.models import ALL_MODELS
+from src.infrastructure.migrations import MIGRATIONS
+from src.infrastructure.models import SchemaState
 from src.infrastructure.query import (
-    get_source_by_name,
-    insert_source
+    get_existing_source_names,
+    insert_sources
 )
 from src.common.configuration import get_configuration
+from src.common.metrics import log_event
 
 SCHEMA = get_configuration("env")
+SCHEMA_VERSION = len(MIGRATIONS)
+SOURCE_JSON_PATH = Path(__file__).resolve().parent / "json" / "source.json"
+
+_bootstrapped = False
+
+
+def ensure_infrastructure() -> None:
+    global _bootstrapped
+
+    if not _bootstrapped:
+        create_infrastructure()
+        _bootstrapped = True
+
 
 def create_infrastructure() -> None:
-    with engine.begin() as conn:
-        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}"))
+    source_data = load_source_json()
+    source_hash = hashlib.sha256(source_data).hexdigest()
+    state = load_schema_state()
+
+    # A database already built for this schema version and source list needs no DDL at all
+    if state is not None and state.schema_version == SCHEMA_VERSION and state.source_hash == source_hash:
+        return
+
+    current_version = state.schema_version if state is not None else 0
+    if current_version > SCHEMA_VERSION:
+        raise RuntimeError(f"Database schema version {current_version} is newer than this code ({SCHEMA_VERSION})")
+
+    engine = get_engine()
+
+    # On SQLite the schema is an attached database, created when the connection attaches it
+    if not is_sqlite(get_configuration("database")):
+        with engine.begin() as conn:
+            conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}"))
 
     with engine.begin() as conn:
-        for model in ALL_MODELS:
-            model.metadata.create_all(conn, checkfirst=True)
+        SchemaState.__table__.create(conn, checkfirst=True)
 
-    with get_session() as session:
-        sync_database_with_json(session)
+    # Each migration commits together with its version, so an interrupted upgrade resumes where it stopped
+    for version, migration in enumerate(MIGRATIONS[current_version:], start=current_version + 1):
+        log_event("migration_applied", f"Applying schema migration {version}: {migration.__name__}", version=version, migration=migration.__name__)
+        with engine.begin() as conn:
+            migration(conn)
+            store_schema_state(conn, schema_version=version)
 
-def sync_database_with_json(session):
-    def load_json_file(path):
-        with open(path, mode='r') as file:
-            content = file.read()
-            return json.loads(content)
+    if state is None or state.source_hash != source_hash:
+        with get_session() as session:
+            sync_source_from_json(session, json.loads(source_data))
 
-    sync_source_from_json(session, load_json_file("./src/infrastructure/json/source.json"))
+        with engine.begin() as conn:
+            store_schema_state(conn, source_hash=source_hash)
 
 
-def sync_source_from_json(session, data):
-    for item in data:
-        row = get_source_by_name(session, item['name'])
+def load_source_json():
+    with open(SOURCE_JSON_PATH, mode='rb') as file:
+        return file.read()
+
+
+def load_schema_state():
+    with get_engine().connect() as conn:
+        if not inspect(conn).has_table(SchemaState.__tablename__, schema=SCHEMA):
+            return None
+
+        return conn.execute(
+            select(SchemaState.schema_version, SchemaState.source_hash).where(SchemaState.id == 1)
+        ).first()
 
-        if row:
-            continue
 
-        insert_source(
-            session,
-            name=item["name"]
-        )
+def store_schema_state(conn, **values):
+    updated = conn.execute(update(SchemaState).where(SchemaState.id == 1).values(**values))
+
+    if updated.rowcount == 0:
+        conn.execute(insert(SchemaState).values(id=1, **{"schema_version": 0, "source_hash": "", **values}))
+
+
+def sync_source_from_json(session, data):
+    existing_names = get_existing_source_names(session)
+    missing_names = [item["name"] for item in data if item["name"] not in existing_names]
+
+    if missing_names:
+        insert_sources(session, list(dict.fromkeys(missing_names)))
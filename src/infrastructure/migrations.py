@@ -0,0 +1,198 @@
+from collections import defaultdict
+
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    ForeignKey,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    TIMESTAMP,
+    Uuid,
+    delete,
+    func,
+    inspect,
+    select,
+    text,
+    update
+)
+
+from src.infrastructure.analytics import rebuild_rollups
+from src.common.configuration import get_configuration
+from src.common.metrics import log_event
+
+SCHEMA = get_configuration("env")
+
+
+# Migrations describe the tables as they were at their version, never through the live models,
+# so a column or index added later cannot leak into an older step
+def frozen_table(name, *columns):
+    return Table(name, MetaData(schema=SCHEMA), *columns)
+
+
+def uuid_column(name, reference=None, primary_key=False):
+    arguments = [ForeignKey(f"{SCHEMA}.{reference}.id")] if reference else []
+    return Column(name, Uuid(as_uuid=True), *arguments, primary_key=primary_key, nullable=False)
+
+
+def create_base_tables(conn):
+    metadata = MetaData(schema=SCHEMA)
+    Table(
+        "source", metadata,
+        uuid_column("id", primary_key=True),
+        Column("name", String, nullable=False),
+        Column("created_at", TIMESTAMP, default=func.now())
+    )
+    Table(
+        "content", metadata,
+        uuid_column("id", primary_key=True),
+        Column("name", String, nullable=False),
+        Column("category", String, nullable=False),
+        Column("created_at", TIMESTAMP, default=func.now())
+    )
+    Table(
+        "media", metadata,
+        uuid_column("id", primary_key=True),
+        uuid_column("source_id", "source"),
+        Column("media_type", String, nullable=False),
+        uuid_column("content_id", "content"),
+        Column("name", String, nullable=False, index=True),
+        Column("codec", String, nullable=False),
+        Column("duration", Integer, nullable=False),
+        Column("bitrate_mode", String, nullable=True),
+        Column("overall_bitrate", BigInteger, nullable=True),
+        Column("width", Integer, nullable=False),
+        Column("height", Integer, nullable=False),
+        Column("framerate_mode", String, nullable=True),
+        Column("framerate", Integer, nullable=False),
+        Column("bitdepth", Integer, nullable=False),
+        Column("file_size", BigInteger, nullable=False),
+        Column("file_extension", String, nullable=False),
+        Column("created_at", TIMESTAMP, default=func.now())
+    )
+    Table(
+        "audio", metadata,
+        uuid_column("id", primary_key=True),
+        uuid_column("media_id", "media"),
+        Column("format", String, nullable=False),
+        Column("channels", Integer, nullable=False),
+        Column("title", String, nullable=True),
+        Column("language", String, nullable=False),
+        Column("created_at", TIMESTAMP, default=func.now())
+    )
+    Table(
+        "subtitle", metadata,
+        uuid_column("id", primary_key=True),
+        uuid_column("media_id", "media"),
+        Column("title", String, nullable=True),
+        Column("language", String, nullable=False),
+        Column("is_forced", Boolean, nullable=False),
+        Column("created_at", TIMESTAMP, default=func.now())
+    )
+    metadata.create_all(conn, checkfirst=True)
+
+
+def add_lookup_indexes(conn):
+    media = frozen_table("media", uuid_column("source_id"), uuid_column("content_id"), Column("name", String))
+    for table_name, reference in (("source", media.c.source_id), ("content", media.c.content_id)):
+        table = frozen_table(
+            table_name,
+            uuid_column("id", primary_key=True),
+            Column("name", String),
+            Column("created_at", TIMESTAMP)
+        )
+        merge_duplicate_names(conn, table, media, reference)
+
+    duplicates = conn.execute(
+        select(media.c.name).group_by(media.c.name).having(func.count() > 1)
+    ).scalars().all()
+    if duplicates:
+        raise RuntimeError(f"{len(duplicates)} media names are stored more than once (e.g. {duplicates[0]}); remove the extra rows before migrating")
+
+    # The plain index on media.name is superseded by the unique one
+    conn.execute(text(f"DROP INDEX IF EXISTS {SCHEMA}.ix_{SCHEMA}_media_name"))
+
+    for table_name in ("source", "content", "media"):
+        table = frozen_table(table_name, Column("name", String))
+        Index(f"ux_{table_name}_name", table.c.name, unique=True).create(conn, checkfirst=True)
+
+    for table_name in ("audio", "subtitle"):
+        table = frozen_table(table_name, Column("media_id", Uuid), Column("title", String), Column("language", String))
+        Index(f"ix_{table_name}_media_id_title_language", table.c.media_id, table.c.title, table.c.language).create(conn, checkfirst=True)
+
+
+def merge_duplicate_names(conn, table, media, reference):
+    rows_by_name = defaultdict(list)
+    for row_id, name in conn.execute(select(table.c.id, table.c.name).order_by(table.c.created_at, table.c.id)):
+        rows_by_name[name].append(row_id)
+
+    # The oldest row of each name is kept and every media row is pointed at it
+    for name, row_ids in rows_by_name.items():
+        if len(row_ids) < 2:
+            continue
+
+        keep_id, extra_ids = row_ids[0], row_ids[1:]
+        conn.execute(update(media).where(reference.in_(extra_ids)).values({reference.key: keep_id}))
+        conn.execute(delete(table).where(table.c.id.in_(extra_ids)))
+        log_event(
+            "duplicate_rows_merged",
+            f"Merged {len(extra_ids)} duplicate {table.name} rows named {name}",
+            table=table.name, name=name, merged=len(extra_ids)
+        )
+
+
+def add_media_fingerprint(conn):
+    # Databases created by earlier builds of this migration may have the column already
+    columns = {column["name"] for column in inspect(conn).get_columns("media", schema=SCHEMA)}
+    if "fingerprint" not in columns:
+        conn.execute(text(f"ALTER TABLE {SCHEMA}.media ADD COLUMN fingerprint VARCHAR"))
+
+    media = frozen_table("media", Column("fingerprint", String))
+    Index("ix_media_fingerprint", media.c.fingerprint).create(conn, checkfirst=True)
+
+
+def add_rollups(conn):
+    metadata = MetaData(schema=SCHEMA)
+    # Referenced tables only need their keys here; the foreign keys resolve against these stand-ins
+    Table("source", metadata, uuid_column("id", primary_key=True))
+    Table("content", metadata, uuid_column("id", primary_key=True))
+    Table(
+        "media_rollup", metadata,
+        Column("category", String, primary_key=True),
+        Column("source_id", Uuid(as_uuid=True), ForeignKey(f"{SCHEMA}.source.id"), primary_key=True),
+        Column("codec", String, primary_key=True),
+        Column("media_count", Integer, nullable=False, default=0),
+        Column("total_size", BigInteger, nullable=False, default=0),
+        Column("total_duration", BigInteger, nullable=False, default=0),
+        Column("bitrate_total", BigInteger, nullable=False, default=0),
+        Column("bitrate_count", Integer, nullable=False, default=0)
+    )
+    Table(
+        "content_rollup", metadata,
+        Column("content_id", Uuid(as_uuid=True), ForeignKey(f"{SCHEMA}.content.id"), primary_key=True),
+        Column("media_count", Integer, nullable=False, default=0),
+        Column("total_size", BigInteger, nullable=False, default=0)
+    )
+    Table(
+        "content_subtitle_rollup", metadata,
+        Column("content_id", Uuid(as_uuid=True), ForeignKey(f"{SCHEMA}.content.id"), primary_key=True),
+        Column("language", String, primary_key=True),
+        Column("media_count", Integer, nullable=False, default=0)
+    )
+    for table_name in ("media_rollup", "content_rollup", "content_subtitle_rollup"):
+        metadata.tables[f"{SCHEMA}.{table_name}"].create(conn, checkfirst=True)
+
+    # From here on every media insert keeps them current; this fills them for what is already stored.
+    # The one step shared with the live code: rebuild_rollups names each column it reads and writes, all present at this version
+    rebuild_rollups(conn)
+
+
+MIGRATIONS = [
+    create_base_tables,
+    add_lookup_indexes,
+    add_media_fingerprint,
+    add_rollups
+]
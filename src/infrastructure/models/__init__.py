@@ -6,6 +6,12 @@ sys.path.append(str(Path(__file__).resolve().parent.parent))
 from .audio import Audio
 from .content import Content
 from .media import Media
+from .rollup import (
+    ContentRollup,
+    ContentSubtitleRollup,
+    MediaRollup
+)
+from .schema_state import SchemaState
 from .source import Source
 from .subtitle import Subtitle
 
@@ -14,5 +20,9 @@ ALL_MODELS = [
     Content,
     Media,
     Audio,
-    Subtitle
+    Subtitle,
+    SchemaState,
+    MediaRollup,
+    ContentRollup,
+    ContentSubtitleRollup
 ]
\ No newline at end of file
@@ -9,10 +9,11 @@ from sqlalchemy import (
     String,
     TIMESTAMP,
     ForeignKey,
+    Index,
     func,
-    Integer, Boolean
+    Integer, Boolean,
+    Uuid
 )
-from sqlalchemy.dialects.postgresql import UUID
 
 from .base import Base
 from src.common.configuration import get_configuration
@@ -22,10 +23,13 @@ SCHEMA = get_configuration("env")
 
 class Audio(Base):
     __tablename__ = "audio"
-    __table_args__ = {"schema": SCHEMA}
+    __table_args__ = (
+        Index("ix_audio_media_id_title_language", "media_id", "title", "language"),
+        {"schema": SCHEMA}
+    )
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    media_id = Column(UUID(as_uuid=True), ForeignKey(f"{SCHEMA}.media.id"), nullable=False)
+    id = Column(Uuid(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    media_id = Column(Uuid(as_uuid=True), ForeignKey(f"{SCHEMA}.media.id"), nullable=False)
     format = Column(String, nullable=False)
     channels = Column(Integer, nullable=False)
     title = Column(String, nullable=True)
@@ -8,9 +8,10 @@ from sqlalchemy import (
     Column,
     String,
     TIMESTAMP,
-    func
+    Index,
+    func,
+    Uuid
 )
-from sqlalchemy.dialects.postgresql import UUID
 
 from .base import Base
 from src.common.configuration import get_configuration
@@ -20,9 +21,12 @@ SCHEMA = get_configuration("env")
 
 class Content(Base):
     __tablename__ = "content"
-    __table_args__ = {"schema": SCHEMA}
+    __table_args__ = (
+        Index("ux_content_name", "name", unique=True),
+        {"schema": SCHEMA}
+    )
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(Uuid(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String, nullable=False)
     category = Column(String, nullable=False)
     created_at = Column(TIMESTAMP, default=func.now())
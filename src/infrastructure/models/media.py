@@ -9,10 +9,11 @@ from sqlalchemy import (
     String,
     TIMESTAMP,
     ForeignKey,
+    Index,
     func,
-    Integer, BigInteger
+    Integer, BigInteger,
+    Uuid
 )
-from sqlalchemy.dialects.postgresql import UUID
 
 from .base import Base
 from src.common.configuration import get_configuration
@@ -22,12 +23,16 @@ SCHEMA = get_configuration("env")
 
 class Media(Base):
     __tablename__ = "media"
-    __table_args__ = {"schema": SCHEMA}
+    __table_args__ = (
+        Index("ux_media_name", "name", unique=True),
+        Index("ix_media_fingerprint", "fingerprint"),
+        {"schema": SCHEMA}
+    )
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    source_id = Column(UUID(as_uuid=True), ForeignKey(f"{SCHEMA}.source.id"), nullable=False)
+    id = Column(Uuid(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    source_id = Column(Uuid(as_uuid=True), ForeignKey(f"{SCHEMA}.source.id"), nullable=False)
     media_type = Column(String, nullable=False)
-    content_id = Column(UUID(as_uuid=True), ForeignKey(f"{SCHEMA}.content.id"), nullable=False)
+    content_id = Column(Uuid(as_uuid=True), ForeignKey(f"{SCHEMA}.content.id"), nullable=False)
     name = Column(String, nullable=False)
     codec = Column(String, nullable=False)
     duration = Column(Integer, nullable=False)
@@ -40,4 +45,5 @@ class Media(Base):
     bitdepth = Column(Integer, nullable=False)
     file_size = Column(BigInteger, nullable=False)
     file_extension = Column(String, nullable=False)
+    fingerprint = Column(String, nullable=True)
     created_at = Column(TIMESTAMP, default=func.now())
@@ -0,0 +1,50 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    ForeignKey,
+    Integer,
+    String,
+    Uuid
+)
+
+from .base import Base
+from src.common.configuration import get_configuration
+
+SCHEMA = get_configuration("env")
+
+
+class MediaRollup(Base):
+    __tablename__ = "media_rollup"
+    __table_args__ = {"schema": SCHEMA}
+
+    category = Column(String, primary_key=True)
+    source_id = Column(Uuid(as_uuid=True), ForeignKey(f"{SCHEMA}.source.id"), primary_key=True)
+    codec = Column(String, primary_key=True)
+    media_count = Column(Integer, nullable=False, default=0)
+    total_size = Column(BigInteger, nullable=False, default=0)
+    total_duration = Column(BigInteger, nullable=False, default=0)
+    bitrate_total = Column(BigInteger, nullable=False, default=0)
+    bitrate_count = Column(Integer, nullable=False, default=0)
+
+
+class ContentRollup(Base):
+    __tablename__ = "content_rollup"
+    __table_args__ = {"schema": SCHEMA}
+
+    content_id = Column(Uuid(as_uuid=True), ForeignKey(f"{SCHEMA}.content.id"), primary_key=True)
+    media_count = Column(Integer, nullable=False, default=0)
+    total_size = Column(BigInteger, nullable=False, default=0)
+
+
+class ContentSubtitleRollup(Base):
+    __tablename__ = "content_subtitle_rollup"
+    __table_args__ = {"schema": SCHEMA}
+
+    content_id = Column(Uuid(as_uuid=True), ForeignKey(f"{SCHEMA}.content.id"), primary_key=True)
+    language = Column(String, primary_key=True)
+    media_count = Column(Integer, nullable=False, default=0)
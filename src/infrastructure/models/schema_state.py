@@ -0,0 +1,27 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    TIMESTAMP,
+    func
+)
+
+from .base import Base
+from src.common.configuration import get_configuration
+
+SCHEMA = get_configuration("env")
+
+
+class SchemaState(Base):
+    __tablename__ = "schema_state"
+    __table_args__ = {"schema": SCHEMA}
+
+    id = Column(Integer, primary_key=True)
+    schema_version = Column(Integer, nullable=False)
+    source_hash = Column(String, nullable=False)
+    updated_at = Column(TIMESTAMP, default=func.now(), onupdate=func.now())
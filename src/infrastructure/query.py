@@ -1,27 +1,127 @@
-import uuid
-
 from sqlalchemy import (
-    select
+    bindparam,
+    func,
+    select,
+    insert,
+    update
 )
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from src.infrastructure.models.source import Source
 from src.infrastructure.models.media import Media
 from src.infrastructure.models.content import Content
 from src.infrastructure.models.audio import Audio
 from src.infrastructure.models.subtitle import Subtitle
+from src.infrastructure.models.rollup import (
+    ContentRollup,
+    ContentSubtitleRollup,
+    MediaRollup
+)
+from src.infrastructure.reference_cache import get_reference_cache
 
+MEMBERSHIP_CHUNK_SIZE = 1000
+SOURCE_REFERENCES = select(Source.name, Source.id)
+CONTENT_REFERENCES = select(Content.name, Content.id, Content.category)
 
-def get_source_by_name(session, source_name: str):
-    query = select(Source).where(Source.name == source_name)
-    result = session.execute(query)
-    result = result.scalar_one_or_none()
-    return result
 
+def dialect_insert(session, model):
+    # ON CONFLICT lives on the dialect-specific insert constructs
+    if session.bind.dialect.name == "sqlite":
+        return sqlite_insert(model)
+
+    return postgresql_insert(model)
+
+
+def upsert_by_name(session, model, **values):
+    statement = dialect_insert(session, model).values(**values)
+
+    # A no-op update still locks and returns the existing row, which DO NOTHING would not
+    return statement.on_conflict_do_update(
+        index_elements=[model.name],
+        set_={"name": statement.excluded.name}
+    )
+
+
+def build_content_upsert(session, name, category):
+    return upsert_by_name(session, Content, name=name, category=category).returning(Content.id, Content.category)
+
+
+def build_source_id_query(source_name):
+    return select(Source.id).where(Source.name == source_name)
+
+
+def build_media_insert(session, source_id, content_id, media):
+    return (
+        dialect_insert(session, Media)
+        .values(source_id=source_id, content_id=content_id, **media)
+        .on_conflict_do_nothing(index_elements=[Media.name])
+        .returning(Media.id)
+    )
+
+
+def build_track_insert(model):
+    return insert(model).returning(model.id)
+
+
+def build_media_name_by_fingerprint_query(fingerprint):
+    return select(Media.name).where(Media.fingerprint == fingerprint).order_by(Media.created_at).limit(1)
+
+
+def load_references(session):
+    # Sources and contents are read once per run; a season's episodes then share one lookup
+    cache = get_reference_cache(session.bind)
+    if not cache.loaded:
+        cache.load(session.execute(SOURCE_REFERENCES).all(), session.execute(CONTENT_REFERENCES).all())
+
+    return cache
+
+
+def to_int(value):
+    return int(float(value)) if value else 0
+
+
+def add_to_rollup(session, model, keys, values):
+    statement = dialect_insert(session, model).values(**keys, **values)
+
+    # Each insert only adds its own counts, so concurrent writers never overwrite each other's totals
+    return statement.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={name: model.__table__.c[name] + statement.excluded[name] for name in values}
+    )
+
+
+def build_rollup_statements(session, category, source_id, content_id, media, subtitles):
+    file_size = to_int(media.get("file_size"))
+    overall_bitrate = to_int(media.get("overall_bitrate"))
+
+    statements = [
+        add_to_rollup(
+            session, MediaRollup,
+            {"category": category, "source_id": source_id, "codec": media["codec"]},
+            {
+                "media_count": 1,
+                "total_size": file_size,
+                "total_duration": to_int(media.get("duration")),
+                "bitrate_total": overall_bitrate,
+                "bitrate_count": 1 if overall_bitrate > 0 else 0
+            }
+        ),
+        add_to_rollup(session, ContentRollup, {"content_id": content_id}, {"media_count": 1, "total_size": file_size})
+    ]
+
+    # Sorted, so two transactions touching the same rows always lock them in the same order
+    for language in sorted({subtitle["language"] for subtitle in subtitles}):
+        statements.append(
+            add_to_rollup(session, ContentSubtitleRollup, {"content_id": content_id, "language": language}, {"media_count": 1})
+        )
 
-def get_content_by_name(session, content_name: str):
-    query = select(Content).where(Content.name == content_name)
+    return statements
+
+
+def get_existing_source_names(session):
+    query = select(Source.name)
     result = session.execute(query)
-    result = result.scalar_one_or_none()
-    return result
+    return set(result.scalars())
 
 
 def get_media_by_name(session, name: str):
@@ -31,60 +131,129 @@ def get_media_by_name(session, name: str):
     return result
 
 
-def get_audio_by_media_id_title_and_language(session, media_id: uuid.uuid4, title: str, language: str):
-    query = select(Audio).where(Audio.media_id == media_id, Audio.title == title, Audio.language == language)
+def get_existing_media_names(session, names):
+    query = select(Media.name).where(Media.name.in_(names))
     result = session.execute(query)
-    result = result.scalar_one_or_none()
-    return result
+    return set(result.scalars())
 
 
-def get_subtitle_by_media_id_title_and_language(session, media_id: uuid.uuid4, title: str, language: str):
-    query = select(Subtitle).where(Subtitle.media_id == media_id, Subtitle.title == title, Subtitle.language == language)
-    result = session.execute(query)
-    result = result.scalar_one_or_none()
-    return result
+def filter_missing_media_names(session, names, chunk_size=MEMBERSHIP_CHUNK_SIZE):
+    chunk = []
 
+    for name in names:
+        chunk.append(name)
 
-def insert_source(session, name: str):
-    new_data = Source(name=name)
-    session.add(new_data)
-    session.commit()
-    session.refresh(new_data)
-    return new_data
+        if len(chunk) >= chunk_size:
+            existing = get_existing_media_names(session, chunk)
+            yield from (name for name in chunk if name not in existing)
+            chunk = []
+
+    if chunk:
+        existing = get_existing_media_names(session, chunk)
+        yield from (name for name in chunk if name not in existing)
+
+
+def get_media_name_by_fingerprint(session, fingerprint):
+    result = session.execute(build_media_name_by_fingerprint_query(fingerprint))
+    return result.scalar_one_or_none()
 
 
-def insert_content(session, name: str, category: str):
-    new_data = Content(name=name, category=category)
-    session.add(new_data)
+def get_unfingerprinted_media_names(session, names):
+    query = select(Media.name).where(Media.name.in_(names), Media.fingerprint.is_(None))
+    result = session.execute(query)
+    return set(result.scalars())
+
+
+def update_media_fingerprints(session, fingerprints):
+    # Ingest stores the fingerprint taken before any edit, which is what new arrivals are compared against;
+    # a hash of the edited library file only fills rows that have none
+    statement = (
+        update(Media.__table__)
+        .where(Media.__table__.c.name == bindparam("media_name"), Media.__table__.c.fingerprint.is_(None))
+        .values(fingerprint=bindparam("media_fingerprint"))
+    )
+    result = session.execute(statement, [
+        {"media_name": name, "media_fingerprint": fingerprint}
+        for name, fingerprint in fingerprints.items()
+    ])
     session.commit()
-    session.refresh(new_data)
-    return new_data
+    return result.rowcount
 
 
-def insert_media(session, source_name, media_type, content_id, name, codec, duration, bitrate_mode, width, height, framerate_mode, framerate, bitdepth, file_size, file_extension, overall_bitrate):
-    result = session.execute(
-        select(Source.id).where(Source.name == source_name)
+def get_duplicate_fingerprints(session):
+    duplicates = (
+        select(Media.fingerprint)
+        .where(Media.fingerprint.is_not(None))
+        .group_by(Media.fingerprint)
+        .having(func.count() > 1)
     )
-    source_id = result.scalar_one_or_none()
+    query = select(Media.fingerprint, Media.name).where(Media.fingerprint.in_(duplicates)).order_by(Media.fingerprint, Media.name)
+    result = session.execute(query)
 
-    new_data = Media(source_id=source_id, media_type=media_type, content_id=content_id, name=name, codec=codec, duration=duration, bitrate_mode=bitrate_mode, width=width, height=height, framerate_mode=framerate_mode, framerate=framerate, bitdepth=bitdepth, file_size=file_size, file_extension=file_extension, overall_bitrate=overall_bitrate)
-    session.add(new_data)
-    session.commit()
-    session.refresh(new_data)
-    return new_data
+    groups = {}
+    for fingerprint, name in result:
+        groups.setdefault(fingerprint, []).append(name)
+    return groups
 
 
-def insert_audio(session, media_id, format, channels, title, language):
-    new_data = Audio(media_id=media_id, format=format, channels=channels, title=title, language=language)
-    session.add(new_data)
+def insert_sources(session, names):
+    session.execute(
+        dialect_insert(session, Source).on_conflict_do_nothing(index_elements=[Source.name]),
+        [{"name": name} for name in names]
+    )
     session.commit()
-    session.refresh(new_data)
-    return new_data
 
 
-def insert_subtitle(session, media_id, title, language, is_forced):
-    new_data = Subtitle(media_id=media_id, title=title, language=language, is_forced=is_forced)
-    session.add(new_data)
-    session.commit()
-    session.refresh(new_data)
-    return new_data
+def insert_media_bundle(session, content_name, category, source_name, media, audios, subtitles):
+    references = load_references(session)
+    content = references.get_content(content_name)
+    source_id = references.get_source_id(source_name)
+
+    try:
+        # An existing content keeps its category, and the rollups count it under that one
+        content_id, content_category = content or session.execute(
+            build_content_upsert(session, content_name, category)
+        ).one()
+
+        if source_id is None:
+            source_id = session.execute(build_source_id_query(source_name)).scalar_one_or_none()
+
+        media_id = session.execute(build_media_insert(session, source_id, content_id, media)).scalar_one_or_none()
+
+        # Another run stored this file first; leave its rows as they are
+        if media_id is None:
+            session.rollback()
+            return None
+
+        # The rollups move with the media row, so they can never disagree with it
+        for statement in build_rollup_statements(session, content_category, source_id, content_id, media, subtitles):
+            session.execute(statement)
+
+        # A list of parameter sets is sent as one multi-row INSERT ... RETURNING per batch
+        if audios:
+            session.scalars(
+                build_track_insert(Audio),
+                [dict(audio, media_id=media_id) for audio in audios]
+            ).all()
+
+        if subtitles:
+            session.scalars(
+                build_track_insert(Subtitle),
+                [dict(subtitle, media_id=media_id) for subtitle in subtitles]
+            ).all()
+
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    # Only committed rows are cached; a content created by a rolled back insert never existed
+    remember_references(references, content_name, content_id, content_category, source_name, source_id)
+
+    return media_id
+
+
+def remember_references(references, content_name, content_id, content_category, source_name, source_id):
+    references.remember_content(content_name, content_id, content_category)
+    if source_id is not None:
+        references.remember_source(source_name, source_id)
@@ -0,0 +1,44 @@
+import threading
+
+_lock = threading.Lock()
+_caches = {}
+
+
+class ReferenceCache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.sources = {}
+        self.contents = {}
+
+    def load(self, sources, contents):
+        with self.lock:
+            if self.loaded:
+                return
+
+            self.sources.update(sources)
+            self.contents.update((name, (content_id, category)) for name, content_id, category in contents)
+            self.loaded = True
+
+    def get_source_id(self, name):
+        return self.sources.get(name)
+
+    def get_content(self, name):
+        return self.contents.get(name)
+
+    def remember_source(self, name, source_id):
+        self.sources[name] = source_id
+
+    def remember_content(self, name, content_id, category):
+        # Every worker's insert-or-get returns the same row, so whichever one lands here first is correct
+        self.contents.setdefault(name, (content_id, category))
+
+
+def get_reference_cache(bind):
+    with _lock:
+        return _caches.setdefault(str(bind.url), ReferenceCache())
+
+
+def clear_reference_caches():
+    with _lock:
+        _caches.clear()
@@ -1,55 +1,261 @@
+import argparse
 from pathlib import Path
 from src.common.configuration import get_configuration
-from src.infrastructure.connection import get_session
-from src.infrastructure.query import (
-    get_media_by_name
+from src.common.io_scheduler import smallest_first
+from src.common.metrics import (
+    log_event,
+    set_gauge,
+    timed,
+    write_run_metrics
 )
-from src.infrastructure.infrastructure import create_infrastructure
-from src.processor.processor import process_file
+from src.processor.analytics_report import REPORTS
+from src.processor.journal import (
+    get_resume_point,
+    load_journaled_paths,
+    prune_journal
+)
+from src.processor.scanner import (
+    scan_roots,
+    load_seen_files,
+    record_seen_files
+)
+from src.processor.watcher import watch_folders
+
+# SQLAlchemy and everything built on it is imported where it is first needed, so a run with nothing new to do
+# never pays for loading it
 
+SCAN_CHUNK_SIZE = 1000
+FOLDERS = [
+    "processing_cartoon_folder"
+    ,"processing_movie_folder"
+    ,"processing_show_folder"
+    ,"processing_anime_movie_folder"
+    ,"processing_anime_show_folder"
+]
 
-def process_folder(session, folder_path):
-    folder_path = Path(folder_path)
+
+def collect_process_queue(folders):
+    seen_files = load_seen_files()
+    journaled_paths = load_journaled_paths()
+    scanned_paths = set()
+    ingested_files = []
     process_queue = []
+    chunk = []
+
+    def check_chunk():
+        # Files already in the database are remembered, so an unchanged one never reaches this check again
+        with get_session() as session:
+            new_files = set(filter_new_files(session, [file_path for file_path, _, _ in chunk]))
+        for entry in chunk:
+            if entry[0] in new_files:
+                process_queue.append(entry[0])
+            else:
+                ingested_files.append(entry)
+        chunk.clear()
 
-    for file_path in folder_path.rglob("*"):
-        if (file_path.is_file()
-                and not file_path.name.startswith(".")
-                and file_path.suffix.lower().lstrip('.') in {"mkv"}):
+    for file_path, size, mtime_ns in scan_roots(folders):
+        scanned_paths.add(str(file_path))
 
-            result = get_media_by_name(session, file_path.name)
+        # A file stopped between stages may already be in the database, so the journal decides for it
+        if str(file_path) in journaled_paths:
+            process_queue.append(file_path)
+            continue
 
-            if not result:
-                process_queue.append(file_path)
+        if seen_files.get(str(file_path)) == (size, mtime_ns):
+            continue
 
+        chunk.append((file_path, size, mtime_ns))
+        if len(chunk) >= SCAN_CHUNK_SIZE:
+            check_chunk()
+
+    if chunk:
+        check_chunk()
+
+    record_seen_files(ingested_files, folders, scanned_paths)
+    prune_journal(folders, scanned_paths)
+
+    set_gauge("queue_depth", len(process_queue), stage="scan")
     if len(process_queue) > 0:
-        print(f"{len(process_queue)} files need to be processed on folder {folder_path}")
+        log_event("queue_collected", f"{len(process_queue)} files need to be processed", files=len(process_queue), scanned=len(scanned_paths))
 
     process_queue.sort(key=lambda f: f.name.lower())
 
-    for file_path in process_queue:
-        process_file(session, file_path)
+    return process_queue
+
+
+def get_session():
+    from src.infrastructure.connection import get_session
+
+    return get_session()
+
+
+def filter_new_files(session, file_paths):
+    from src.infrastructure.infrastructure import ensure_infrastructure
+    from src.infrastructure.query import filter_missing_media_names
+
+    # The schema is only checked once something actually needs the database
+    ensure_infrastructure()
+
+    candidates = {}
+    for file_path in file_paths:
+        candidates.setdefault(file_path.name, []).append(file_path)
+
+    return [
+        file_path
+        for name in filter_missing_media_names(session, candidates)
+        for file_path in candidates[name]
+    ]
+
+
+def get_plex_folders():
+    from src.processor.processor import get_plex_path
+
+    return [get_plex_path(Path(get_configuration(folder))) for folder in FOLDERS]
+
+
+def process_batch(process_queue, interactive, pipeline_class=None):
+    if not process_queue:
+        return
+
+    from src.processor.decisions import prepare_batch
+    from src.processor.pipeline import (
+        Pipeline,
+        run_pipeline
+    )
+
+    # Every question is asked before the heavy work starts, so processing itself never waits on input
+    # A file resuming after its edit needs no decisions, and the edited file would not match them anyway
+    resumable = {file_path for file_path in process_queue if get_resume_point(file_path)}
+
+    with timed("stage_seconds", stage="prescan"):
+        ready, _ = prepare_batch([file_path for file_path in process_queue if file_path not in resumable], interactive=interactive)
+    ready.update((file_path, {}) for file_path in resumable)
+
+    # One pipeline across every folder keeps the pools busy instead of draining folder by folder;
+    # small files go first so a batch of episodes is never stuck behind a large movie
+    run_pipeline(smallest_first([file_path for file_path in process_queue if file_path in ready]), ready, pipeline_class or Pipeline)
+
+
+def process_arrivals(file_paths):
+    # As in a full scan, a journaled file resumes even when a finished persist stage already stored it
+    journaled_paths = load_journaled_paths()
+    resumable = [file_path for file_path in file_paths if str(file_path) in journaled_paths]
+
+    with get_session() as session:
+        process_queue = resumable + filter_new_files(session, [file_path for file_path in file_paths if str(file_path) not in journaled_paths])
+
+    if len(process_queue) > 0:
+        log_event("queue_collected", f"{len(process_queue)} new files need to be processed", files=len(process_queue))
+        process_batch(process_queue, interactive=False)
+        write_run_metrics()
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Analyse media files and move them from Processing to Plex")
+    parser.add_argument(
+        "--unattended",
+        action="store_true",
+        help="never prompt; take duplicate-track decisions from the decisions file and defer undecided files"
+    )
+
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("run", help="process every file waiting in the processing folders (default)")
+    subparsers.add_parser("watch", help="keep running and process files as they land in the processing folders")
+    policy_parser = subparsers.add_parser("policy", help="score the processing folders against the track policy without touching any file")
+    policy_parser.add_argument(
+        "--candidate",
+        help="path to a changed policy file; lists every file it would handle differently"
+    )
+    analytics_parser = subparsers.add_parser("analytics", help="answer library questions from the pre-aggregated rollup tables")
+    analytics_parser.add_argument("report", choices=REPORTS, help="size per codec, codec share per category, bitrate per source, or titles missing subtitles")
+    analytics_parser.add_argument("--codec", default="HEVC", help="codec for codec-share")
+    analytics_parser.add_argument("--language", default="portuguese", help="subtitle language for missing-subtitles")
+    analytics_parser.add_argument("--rebuild", action="store_true", help="recompute the rollups from the media tables first")
+    fingerprint_parser = subparsers.add_parser(
+        "fingerprint",
+        help="fingerprint every file already in Plex and list the ones stored twice under different names"
+    )
+    fingerprint_parser.add_argument("--workers", type=int, help="files read at once; defaults to FINGERPRINT_WORKERS")
+    reindex_parser = subparsers.add_parser(
+        "reindex",
+        help="probe every file already in Plex, without editing or moving it, and record the ones missing from the database"
+    )
+    reindex_parser.add_argument("--refresh", action="store_true", help="also rewrite the rows of files already recorded, e.g. after a schema change")
+    reindex_parser.add_argument("--workers", type=int, help="files probed at once; defaults to REINDEX_WORKERS")
+    reindex_parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="probe and store files concurrently on one asyncio loop, up to ASYNC_INGEST_CONCURRENCY at once (or --workers)"
+    )
+    segment_uid_parser = subparsers.add_parser(
+        "segment-uid",
+        help="give every Matroska file a segment UID, copying the folder to a destination or fixing the files in place"
+    )
+    segment_uid_parser.add_argument("--source", help="folder to read; defaults to SEGMENT_UID_SOURCE_FOLDER")
+    segment_uid_parser.add_argument("--destination", help="folder to write; defaults to SEGMENT_UID_DESTINATION_FOLDER")
+    segment_uid_parser.add_argument("--in-place", action="store_true", help="fix files without a UID where they are instead of copying")
+    segment_uid_parser.add_argument("--no-inject", action="store_true", help="always remux with mkvmerge, even when a Void element has room for the UID")
+    segment_uid_parser.add_argument("--workers", type=int, help="files handled at once; defaults to SEGMENT_UID_WORKERS")
+
+    return parser.parse_args()
 
 
 def main():
+    arguments = parse_arguments()
+
     try:
-        create_infrastructure()
+        if arguments.command == "policy":
+            from src.processor.policy_report import score_tree
+            score_tree([get_configuration(folder) for folder in FOLDERS], arguments.candidate)
+            return
+
+        if arguments.command == "analytics":
+            from src.processor.analytics_report import run_report
+            run_report(arguments.report, arguments.codec, arguments.language, arguments.rebuild)
+            return
+
+        if arguments.command == "fingerprint":
+            from src.processor.library_fingerprint import fingerprint_library
+            fingerprint_library(get_plex_folders(), arguments.workers)
+            write_run_metrics()
+            return
+
+        if arguments.command == "reindex":
+            from src.processor.reindex import reindex_library
+            if arguments.refresh and arguments.use_async:
+                raise ValueError("--refresh rewrites rows in bulk and cannot be combined with --async")
+            reindex_library(get_plex_folders(), arguments.refresh, arguments.workers, arguments.use_async)
+            write_run_metrics()
+            return
+
+        if arguments.command == "segment-uid":
+            from src.processor.segment_uid import fix_segment_uids
+            fix_segment_uids(
+                arguments.source or get_configuration("segment_uid_source_folder"),
+                None if arguments.in_place else arguments.destination or get_configuration("segment_uid_destination_folder"),
+                inject=not arguments.no_inject,
+                workers=arguments.workers
+            )
+            write_run_metrics()
+            return
+
+        if arguments.command == "watch":
+            log_event("watcher_started", "Starting watcher")
+            from src.processor.decisions import get_decisions_path
+            watch_folders([get_configuration(folder) for folder in FOLDERS], process_arrivals, get_decisions_path())
+            return
 
-        print("Starting processor")
+        log_event("processor_started", "Starting processor")
 
-        folders = [
-            "processing_cartoon_folder"
-            ,"processing_movie_folder"
-            ,"processing_show_folder"
-            ,"processing_anime_movie_folder"
-            ,"processing_anime_show_folder"
-        ]
+        with timed("stage_seconds", stage="scan"):
+            process_queue = collect_process_queue([get_configuration(folder) for folder in FOLDERS])
 
-        for folder in folders:
-            with get_session() as session:
-                process_folder(session, get_configuration(folder))
+        process_batch(process_queue, interactive=not arguments.unattended)
+        write_run_metrics()
     except Exception as e:
-        print(f"An exception occurred during execution. {str(e)}")
+        log_event("run_failed", f"An exception occurred during execution. {str(e)}", error=str(e))
+        write_run_metrics()
 
 if __name__ == "__main__":
     main()
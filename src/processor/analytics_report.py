@@ -0,0 +1,59 @@
+from src.common.common import CODEC_SYNONYM_MAP
+
+REPORTS = ("codecs", "codec-share", "bitrate", "missing-subtitles")
+
+
+def run_report(report, codec="HEVC", language="portuguese", rebuild=False):
+    # Imported here so the command line can list REPORTS without loading SQLAlchemy
+    from src.infrastructure.analytics import (
+        get_bitrate_by_source,
+        get_codec_share_by_category,
+        get_contents_missing_subtitles,
+        get_size_by_codec,
+        rebuild_rollups
+    )
+    from src.infrastructure.connection import (
+        get_engine,
+        get_session
+    )
+    from src.infrastructure.infrastructure import ensure_infrastructure
+
+    ensure_infrastructure()
+
+    if rebuild:
+        with get_engine().begin() as conn:
+            rebuild_rollups(conn)
+        print("Rollups rebuilt from the media tables")
+
+    with get_session() as session:
+        if report == "codecs":
+            print(f"{'Codec':<16}{'Files':>8}{'Size (GiB)':>14}")
+            for name, count, size in get_size_by_codec(session):
+                print(f"{name:<16}{count:>8}{format_gib(size):>14}")
+
+        elif report == "codec-share":
+            # Codecs are stored normalized, so HEVC, H.265 and H265 all ask for the same rows
+            codec = CODEC_SYNONYM_MAP.get(codec.lower(), codec)
+            print(f"{'Category':<16}{codec:>8}{'Files':>8}{'Share':>9}")
+            for category, codec_count, count in get_codec_share_by_category(session, codec):
+                print(f"{category:<16}{codec_count:>8}{count:>8}{format_share(codec_count, count):>9}")
+
+        elif report == "bitrate":
+            print(f"{'Source':<24}{'Files':>8}{'Avg Mbit/s':>12}")
+            for name, bitrate_total, bitrate_count in get_bitrate_by_source(session):
+                average = f"{bitrate_total / bitrate_count / 1000000:.2f}" if bitrate_count else "-"
+                print(f"{name:<24}{bitrate_count:>8}{average:>12}")
+
+        elif report == "missing-subtitles":
+            rows = get_contents_missing_subtitles(session, language)
+            for name, category, count, with_subtitles in rows:
+                print(f"{name} ({category}): {with_subtitles} of {count} files have {language} subtitles")
+            print(f"{len(rows)} titles lack {language} subtitles on at least one file")
+
+
+def format_gib(size):
+    return f"{(size or 0) / 1024 ** 3:.2f}"
+
+
+def format_share(part, total):
+    return f"{part / total:.1%}" if total else "-"
@@ -0,0 +1,75 @@
+import asyncio
+
+from src.common.common import (
+    async_read_media_probe,
+    async_run_ffprobe,
+    MEDIA_RECORD_FIELDS
+)
+from src.common.configuration import get_int_configuration
+from src.common.fingerprint import read_content_fingerprint
+from src.common.metrics import (
+    increment,
+    log_event
+)
+from src.infrastructure.async_connection import get_async_session
+from src.infrastructure.async_query import (
+    get_media_name_by_fingerprint,
+    insert_media_bundle
+)
+from src.infrastructure.reference_cache import clear_reference_caches
+from src.processor.processor import (
+    build_media_record,
+    needs_ffprobe,
+    report_duplicate
+)
+
+
+async def ingest_file(file_path, semaphore):
+    async with semaphore:
+        fingerprint = await asyncio.to_thread(read_content_fingerprint, file_path)
+        media_probe = await async_read_media_probe(file_path, MEDIA_RECORD_FIELDS)
+        ffprobe_result = await async_run_ffprobe(file_path) if needs_ffprobe(media_probe) else None
+
+    record = build_media_record(file_path, media_probe, ffprobe_result)
+    if not record:
+        return False
+    record["media"]["fingerprint"] = fingerprint
+
+    # The content row is an upsert, so episodes of one season can be stored concurrently
+    async with get_async_session() as session:
+        duplicate_name = await get_media_name_by_fingerprint(session, fingerprint) if fingerprint else None
+        if report_duplicate(file_path, fingerprint, duplicate_name):
+            return False
+
+        media_id = await insert_media_bundle(session, **record)
+
+    if media_id is None:
+        log_event("media_exists", f"{file_path.name} is already in the database", file=file_path.name)
+
+    return media_id is not None
+
+
+async def ingest_files(file_paths, concurrency=None):
+    concurrency = concurrency or get_int_configuration("async_ingest_concurrency", 16)
+    semaphore = asyncio.Semaphore(concurrency)
+    clear_reference_caches()
+
+    results = await asyncio.gather(
+        *(ingest_file(file_path, semaphore) for file_path in file_paths),
+        return_exceptions=True
+    )
+
+    ingested = 0
+    for file_path, result in zip(file_paths, results):
+        if isinstance(result, Exception):
+            log_event("ingest_failed", f"An exception occurred while ingesting {file_path.name}. {str(result)}", file=file_path.name, error=str(result))
+            increment("files_total", outcome="failed")
+        elif result:
+            ingested += 1
+            increment("files_total", outcome="ingested")
+
+    return ingested
+
+
+def run_ingest(file_paths, concurrency=None):
+    return asyncio.run(ingest_files(file_paths, concurrency))
@@ -0,0 +1,184 @@
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from src.common.common import (
+    read_media_probe,
+    TRACK_LIST_FIELDS
+)
+from src.common.configuration import (
+    get_configuration,
+    get_state_folder
+)
+from src.common.metrics import (
+    log_event,
+    set_gauge
+)
+from src.processor.pipeline import get_stage_workers
+from src.processor.processor import (
+    extract_source,
+    extract_communication_tracks,
+    classify_tracks,
+    list_duplicate_groups,
+    prompt_track_to_keep
+)
+
+
+def get_decisions_path():
+    return Path(get_configuration("decisions_file", str(get_state_folder() / "decisions.json")))
+
+
+def load_decisions():
+    path = get_decisions_path()
+    if not path.exists():
+        return {}
+
+    with open(path, mode="r") as file:
+        return json.load(file)
+
+
+def save_decisions(decisions):
+    path = get_decisions_path()
+    temp_path = path.with_name(f".{path.name}.tmp")
+
+    with open(temp_path, mode="w") as file:
+        json.dump(decisions, file, indent=4, ensure_ascii=False)
+
+    os.replace(temp_path, path)
+
+
+def scan_file(file_path):
+    media_probe = read_media_probe(file_path, TRACK_LIST_FIELDS)
+    source = extract_source(file_path.name)
+    communication_tracks = extract_communication_tracks(media_probe)
+
+    if not source or not communication_tracks:
+        return None
+
+    tracks_by_language = classify_tracks(communication_tracks, source)
+    if not tracks_by_language:
+        return None
+
+    return {
+        "duplicates": {
+            key: [describe_track(track) for track in tracks]
+            for key, tracks in list_duplicate_groups(tracks_by_language)
+        },
+        "flagged": [
+            describe_track(track)
+            for languages in tracks_by_language.values()
+            for tracks in languages.values()
+            for track in tracks
+            if track["manual_review"]
+        ]
+    }
+
+
+def describe_track(track):
+    return {
+        "track_id": track["track_id"],
+        "title": track["title"],
+        "language": track["language"],
+        "new_title": track["new_title"]
+    }
+
+
+def prepare_batch(file_paths, interactive):
+    decisions = load_decisions()
+
+    with ThreadPoolExecutor(max_workers=get_stage_workers("probe")) as pool:
+        scans = list(pool.map(scan_file, file_paths))
+
+    pending_decisions = sum(
+        1 for file_path, scan in zip(file_paths, scans) if scan
+        for key in scan["duplicates"] if not get_answer(decisions, file_path, key)
+    )
+    flagged_tracks = sum(len(scan["flagged"]) for scan in scans if scan)
+    log_event(
+        "prescan_finished",
+        f"Pre-scan found {pending_decisions} pending duplicate-track decisions and {flagged_tracks} tracks flagged for manual review",
+        files=len(file_paths), pending_decisions=pending_decisions, flagged_tracks=flagged_tracks
+    )
+
+    # Under cron or systemd there is nobody to answer; every open question goes to the decisions file instead
+    if interactive and not sys.stdin.isatty():
+        log_event("prompts_skipped", "Standard input is not a terminal; running unattended")
+        interactive = False
+
+    if interactive:
+        try:
+            for file_path, scan in zip(file_paths, scans):
+                if scan and collect_file_decisions(decisions, file_path, scan):
+                    save_decisions(decisions)
+        except EOFError:
+            log_event("prompts_skipped", "Standard input closed; deferring the remaining questions")
+
+    ready, deferred = {}, []
+    for file_path, scan in zip(file_paths, scans):
+        # Files that cannot be classified are handed over untouched; the edit stage rejects them as before
+        if not scan:
+            ready[file_path] = {}
+            continue
+
+        entry = decisions.setdefault(file_path.name, {})
+        answers = {key: get_answer(decisions, file_path, key) for key in scan["duplicates"]}
+
+        if all(answers.values()) and entry.get("review") != "defer":
+            ready[file_path] = answers
+            continue
+
+        deferred.append(file_path)
+        duplicates = entry.setdefault("duplicates", {})
+        for key, options in scan["duplicates"].items():
+            duplicates.setdefault(key, {"keep": None, "options": options})
+        if scan["flagged"]:
+            entry["flagged"] = scan["flagged"]
+
+    decisions = {name: entry for name, entry in decisions.items() if entry}
+    save_decisions(decisions)
+
+    set_gauge("files_awaiting_decision", len(deferred))
+    set_gauge("pending_decisions", sum(
+        1 for entry in decisions.values()
+        for answer in entry.get("duplicates", {}).values() if not answer.get("keep")
+    ))
+    if deferred:
+        log_event(
+            "files_deferred",
+            f"{len(deferred)} files deferred until their decisions are filled in {get_decisions_path()}",
+            files=[file_path.name for file_path in deferred]
+        )
+
+    return ready, deferred
+
+
+def get_answer(decisions, file_path, key):
+    return decisions.get(file_path.name, {}).get("duplicates", {}).get(key, {}).get("keep")
+
+
+def collect_file_decisions(decisions, file_path, scan):
+    entry = decisions.setdefault(file_path.name, {})
+    duplicates = entry.setdefault("duplicates", {})
+    changed = False
+
+    for key, options in scan["duplicates"].items():
+        if get_answer(decisions, file_path, key):
+            continue
+
+        track_type, language, kind = key.split(":")
+        header = f"{file_path.name}: duplicate {track_type} tracks found for {language} ({kind.capitalize()}):"
+        duplicates[key] = {"keep": prompt_track_to_keep(header, options), "options": options}
+        changed = True
+
+    # Without an explicit answer a flagged file is processed with the automatic mapping, as before
+    if scan["flagged"] and "review" not in entry:
+        print(f"{file_path.name}: tracks flagged for manual review:")
+        for track in scan["flagged"]:
+            print(f"ID: {track['track_id']}, Old Title: {track['title']}, Language: {track['language']}, New Title: {track['new_title']}")
+        answer = input("Process with the automatic mapping? [Y/n]: ").strip().lower()
+        entry["review"] = "defer" if answer in ("n", "no") else "approve"
+        changed = True
+
+    return changed
@@ -0,0 +1,110 @@
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+from src.common.configuration import get_state_folder
+from src.common.fingerprint import read_content_fingerprint
+from src.common.metrics import log_event
+
+
+def get_connection():
+    # SQLite's default synchronous=FULL makes every recorded stage survive a crash or power loss
+    connection = sqlite3.connect(get_state_folder() / "stage_journal.db", timeout=30)
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS file_stage (
+            path TEXT PRIMARY KEY,
+            stage TEXT NOT NULL,
+            fingerprint TEXT,
+            data_path TEXT NOT NULL,
+            data_size INTEGER NOT NULL,
+            data_mtime_ns INTEGER NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """)
+    return connection
+
+
+def record_stage(file_path, stage, fingerprint, data_path):
+    stat = os.stat(data_path)
+    connection = get_connection()
+
+    try:
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO file_stage (path, stage, fingerprint, data_path, data_size, data_mtime_ns, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (str(file_path), stage, fingerprint, str(data_path), stat.st_size, stat.st_mtime_ns, time.time())
+            )
+    finally:
+        connection.close()
+
+
+def clear_stage(file_path):
+    connection = get_connection()
+
+    try:
+        with connection:
+            connection.execute("DELETE FROM file_stage WHERE path = ?", (str(file_path),))
+    finally:
+        connection.close()
+
+
+def load_journaled_paths():
+    connection = get_connection()
+    try:
+        rows = connection.execute("SELECT path FROM file_stage").fetchall()
+    finally:
+        connection.close()
+
+    return {path for (path,) in rows}
+
+
+def get_resume_point(file_path):
+    connection = get_connection()
+    try:
+        row = connection.execute(
+            "SELECT stage, fingerprint, data_path, data_size, data_mtime_ns FROM file_stage WHERE path = ?",
+            (str(file_path),)
+        ).fetchone()
+    finally:
+        connection.close()
+
+    if not row:
+        return None
+
+    stage, fingerprint, data_path, data_size, data_mtime_ns = row
+    data_path = Path(data_path)
+
+    try:
+        stat = os.stat(data_path)
+        valid = (stat.st_size, stat.st_mtime_ns) == (data_size, data_mtime_ns)
+    except FileNotFoundError:
+        valid = False
+
+    if valid and data_path != Path(file_path):
+        # A remux leaves the source untouched, so it must still be the file that was remuxed
+        valid = read_content_fingerprint(file_path) == fingerprint
+
+    if not valid:
+        log_event("journal_discarded", f"{Path(file_path).name} changed since its {stage} stage; starting over", file=Path(file_path).name, stage=stage)
+        clear_stage(file_path)
+        return None
+
+    return stage, data_path, fingerprint
+
+
+def prune_journal(scanned_roots, scanned_paths):
+    prefixes = tuple(os.path.join(str(root), "") for root in scanned_roots)
+    connection = get_connection()
+
+    try:
+        with connection:
+            # A file gone from its processing folder was moved or deleted, so there is nothing left to resume
+            stale = [
+                (path,) for (path,) in connection.execute("SELECT path FROM file_stage")
+                if path.startswith(prefixes) and path not in scanned_paths
+            ]
+            connection.executemany("DELETE FROM file_stage WHERE path = ?", stale)
+    finally:
+        connection.close()
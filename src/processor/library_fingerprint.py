@@ -0,0 +1,77 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from src.common.configuration import get_int_configuration
+from src.common.fingerprint import read_content_fingerprint
+from src.common.metrics import (
+    increment,
+    log_event
+)
+from src.infrastructure.connection import get_session
+from src.infrastructure.infrastructure import ensure_infrastructure
+from src.infrastructure.query import (
+    get_duplicate_fingerprints,
+    get_unfingerprinted_media_names,
+    update_media_fingerprints
+)
+from src.processor.scanner import scan_roots
+
+FINGERPRINT_BATCH_SIZE = 500
+
+
+def fingerprint_library(folders, workers=None):
+    ensure_infrastructure()
+    workers = max(1, workers or get_int_configuration("fingerprint_workers", 8))
+    fingerprinted = 0
+
+    # Files in Plex were already edited, so only media stored without a fingerprint get one from here
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fingerprint") as pool:
+        batch = []
+        for file_path, _, _ in scan_roots(folders):
+            batch.append(file_path)
+            if len(batch) >= FINGERPRINT_BATCH_SIZE:
+                fingerprinted += store_fingerprints(pool, batch)
+                batch = []
+
+        if batch:
+            fingerprinted += store_fingerprints(pool, batch)
+
+    with get_session() as session:
+        duplicates = get_duplicate_fingerprints(session)
+
+    for fingerprint, names in duplicates.items():
+        log_event("duplicate_found", f"Same content stored as: {', '.join(names)}", fingerprint=fingerprint, names=names)
+
+    log_event(
+        "library_fingerprinted",
+        f"{fingerprinted} files fingerprinted, {len(duplicates)} groups of duplicates",
+        files=fingerprinted, duplicate_groups=len(duplicates)
+    )
+
+    return duplicates
+
+
+def store_fingerprints(pool, file_paths):
+    with get_session() as session:
+        missing_names = get_unfingerprinted_media_names(session, [file_path.name for file_path in file_paths])
+    file_paths = [file_path for file_path in file_paths if file_path.name in missing_names]
+
+    fingerprints = {}
+    for file_path, fingerprint in zip(file_paths, pool.map(try_read_fingerprint, file_paths)):
+        if fingerprint:
+            fingerprints[file_path.name] = fingerprint
+
+    stored = 0
+    if fingerprints:
+        with get_session() as session:
+            stored = update_media_fingerprints(session, fingerprints)
+
+    increment("files_fingerprinted_total", stored)
+    return stored
+
+
+def try_read_fingerprint(file_path):
+    try:
+        return read_content_fingerprint(file_path)
+    except OSError as e:
+        log_event("fingerprint_failed", f"Unable to fingerprint {file_path}. {str(e)}", file=str(file_path), error=str(e))
+        return None
@@ -0,0 +1,193 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.common.common import (
+    read_media_probe,
+    read_track_list,
+    TRACK_LIST_FIELDS
+)
+from src.common.configuration import get_int_configuration
+from src.common.metrics import (
+    add_gauge,
+    increment,
+    log_event,
+    observe,
+    record_file,
+    record_file_stage,
+    set_gauge
+)
+from src.infrastructure.connection import get_session
+from src.infrastructure.query import (
+    get_media_by_name,
+    insert_media_bundle
+)
+from src.infrastructure.reference_cache import clear_reference_caches
+from src.common.fingerprint import read_content_fingerprint
+from src.processor.journal import (
+    clear_stage,
+    get_resume_point,
+    record_stage
+)
+from src.processor.processor import (
+    edit_media_tracks,
+    collect_media_record,
+    is_skipped_duplicate,
+    move_file_to_plex,
+    discard_staged_file
+)
+
+STAGES = ("probe", "edit", "persist", "move")
+DEFAULT_WORKERS = {
+    "probe": 4,
+    "edit": 4,
+    "persist": 2,
+    "move": 4
+}
+
+
+def get_stage_workers(stage):
+    return max(1, get_int_configuration(f"pipeline_{stage}_workers", DEFAULT_WORKERS[stage]))
+
+
+class Pipeline:
+    def __init__(self, decisions=None):
+        self.decisions = decisions
+        self.pools = {
+            stage: ThreadPoolExecutor(max_workers=get_stage_workers(stage), thread_name_prefix=f"pipeline-{stage}")
+            for stage in STAGES
+        }
+        self.in_flight = threading.BoundedSemaphore(get_int_configuration("pipeline_max_in_flight", 16))
+        self.pending = 0
+        self.pending_condition = threading.Condition()
+        self.fingerprints = {}
+        self.fingerprints_lock = threading.Lock()
+
+    def run(self, file_paths):
+        # Sources and contents are cached for one run, so a long-lived watcher re-reads them every batch
+        clear_reference_caches()
+        try:
+            for file_path in file_paths:
+                # Probing is cheap next to a remux; cap how far it runs ahead of the slower stages
+                self.in_flight.acquire()
+                with self.pending_condition:
+                    self.pending += 1
+                    set_gauge("files_in_flight", self.pending)
+                self.submit("probe", file_path)
+
+            with self.pending_condition:
+                self.pending_condition.wait_for(lambda: self.pending == 0)
+        finally:
+            for pool in self.pools.values():
+                pool.shutdown(wait=True)
+
+    def submit(self, stage, file_path, *args):
+        add_gauge("queue_depth", 1, stage=stage)
+        self.pools[stage].submit(self.run_stage, stage, file_path, *args)
+
+    def run_stage(self, stage, file_path, *args):
+        add_gauge("queue_depth", -1, stage=stage)
+        started = time.perf_counter()
+        outcome = "moved" if stage == "move" else "skipped"
+
+        try:
+            next_step = getattr(self, f"{stage}_stage")(file_path, *args)
+        except Exception as e:
+            log_event(
+                "stage_failed",
+                f"An exception occurred on stage {stage} for {file_path.name}. {str(e)}",
+                file=file_path.name, stage=stage, error=str(e)
+            )
+            next_step = None
+            outcome = "failed"
+
+        elapsed = time.perf_counter() - started
+        observe("stage_seconds", elapsed, stage=stage)
+        record_file_stage(file_path.name, stage, elapsed)
+
+        if next_step:
+            self.submit(*next_step)
+        else:
+            self.finish(file_path, stage, outcome)
+
+    def finish(self, file_path, stage, outcome):
+        increment("files_total", outcome=outcome)
+        record_file(file_path.name, outcome=outcome, last_stage=stage)
+        log_event("file_finished", file=file_path.name, outcome=outcome, stage=stage)
+
+        self.in_flight.release()
+        with self.pending_condition:
+            self.pending -= 1
+            set_gauge("files_in_flight", self.pending)
+            self.pending_condition.notify_all()
+
+    def probe_stage(self, file_path):
+        log_event("file_started", f"Processing file: {file_path.name}", file=file_path.name)
+
+        resume_point = get_resume_point(file_path)
+        if resume_point:
+            stage, data_path, fingerprint = resume_point
+            log_event("stage_resumed", f"Resuming {file_path.name} after its {stage} stage", file=file_path.name, stage=stage)
+            return ("persist", file_path, data_path, fingerprint) if stage == "edit" else ("move", file_path, data_path)
+
+        fingerprint = read_content_fingerprint(file_path)
+        with self.fingerprints_lock:
+            batch_name = self.fingerprints.setdefault(fingerprint, file_path.name) if fingerprint else None
+
+        with get_session() as session:
+            if is_skipped_duplicate(session, file_path, fingerprint, batch_name):
+                return None
+
+        read_media_probe(file_path, TRACK_LIST_FIELDS)
+        read_track_list(file_path)
+        return "edit", file_path, fingerprint
+
+    def edit_stage(self, file_path, fingerprint):
+        decisions = self.decisions.get(file_path, {}) if self.decisions is not None else None
+
+        data_path = edit_media_tracks(file_path, decisions)
+        if not data_path:
+            return None
+
+        record_stage(file_path, "edit", fingerprint, data_path)
+        return "persist", file_path, data_path, fingerprint
+
+    def persist_stage(self, file_path, data_path, fingerprint):
+        # On an exception the edited file and its journal entry are kept, so the next run retries from here
+        if not self.persist(file_path, data_path, fingerprint):
+            discard_staged_file(file_path, data_path)
+            clear_stage(file_path)
+            return None
+
+        record_stage(file_path, "persist", fingerprint, data_path)
+        return "move", file_path, data_path
+
+    def persist(self, file_path, data_path, fingerprint):
+        record = collect_media_record(file_path, data_path, fingerprint)
+        if not record:
+            return False
+
+        # The content row is an upsert, so episodes of one season can be stored concurrently
+        with get_session() as session:
+            media_id = insert_media_bundle(session, **record)
+            existing = get_media_by_name(session, file_path.name) if media_id is None and fingerprint else None
+
+        # The same name with the same content is this file, stored by a run that stopped before the move
+        if existing is not None and existing.fingerprint == fingerprint:
+            log_event("media_resumed", f"{file_path.name} was already stored; moving it", file=file_path.name)
+            return True
+
+        if media_id is None:
+            log_event("media_exists", f"{file_path.name} is already in the database", file=file_path.name)
+
+        return media_id is not None
+
+    def move_stage(self, file_path, data_path):
+        move_file_to_plex(file_path, data_path)
+        clear_stage(file_path)
+        log_event("file_moved", f"File moved from Processing to Plex: {file_path.name}", file=file_path.name)
+        return None
+
+
+def run_pipeline(file_paths, decisions=None, pipeline_class=Pipeline):
+    pipeline_class(decisions).run(file_paths)
@@ -0,0 +1,168 @@
+import json
+from collections import defaultdict
+from functools import lru_cache
+from pathlib import Path
+
+from src.common.common import (
+    detect_language,
+    detect_iso_language_code
+)
+from src.common.configuration import get_configuration
+
+DEFAULT_POLICY_PATH = Path(__file__).resolve().parent / "json" / "track_policy.json"
+
+
+class TrackPolicy:
+    def __init__(self, rules):
+        # Fix-ups run in order and each sees the language left by the previous one, as the old if-chain did
+        self.fixups = tuple(
+            (rule["id"], rule["language"], rule.get("title_contains", "").lower(), rule["set_language"])
+            for rule in rules["language_fixups"]
+        )
+
+        self.review_rules = defaultdict(list)
+        for rule in rules["review"]:
+            for track_type in ([rule["type"]] if "type" in rule else ["Audio", "Text"]):
+                self.review_rules[track_type].append((rule["id"], compile_condition(rule)))
+
+        forced = rules["forced"]
+        self.forced_keywords = tuple(keyword.lower() for keyword in forced["keywords"])
+        self.forced_frame_count = forced["frame_count_below"]
+        self.forced_sources = frozenset(forced["frame_count_sources"])
+
+        self.anime_markers = tuple(rules["anime_path_markers"])
+        self.keep_audio = {name: frozenset(keep["audio"]) for name, keep in rules["keep"].items()}
+        # Subtitle titles carry suffixes such as "(Forced)", so they are matched on their prefix
+        self.keep_subtitles = {name: tuple(keep["subtitles"]) for name, keep in rules["keep"].items()}
+
+    def classify(self, tracks, source):
+        categorized_tracks = {"audio": defaultdict(list), "text": defaultdict(list)}
+
+        for track in tracks:
+            track_info = self.evaluate_track(track, source)
+            category = "audio" if track_info["type"] == "Audio" else "text"
+            categorized_tracks[category][track_info["new_language"]].append(track_info)
+
+        return categorized_tracks
+
+    def evaluate_track(self, track, source):
+        track_type = track.track_type
+        title = track.title if track.title is not None else "unknown"
+        title_lower = title.lower()
+        language = track.language if track.language is not None else "unknown"
+        frame_count = track.frame_count
+        rules = []
+
+        for rule_id, from_language, title_contains, new_language in self.fixups:
+            if language == from_language and title_contains in title_lower:
+                language = new_language
+                rules.append(rule_id)
+
+        context = (language, title_lower, frame_count, source)
+        review_rules = [rule_id for rule_id, condition in self.review_rules[track_type] if condition(context)]
+        rules.extend(review_rules)
+
+        new_language = detect_language(language)
+        new_title = new_language.capitalize()
+
+        track_info = {
+            "track_id": track.unique_id,
+            "type": track_type,
+            "language": language,
+            "title": title,
+            "new_language": new_language,
+            "new_title": new_title,
+            "language_code": detect_iso_language_code(new_title),
+            "manual_review": bool(review_rules),
+            "frame_count": frame_count,
+            "rules": rules
+        }
+
+        if track_type == "Text":
+            track_info["forced"] = self.is_forced(title_lower, frame_count, source)
+            if track_info["forced"]:
+                track_info["new_title"] += " (Forced)"
+                rules.append("forced")
+
+        return track_info
+
+    def is_forced(self, title_lower, frame_count, source):
+        if any(keyword in title_lower for keyword in self.forced_keywords):
+            return True
+
+        return frame_count < self.forced_frame_count and source in self.forced_sources
+
+    def is_anime(self, file_path):
+        return all(marker in str(file_path) for marker in self.anime_markers)
+
+    def select_tracks(self, track_list, edits, anime):
+        keep = "anime" if anime else "default"
+        keep_audio, keep_subtitles = self.keep_audio[keep], self.keep_subtitles[keep]
+        audio_tracks, subtitle_tracks, removed_tracks, rejected_tracks = [], [], [], []
+
+        for track in track_list["tracks"]:
+            track_id = str(track["id"])
+            track_type = track["type"]
+            edit = edits.get(str(track["properties"].get("uid")), {})
+            # Rules apply to the names the file will have once the planned renames are in place
+            title = edit.get("name", track["properties"].get("track_name", "")).lower()
+
+            if "remove" in title:
+                removed_tracks.append(track_id)
+
+            if track_type == "audio":
+                if title in keep_audio:
+                    audio_tracks.append(track_id)
+                else:
+                    rejected_tracks.append((track_type, title))
+                    removed_tracks.append(track_id)
+
+            elif track_type == "subtitles":
+                if title.startswith(keep_subtitles):
+                    subtitle_tracks.append(track_id)
+                else:
+                    rejected_tracks.append((track_type, title))
+                    removed_tracks.append(track_id)
+
+        kept_audio = [t for t in audio_tracks if t not in removed_tracks]
+
+        return {
+            "remove": sorted(set(removed_tracks), key=int),
+            "audio": kept_audio,
+            "subtitles": [t for t in subtitle_tracks if t not in removed_tracks],
+            "rejected": rejected_tracks,
+            # As before the policy moved here: only anime aborts, and only when a wanted audio track was marked for removal
+            "aborted": anime and not kept_audio and len(audio_tracks) > 0
+        }
+
+
+def compile_condition(rule):
+    checks = []
+
+    if "language" in rule:
+        languages = frozenset(rule["language"])
+        checks.append(lambda context: context[0] in languages)
+    if "language_not_in" in rule:
+        excluded_languages = frozenset(rule["language_not_in"])
+        checks.append(lambda context: context[0] not in excluded_languages)
+    if "title_contains" in rule:
+        text = rule["title_contains"].lower()
+        checks.append(lambda context: text in context[1])
+    if "frame_count_max" in rule:
+        maximum = rule["frame_count_max"]
+        checks.append(lambda context: context[2] <= maximum)
+    if "source_in" in rule:
+        sources = frozenset(rule["source_in"])
+        checks.append(lambda context: context[3] in sources)
+
+    return lambda context: all(check(context) for check in checks)
+
+
+@lru_cache(maxsize=None)
+def load_policy(path):
+    with open(path, mode="r", encoding="utf-8") as file:
+        return TrackPolicy(json.load(file))
+
+
+def get_policy():
+    return load_policy(str(get_configuration("track_policy_file", DEFAULT_POLICY_PATH)))
@@ -0,0 +1,135 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from src.common.common import (
+    read_media_probe,
+    read_track_list,
+    TRACK_LIST_FIELDS
+)
+from src.common.metrics import log_event
+from src.processor.decisions import load_decisions
+from src.processor.pipeline import get_stage_workers
+from src.processor.policy import (
+    get_policy,
+    load_policy
+)
+from src.processor.processor import (
+    extract_source,
+    extract_communication_tracks,
+    resolve_duplicates,
+    build_track_edits
+)
+from src.processor.scanner import scan_roots
+
+
+def load_probes(file_path):
+    # Both reads go through the probe cache, so an unchanged tree is scored without opening a file
+    try:
+        return read_media_probe(file_path, TRACK_LIST_FIELDS), read_track_list(file_path)
+    except Exception as e:
+        log_event("policy_probe_failed", f"Unable to read {file_path.name}. {str(e)}", file=file_path.name, error=str(e))
+        return None, None
+
+
+def plan_file(file_path, media_probe, track_list, policy, answers):
+    source = extract_source(file_path.name)
+    communication_tracks = extract_communication_tracks(media_probe) if media_probe else []
+    if not source or not communication_tracks or not track_list:
+        return {"status": "skipped", "rules": Counter(), "review": False, "tracks": {}}
+
+    tracks_by_language = policy.classify(communication_tracks, source)
+    track_infos = [t for languages in tracks_by_language.values() for tracks in languages.values() for t in tracks]
+    rules = Counter(rule for track_info in track_infos for rule in track_info["rules"])
+    review = any(track_info["manual_review"] for track_info in track_infos)
+
+    organized_tracks = resolve_duplicates(tracks_by_language, answers)
+    if not organized_tracks:
+        return {"status": "pending", "rules": rules, "review": review, "tracks": {}}
+
+    edits = build_track_edits(organized_tracks)
+    selection = policy.select_tracks(track_list, edits, policy.is_anime(file_path))
+    removed = set(selection["remove"])
+
+    tracks = {}
+    for track in track_list["tracks"]:
+        if track["type"] not in ("audio", "subtitles"):
+            continue
+
+        uid = str(track["properties"].get("uid"))
+        edit = edits.get(uid, {})
+        tracks[uid] = (
+            edit.get("name", track["properties"].get("track_name", "")),
+            edit.get("language"),
+            edit.get("forced", False),
+            "remove" if str(track["id"]) in removed else "keep"
+        )
+
+    return {
+        "status": "aborted" if selection["aborted"] else "ok",
+        "rules": rules,
+        "review": review,
+        "tracks": tracks
+    }
+
+
+def get_file_answers(decisions, file_path):
+    duplicates = decisions.get(file_path.name, {}).get("duplicates", {})
+    return {key: entry.get("keep") for key, entry in duplicates.items()}
+
+
+def score_tree(folders, candidate_path=None):
+    file_paths = sorted((file_path for file_path, _, _ in scan_roots(folders)), key=lambda f: f.name.lower())
+
+    with ThreadPoolExecutor(max_workers=get_stage_workers("probe")) as pool:
+        probes = list(pool.map(load_probes, file_paths))
+
+    policy = get_policy()
+    candidate = load_policy(candidate_path) if candidate_path else None
+    decisions = load_decisions()
+
+    statuses, rules, actions = Counter(), Counter(), Counter()
+    flagged_files = 0
+    changed = []
+
+    for file_path, (media_probe, track_list) in zip(file_paths, probes):
+        answers = get_file_answers(decisions, file_path)
+        outcome = plan_file(file_path, media_probe, track_list, policy, answers)
+
+        statuses[outcome["status"]] += 1
+        rules.update(outcome["rules"])
+        actions.update(track[3] for track in outcome["tracks"].values())
+        flagged_files += outcome["review"]
+
+        if candidate is not None:
+            candidate_outcome = plan_file(file_path, media_probe, track_list, candidate, answers)
+            if (candidate_outcome["status"], candidate_outcome["tracks"]) != (outcome["status"], outcome["tracks"]):
+                changed.append((file_path, outcome, candidate_outcome))
+
+    print(f"Scored {len(file_paths)} files: " + ", ".join(f"{count} {status}" for status, count in sorted(statuses.items())))
+    print(f"Tracks kept: {actions['keep']}, removed: {actions['remove']}. Files flagged for manual review: {flagged_files}")
+    for rule, count in rules.most_common():
+        print(f"Rule {rule}: {count} tracks")
+
+    if candidate is not None:
+        print(f"{len(changed)} files would be handled differently under {candidate_path}")
+        for file_path, outcome, candidate_outcome in changed:
+            print_difference(file_path, outcome, candidate_outcome)
+
+    return changed
+
+
+def print_difference(file_path, outcome, candidate_outcome):
+    print(f"{file_path.name}: {outcome['status']} -> {candidate_outcome['status']}")
+
+    for uid in sorted(outcome["tracks"].keys() | candidate_outcome["tracks"].keys()):
+        before, after = outcome["tracks"].get(uid), candidate_outcome["tracks"].get(uid)
+        if before != after:
+            print(f"    UID {uid}: {format_track(before)} -> {format_track(after)}")
+
+
+def format_track(track):
+    if track is None:
+        return "-"
+
+    name, language, forced, action = track
+    return f"{action} '{name}' ({language}{', forced' if forced else ''})"
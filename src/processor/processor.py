@@ -1,62 +1,70 @@
-import shutil
-import json
+import os
 import subprocess
-from collections import defaultdict
+import threading
 from pathlib import Path
-from src.infrastructure.query import (
-    get_content_by_name,
-    insert_content,
-    insert_media,
-    get_audio_by_media_id_title_and_language,
-    get_subtitle_by_media_id_title_and_language,
-    insert_audio,
-    insert_subtitle
-)
+from src.infrastructure.query import get_media_name_by_fingerprint
 from src.common.common import (
     normalize_codec,
     detect_language,
-    run_media_info,
+    read_media_probe,
+    read_track_list,
     run_ffprobe,
-    detect_iso_language_code
+    TRACK_LIST_FIELDS,
+    MEDIA_RECORD_FIELDS
+)
+from src.common.cache import invalidate
+from src.common.configuration import get_configuration
+from src.common.io_scheduler import (
+    get_io_scheduler,
+    InsufficientSpace
+)
+from src.common.metrics import (
+    increment,
+    log_event,
+    record_file,
+    timed
 )
+from src.common.files import (
+    move_file,
+    staging_path
+)
+from src.processor.policy import get_policy
 
-FORCED_KEYWORDS = ["forced", "forçada", "forcednarrative"]
+# Parallel workers share the terminal, so only one of them may prompt for a duplicate at a time
+PROMPT_LOCK = threading.Lock()
 
 
-def process_file(session, file_path):
-    print(f"Processing file: {file_path.name}")
-    renamed_file = rename_media_tracks(file_path)
+def is_skipped_duplicate(session, file_path, fingerprint, batch_name=None):
+    # A release queued twice in one batch is caught here, before either copy reaches the database
+    duplicate_name = batch_name if batch_name != file_path.name else None
+    if duplicate_name is None and fingerprint:
+        duplicate_name = get_media_name_by_fingerprint(session, fingerprint)
 
-    if renamed_file:
-        updated_file = remove_unwanted_tracks(file_path)
+    return report_duplicate(file_path, fingerprint, duplicate_name)
 
-        if updated_file:
-            collected_file = extract_media_info(session, file_path)
 
-            if collected_file:
-                move_file_to_plex(file_path)
-                print(f"File moved from Processing to Plex: {file_path.name}")
-                print(
-                    "------------------------------------------------------------------------------------------------")
-                print(
-                    "------------------------------------------------------------------------------------------------")
-                print(
-                    "------------------------------------------------------------------------------------------------")
-                print(
-                    "------------------------------------------------------------------------------------------------")
-                print(
-                    "------------------------------------------------------------------------------------------------")
+def report_duplicate(file_path, fingerprint, duplicate_name):
+    if duplicate_name is None or duplicate_name == file_path.name:
+        return False
 
-                return
+    # The fingerprint is taken before any edit, so it matches the same release however the file was named
+    skip = get_configuration("duplicate_mode", "skip") == "skip"
+    increment("duplicates_total", action="skipped" if skip else "flagged")
+    log_event(
+        "duplicate_found",
+        f"{file_path.name} has the same content as {duplicate_name}" + (", leaving it in Processing" if skip else ""),
+        file=file_path.name, duplicate_of=duplicate_name, fingerprint=fingerprint, skipped=skip
+    )
+    return skip
 
 
-def rename_media_tracks(file_path):
-    media_info = run_media_info(file_path)
+def rename_media_tracks(file_path, decisions=None):
+    media_probe = read_media_probe(file_path, TRACK_LIST_FIELDS)
     source = extract_source(file_path.name)
     if not source:
         return False
 
-    communication_tracks = extract_communication_tracks(media_info)
+    communication_tracks = extract_communication_tracks(media_probe)
     if not communication_tracks:
         return False
 
@@ -64,243 +72,261 @@ def rename_media_tracks(file_path):
     if not tracks_by_language:
         return False
 
-    organized_tracks = resolve_duplicates(tracks_by_language)
+    organized_tracks = resolve_duplicates(tracks_by_language, decisions)
     if not organized_tracks:
         return False
 
-    return apply_edits(file_path, organized_tracks)
+    return organized_tracks
 
 
 def extract_source(file_name):
     return file_name.split("] ")[0][1:] if "] " in file_name else None
 
 
-def extract_communication_tracks(media_info):
-    return [track for track in media_info.get("media", {}).get("track", []) if track.get("@type") in ("Audio", "Text")]
-
+def extract_communication_tracks(media_probe):
+    return media_probe.communication_tracks
 
-def classify_tracks(tracks, source):
-    categorized_tracks = {"audio": defaultdict(list), "text": defaultdict(list)}
 
-    for track in tracks:
-        track_info = extract_track_info(track, source)
-        if not track_info:
-            return False
+def classify_tracks(tracks, source, policy=None):
+    categorized_tracks = (policy or get_policy()).classify(tracks, source)
 
-        category = "audio" if track_info["type"] == "Audio" else "text"
-        categorized_tracks[category][track_info["new_language"]].append(track_info)
+    for track_info in (t for languages in categorized_tracks.values() for track_list in languages.values() for t in track_list):
+        log_event(
+            "track_mapped",
+            f"Mapped {track_info['type']}. Original code: {track_info['language']}. New Code: {track_info['language_code']}. Code lang: {track_info['new_language']}. Original title: {track_info['title']}. New title: {track_info['new_title']}. Frame count: {track_info['frame_count']}. ID: {track_info['track_id']}",
+            track_id=track_info["track_id"], type=track_info["type"], language=track_info["language"],
+            new_title=track_info["new_title"], rules=track_info["rules"]
+        )
 
     return categorized_tracks
 
 
-def extract_track_info(track, source):
-    track_id = track.get("UniqueID")
-    track_type = track.get("@type")
-    title = track.get("Title", "unknown")
-    language = track.get("Language", "unknown")
+def resolve_duplicates(tracks_by_language, decisions=None):
+    organized_tracks = []
 
-    if language == 'ja' and "english" in title.lower():
-        language = 'en'
+    for track_type, languages in tracks_by_language.items():
+        for language, track_list in languages.items():
+            normal_tracks, forced_tracks = split_duplicate_candidates(track_list)
 
-    if language == 'en' and "japanese" in title.lower():
-        language = 'ja'
+            for kind, duplicate_tracks in (("normal", normal_tracks), ("forced", forced_tracks)):
+                if len(duplicate_tracks) < 2:
+                    continue
 
-    if language == 'enm':
-        language = 'en'
+                keep_id = choose_track_to_keep(track_type, language, kind, duplicate_tracks, decisions)
+                if not keep_id:
+                    return False
 
-    # if language == "unknown" or language == "mt" or language == "ms" or language == "zu":
-        # language = 'chi'
+                for track in duplicate_tracks:
+                    if track['track_id'] != keep_id:
+                        track['new_title'] = "remove"
 
-    if language == "unknown" or "eng" in title.lower() and language not in ("eng", "eg", "en"):
-        #return False
-        manual_review = True
+            organized_tracks.extend(normal_tracks + forced_tracks)
 
-    if track_type == "Text" and language == 'ja' or track_type == "Text" and "sign" in title.lower():
-        manual_review = True
+    return organized_tracks
 
-    new_language = detect_language(language)
-    new_title = new_language.capitalize()
-    language_code = detect_iso_language_code(new_title)
-    frame_count = int(track.get("FrameCount", 0))
 
-    track_info = {
-        "track_id": track_id,
-        "type": track_type,
-        "language": language,
-        "title": title,
-        "new_language": new_language,
-        "new_title": new_title,
-        "language_code": language_code
-    }
+def split_duplicate_candidates(track_list):
+    forced_tracks = [t for t in track_list if "(Forced)" in t["new_title"]]
+    normal_tracks = [t for t in track_list if "(Forced)" not in t["new_title"]]
+    normal_tracks = [t for t in normal_tracks if "remove" not in t["new_language"]]
+    return normal_tracks, forced_tracks
 
-    if track_type == "Text":
-        if frame_count == 0 and source == 'Max' or frame_count == 0 and source == 'Disney+':
-            manual_review = True
 
-        track_info["forced"] = False
-        if any(keyword in title.lower() for keyword in FORCED_KEYWORDS):
-            track_info["forced"] = True
-        #elif is_likely_forced(frame_count) and source == 'Max' or is_likely_forced(frame_count) and source == 'Disney+':
-        elif is_likely_forced(frame_count) and source == 'Max':
-            track_info["forced"] = True
+def list_duplicate_groups(tracks_by_language):
+    for track_type, languages in tracks_by_language.items():
+        for language, track_list in languages.items():
+            normal_tracks, forced_tracks = split_duplicate_candidates(track_list)
 
-        if track_info["forced"]:
-            track_info["new_title"] += " (Forced)"
+            for kind, duplicate_tracks in (("normal", normal_tracks), ("forced", forced_tracks)):
+                if len(duplicate_tracks) > 1:
+                    yield duplicate_decision_key(track_type, language, kind), duplicate_tracks
 
-    new_title = track_info["new_title"]
-    print(f"Mapped {track_type}. Original code: {language}. New Code: {language_code}. Code lang: {new_language}. Original title: {title}. New title: {new_title}. Frame count: {frame_count}. ID: {track_id}")
 
-    return track_info
+def duplicate_decision_key(track_type, language, kind):
+    return f"{track_type}:{language}:{kind}"
 
 
-def is_likely_forced(frame_count):
-    return frame_count < 200
+def choose_track_to_keep(track_type, language, kind, tracks, decisions):
+    # Batch runs collect every answer up front; a missing one defers the file instead of blocking
+    if decisions is not None:
+        keep_id = decisions.get(duplicate_decision_key(track_type, language, kind))
+        return str(keep_id) if keep_id else None
 
+    with PROMPT_LOCK:
+        return prompt_track_to_keep(f"Duplicate {track_type} tracks found for {language} ({kind.capitalize()}):", tracks)
 
-def resolve_duplicates(tracks_by_language):
-    organized_tracks = []
 
-    for track_type, languages in tracks_by_language.items():
-        for language, track_list in languages.items():
-            forced_tracks = [t for t in track_list if "(Forced)" in t["new_title"]]
-            normal_tracks = [t for t in track_list if "(Forced)" not in t["new_title"]]
-            normal_tracks = [t for t in normal_tracks if "remove" not in t["new_language"]]
+def prompt_track_to_keep(header, tracks):
+    print(header)
+    for track in tracks:
+        print(f"ID: {track['track_id']}, Old Title: {track['title']}, New Title: {track['new_title']}")
+    keep_id = input("Enter the track ID to keep (0 to skip the file): ").strip()
 
-            if len(normal_tracks) > 1:
-                print(f"Duplicate {track_type} tracks found for {language} (Normal):")
-                for track in normal_tracks:
-                    print(f"ID: {track['track_id']}, Old Title: {track['title']}, New Title: {track['new_title']}")
-                keep_id = input("Enter the track ID to keep: ")
+    if keep_id in ("", "0"):
+        return None
 
-                if keep_id == 0:
-                    return False
+    return keep_id
 
-                for track in normal_tracks:
-                    if track['track_id'] != keep_id:
-                        track['new_title'] = "remove"
 
-            if len(forced_tracks) > 1:
-                print(f"Duplicate {track_type} tracks found for {language} (Forced):")
-                for track in forced_tracks:
-                    print(f"ID: {track['track_id']}, Old Title: {track['title']}, New Title: {track['new_title']}")
-                keep_id = input("Enter the track ID to keep: ")
+def edit_media_tracks(file_path, decisions=None):
+    plan = build_edit_plan(file_path, decisions)
+    if not plan:
+        return None
 
-                if keep_id == 0:
-                    return False
+    return apply_edit_plan(file_path, plan)
 
-                for track in forced_tracks:
-                    if track['track_id'] != keep_id:
-                        track['new_title'] = "remove"
 
-            organized_tracks.extend(normal_tracks + forced_tracks)
+def build_edit_plan(file_path, decisions=None):
+    organized_tracks = rename_media_tracks(file_path, decisions)
+    if not organized_tracks:
+        return None
 
-    return organized_tracks
+    edits = build_track_edits(organized_tracks)
 
+    track_list = read_track_list(file_path)
+    if not track_list:
+        return None
 
-def apply_edits(file_path, tracks):
-    for track in tracks:
-        edit_params = {"name": track["new_title"], "language": track["language_code"]}
-        if track.get("forced"):
-            edit_params["flag-forced"] = 1
+    selection = select_wanted_tracks(file_path, track_list, edits)
+    if not selection:
+        return None
 
-        mkv_edit_cmd = f"mkvpropedit \"{str(file_path)}\""
-        for param, value in edit_params.items():
-            mkv_edit_cmd += f" --edit track:={track['track_id']} --set {param}=\"{value}\""
+    return {"edits": edits, "tracks": track_list["tracks"], **selection}
 
-        try:
-            subprocess.run(mkv_edit_cmd, shell=True, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        except subprocess.CalledProcessError as e:
-            print(f"Error on track {track['track_id']}: {e}")
-            return False
 
-    return True
+def build_track_edits(organized_tracks):
+    return {
+        str(track["track_id"]): {
+            "name": track["new_title"],
+            "language": track["language_code"],
+            "forced": bool(track.get("forced"))
+        }
+        for track in organized_tracks
+    }
 
 
-def remove_unwanted_tracks(mkv_file):
-    anime_content = "Processing" in str(mkv_file) and "Anime" in str(mkv_file)
+def select_wanted_tracks(mkv_file, track_list, edits, policy=None):
+    policy = policy or get_policy()
+    selection = policy.select_tracks(track_list, edits, policy.is_anime(mkv_file))
 
-    cmd = ["mkvmerge", "-J", mkv_file]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        print(f"Error processing {mkv_file}: {result.stderr}")
-        return False
+    for track_type, title in selection.pop("rejected"):
+        log_event(
+            "track_rejected",
+            f"Removing track type {track_type} of title: '{title}' for breaking language rules",
+            file=mkv_file.name, type=track_type, title=title
+        )
 
-    mkv_info = json.loads(result.stdout)
-    audio_tracks, subtitle_tracks, removed_tracks = [], [], []
+    if selection.pop("aborted"):
+        log_event("edit_aborted", "There's only one audio track left and it would be removed. Aborting.", file=mkv_file.name)
+        return None
 
-    for track in mkv_info["tracks"]:
-        track_id = str(track["id"])
-        track_type = track["type"]
-        title = track["properties"].get("track_name", "").lower()
-        language = track["properties"].get("language", "unknown")
-
-        if 'remove' in title:
-            removed_tracks.append(track_id)
-
-        if track_type == "audio":
-            if anime_content and title not in {"japanese", "chinese"}:
-                print(f"Removing track type {track_type} of title: '{title}' for breaking language rules")
-                removed_tracks.append(track_id)
-            elif not anime_content and title not in {"english", "portuguese"}:
-                print(f"Removing track type {track_type} of title: '{title}' for breaking language rules")
-                removed_tracks.append(track_id)
-            else:
-                audio_tracks.append(track_id)
-
-        elif track_type == "subtitles":
-            if not any(title.startswith(lang) for lang in {"english", "portuguese"}):
-                print(f"Removing track type {track_type} of title: '{title}' for breaking language rules")
-                removed_tracks.append(track_id)
-            else:
-                subtitle_tracks.append(track_id)
-
-    audio_tracks_after_removal = [t for t in audio_tracks if t not in removed_tracks]
-
-    if anime_content and len(audio_tracks_after_removal) == 0 and any(
-            track_id in removed_tracks for track_id in audio_tracks):
-        print("There's only one audio track left and it would be removed. Aborting.")
-        return False
+    return selection
 
-    if not removed_tracks:
-        return True
 
-    temp_file = f"temp_{mkv_file}"
-    mkvmerge_cmd = ["mkvmerge", "-o", temp_file, "-a", ",".join(audio_tracks_after_removal),
-                    "-s", ",".join(subtitle_tracks), mkv_file]
+def apply_edit_plan(file_path, plan):
+    if plan["remove"]:
+        return remux_with_plan(file_path, plan)
+
+    try:
+        return edit_headers_with_plan(file_path, plan)
+    finally:
+        # mkvpropedit rewrites the header in place, so earlier probes of this file are stale
+        invalidate(file_path)
+
+
+def edit_headers_with_plan(file_path, plan):
+    if not plan["edits"]:
+        return file_path
+
+    mkvpropedit_cmd = ["mkvpropedit", str(file_path)]
+    for track_uid, edit in plan["edits"].items():
+        mkvpropedit_cmd += [
+            "--edit", f"track:={track_uid}",
+            "--set", f"name={edit['name']}",
+            "--set", f"language={edit['language']}"
+        ]
+        if edit["forced"]:
+            mkvpropedit_cmd += ["--set", "flag-forced=1"]
+
+    with timed("tool_seconds", tool="mkvpropedit"):
+        result = subprocess.run(mkvpropedit_cmd, capture_output=True, text=True)
+
+    if result.returncode != 0:
+        log_event("edit_failed", f"Error editing {file_path}: {result.stdout or result.stderr}", file=file_path.name, tool="mkvpropedit")
+        return None
+
+    return file_path
 
-    result = subprocess.run(mkvmerge_cmd, capture_output=True, text=True)
+
+def remux_with_plan(file_path, plan):
+    # The remux is the only full write of the file, so it goes straight to the Plex folder;
+    # move_file_to_plex later commits it under its final name
+    staged_file = staging_path(get_plex_path(file_path))
+    staged_file.parent.mkdir(parents=True, exist_ok=True)
+    mkvmerge_cmd = ["mkvmerge", "-o", str(staged_file)]
+
+    for track in plan["tracks"]:
+        track_id = str(track["id"])
+        edit = plan["edits"].get(str(track["properties"].get("uid")))
+
+        if not edit or track_id in plan["remove"]:
+            continue
+
+        mkvmerge_cmd += ["--track-name", f"{track_id}:{edit['name']}", "--language", f"{track_id}:{edit['language']}"]
+        if edit["forced"]:
+            mkvmerge_cmd += ["--forced-track", f"{track_id}:1"]
+
+    mkvmerge_cmd += ["-a", ",".join(plan["audio"])]
+    mkvmerge_cmd += ["-s", ",".join(plan["subtitles"])] if plan["subtitles"] else ["-S"]
+    mkvmerge_cmd.append(str(file_path))
+
+    # The remux output is at most the size of its source, which is what must fit on the destination
+    source_size = file_path.stat().st_size
+    try:
+        # mkvmerge's I/O cannot be paced from here, so a remux is bounded by its device slot alone
+        with get_io_scheduler().reserve([file_path, staged_file.parent], source_size, staged_file.parent):
+            with timed("tool_seconds", tool="mkvmerge"):
+                result = subprocess.run(mkvmerge_cmd, capture_output=True, text=True)
+    except InsufficientSpace as e:
+        log_event("remux_deferred", f"Not enough space to remux {file_path.name}. {str(e)}", file=file_path.name, error=str(e))
+        return None
 
     if result.returncode == 0:
-        subprocess.run(["mv", temp_file, mkv_file])
-        print(f"Tracks removed successfully from {mkv_file}")
-        return True
+        rewritten_bytes = staged_file.stat().st_size
+        increment("bytes_rewritten_total", rewritten_bytes)
+        record_file(file_path.name, bytes_rewritten=rewritten_bytes)
+        log_event("remux_finished", f"Tracks removed successfully from {file_path}", file=file_path.name, bytes=rewritten_bytes)
+        return staged_file
     else:
-        print(f"Error processing {mkv_file}: {result.stderr}")
-        return False
+        log_event("edit_failed", f"Error processing {file_path}: {result.stdout or result.stderr}", file=file_path.name, tool="mkvmerge")
+        discard_staged_file(file_path, staged_file)
+        return None
+
 
+def collect_media_record(file_path, data_path=None, fingerprint=None):
+    data_path = data_path or file_path
+    media_probe = read_media_probe(data_path, MEDIA_RECORD_FIELDS)
+    ffprobe_result = run_ffprobe(data_path) if needs_ffprobe(media_probe) else None
 
-def extract_media_info(session, file_path):
-    media_info = run_media_info(file_path)
+    record = build_media_record(file_path, media_probe, ffprobe_result)
+    if record:
+        record["media"]["fingerprint"] = fingerprint
 
+    return record
+
+
+def needs_ffprobe(media_probe):
+    return not media_probe.video.duration or not media_probe.video.framerate
+
+
+def build_media_record(file_path, media_probe, ffprobe_result=None):
     content_name = file_path.name.split(" - ", 1)[1].rsplit(".", 1)[0] if "Movie" in str(file_path) else file_path.parent.parent.name
 
     source = file_path.name.split("] ")[0][1:] if "] " in file_path.name else "Unknown"
-    general_track = next((track for track in media_info.get("media", {}).get("track", []) if track.get("@type") == "General"),
-                         {})
-    file_size = general_track.get("FileSize")
-    file_extension = general_track.get("FileExtension")
-    overall_bitrate = general_track.get("OverallBitRate", 0)
-
-    video_track = next((track for track in media_info.get("media", {}).get("track", []) if track.get("@type") == "Video"), {})
-    codec = normalize_codec(video_track.get("Format"))
-    duration = int(float(video_track.get("Duration", 0))) if video_track.get("Duration") else None
-
-    bitrate_mode = video_track.get("BitRate_Mode")
-    width = int(video_track.get("Width", 0)) if video_track.get("Width") else None
-    height = int(video_track.get("Height", 0)) if video_track.get("Height") else None
-    framerate_mode = video_track.get("FrameRate_Mode")
-    framerate = float(video_track.get("FrameRate", 0)) if video_track.get("FrameRate") else None
-    bitdepth = int(video_track.get("BitDepth", 0)) if video_track.get("BitDepth") else None
+    general_track, video_track = media_probe.general, media_probe.video
+    codec = normalize_codec(video_track.format)
+    duration = video_track.duration
+    framerate = video_track.framerate
 
     if "Season" in file_path.parent.name:
         media_type = 'Season Episode'
@@ -320,52 +346,86 @@ def extract_media_info(session, file_path):
 
     if not duration or not framerate:
         # Handling rare cases where the .mkv was created without trusted metadata
-        ffprobe_result = run_ffprobe(file_path)
+        ffprobe_result = ffprobe_result or {}
 
         duration = int(float(ffprobe_result["format"]["duration"])) if "format" in ffprobe_result else None
         framerate = 25
 
     if not duration or not framerate:
-        return False
-
-    content = get_content_by_name(session, content_name)
-    if not content:
-        content = insert_content(session, content_name, category)
-        content_id = content.id
-    else:
-        content_id = content.id
-
-    media = insert_media(session, source, media_type, content_id, file_path.name, codec, duration, bitrate_mode, width, height,
-                 framerate_mode, framerate, bitdepth, file_size, file_extension, overall_bitrate)
-
-    if media:
-        for track in media_info.get("media", {}).get("track", []):
-            if track.get("@type") == "Audio":
-                audio = get_audio_by_media_id_title_and_language(session, media.id, track.get("Title"), track.get("Language"))
+        return None
+
+    audios = [
+        {
+            "format": track.format,
+            "channels": track.channels,
+            "title": track.title,
+            "language": detect_language(track.language or "")
+        }
+        for track in media_probe.audios
+    ]
+    subtitles = [
+        {
+            "title": track.title,
+            "language": detect_language(track.language or ""),
+            "is_forced": track.forced
+        }
+        for track in media_probe.texts
+    ]
+
+    return {
+        "content_name": content_name,
+        "category": category,
+        "source_name": source,
+        "media": {
+            "media_type": media_type,
+            "name": file_path.name,
+            "codec": codec,
+            "duration": duration,
+            "bitrate_mode": video_track.bitrate_mode,
+            "width": video_track.width,
+            "height": video_track.height,
+            "framerate_mode": video_track.framerate_mode,
+            "framerate": framerate,
+            "bitdepth": video_track.bitdepth,
+            "file_size": general_track.file_size,
+            "file_extension": general_track.file_extension,
+            "overall_bitrate": general_track.overall_bitrate
+        },
+        "audios": audios,
+        "subtitles": subtitles
+    }
 
-                if not audio:
-                    insert_audio(session, media.id, track.get("Format"), int(track.get("Channels", 0)), track.get("Title"), detect_language(track.get("Language", "")))
-            elif track.get("@type") == "Text":
-                subtitle = get_subtitle_by_media_id_title_and_language(session, media.id, track.get("Title"),
-                                                                 track.get("Language"))
 
-                if not subtitle:
-                    insert_subtitle(session, media.id, track.get("Title"),
-                        detect_language(track.get("Language", "")),
-                        track.get("Forced") == "Yes")
+def get_plex_path(file_path):
+    new_path_parts = list(file_path.parts)
+    new_path_parts[new_path_parts.index('Processing')] = 'Plex'
+    return Path(*new_path_parts)
 
-    return True
 
+def move_file_to_plex(file_path, data_path=None):
+    new_path = get_plex_path(file_path)
 
-def move_file_to_plex(file_path):
-    new_path_parts = list(file_path.parts)
-    new_path_parts[new_path_parts.index('Processing')] = 'Plex'
-    new_path = Path(*new_path_parts)
+    if data_path and data_path != file_path:
+        # The remux already wrote the data next to its destination; commit it and drop the original
+        moved_bytes = data_path.stat().st_size
+        os.replace(data_path, new_path)
+        os.remove(file_path)
+        invalidate(data_path)
+        increment("bytes_moved_total", moved_bytes, method="staged")
+    else:
+        moved_bytes = file_path.stat().st_size
+        increment("bytes_moved_total", moved_bytes, method=move_file(file_path, new_path, get_io_scheduler()))
 
-    new_path.parent.mkdir(parents=True, exist_ok=True)
+    record_file(file_path.name, bytes_moved=moved_bytes)
 
-    shutil.move(str(file_path), str(new_path))
+    invalidate(file_path)
 
     if new_path.exists():
         return True
     return False
+
+
+def discard_staged_file(file_path, data_path):
+    if data_path and data_path != file_path and data_path.exists():
+        data_path.unlink()
+        invalidate(data_path)
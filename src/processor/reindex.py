@@ -0,0 +1,135 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from src.common.configuration import get_int_configuration
+from src.common.fingerprint import read_content_fingerprint
+from src.common.metrics import (
+    increment,
+    log_event,
+    timed
+)
+from src.infrastructure.analytics import rebuild_rollups
+from src.infrastructure.bulk import merge_records
+from src.infrastructure.connection import (
+    get_engine,
+    get_session
+)
+from src.infrastructure.infrastructure import ensure_infrastructure
+from src.infrastructure.query import (
+    filter_missing_media_names,
+    MEMBERSHIP_CHUNK_SIZE
+)
+from src.processor.processor import collect_media_record
+from src.processor.scanner import scan_roots
+
+REINDEX_BATCH_SIZE = 1000
+
+
+def reindex_library(folders, refresh=False, workers=None, use_async=False):
+    ensure_infrastructure()
+    if use_async:
+        return ingest_library(folders, workers)
+
+    workers = max(1, workers or get_int_configuration("reindex_workers", 8))
+    counts = {"probed": 0, "merged": 0, "failed": 0}
+    batch = []
+
+    def collect(future):
+        record = future.result()
+        if not record:
+            counts["failed"] += 1
+            return
+
+        counts["probed"] += 1
+        batch.append(record)
+        if len(batch) >= REINDEX_BATCH_SIZE:
+            counts["merged"] += merge_batch(batch, refresh)
+            batch.clear()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reindex") as pool:
+        pending = deque()
+
+        for file_path in iter_reindex_candidates(folders, refresh):
+            pending.append(pool.submit(probe_file, file_path))
+
+            # Enough queued to keep every worker busy while a batch merges, without holding the whole tree
+            while len(pending) > workers * 4 or (pending and pending[0].done()):
+                collect(pending.popleft())
+
+        while pending:
+            collect(pending.popleft())
+
+    if batch:
+        counts["merged"] += merge_batch(batch, refresh)
+
+    # One set-based pass instead of per-row rollup updates during the merge
+    with get_engine().begin() as conn:
+        rebuild_rollups(conn)
+
+    log_event(
+        "reindex_finished",
+        f"Reindex finished: {counts['probed']} files probed, {counts['merged']} media rows written, {counts['failed']} files unreadable",
+        **counts
+    )
+
+    return counts
+
+
+def ingest_library(folders, concurrency=None):
+    # Imported here so the aiosqlite/asyncpg driver is only needed when asked for
+    from src.processor.async_ingest import run_ingest
+
+    file_paths = list(iter_reindex_candidates(folders, refresh=False))
+    with timed("stage_seconds", stage="reindex_ingest"):
+        ingested = run_ingest(file_paths, concurrency)
+
+    counts = {"probed": len(file_paths), "merged": ingested, "failed": len(file_paths) - ingested}
+    log_event(
+        "reindex_finished",
+        f"Reindex finished: {counts['probed']} files found, {counts['merged']} media rows written, {counts['failed']} files not stored",
+        **counts
+    )
+
+    return counts
+
+
+def iter_reindex_candidates(folders, refresh):
+    seen_names = set()
+    chunk = {}
+
+    def flush():
+        names = list(chunk) if refresh else filter_missing_media_names(session, chunk)
+        for name in names:
+            yield chunk[name]
+        chunk.clear()
+
+    with get_session() as session:
+        for file_path, _, _ in scan_roots(folders):
+            # media.name is unique, so only the first file of a name is indexed
+            if file_path.name in seen_names:
+                continue
+            seen_names.add(file_path.name)
+
+            chunk[file_path.name] = file_path
+            if len(chunk) >= MEMBERSHIP_CHUNK_SIZE:
+                yield from flush()
+
+        if chunk:
+            yield from flush()
+
+
+def probe_file(file_path):
+    try:
+        return collect_media_record(file_path, fingerprint=read_content_fingerprint(file_path))
+    except Exception as e:
+        log_event("reindex_probe_failed", f"Unable to probe {file_path}. {str(e)}", file=str(file_path), error=str(e))
+        return None
+
+
+def merge_batch(records, refresh):
+    with timed("stage_seconds", stage="reindex_merge"), get_engine().begin() as conn:
+        merged = merge_records(conn, records, refresh)
+
+    increment("files_total", merged, outcome="reindexed")
+    log_event("reindex_batch", f"Merged {merged} of {len(records)} probed files", files=len(records), merged=merged)
+    return merged
@@ -0,0 +1,109 @@
+import os
+import queue
+import sqlite3
+import threading
+from pathlib import Path
+
+from src.common.configuration import get_state_folder
+from src.common.metrics import log_event
+
+EXTENSIONS = {"mkv"}
+SCAN_QUEUE_SIZE = 1024
+
+_end_of_root = object()
+
+
+def scan_roots(roots, extensions=EXTENSIONS):
+    results = queue.Queue(maxsize=SCAN_QUEUE_SIZE)
+    threads = [
+        threading.Thread(target=walk_root, args=(Path(root), extensions, results), daemon=True)
+        for root in roots
+    ]
+
+    for thread in threads:
+        thread.start()
+
+    remaining = len(threads)
+    while remaining:
+        item = results.get()
+        if item is _end_of_root:
+            remaining -= 1
+            continue
+        yield item
+
+
+def walk_root(root, extensions, results):
+    pending = [root]
+
+    try:
+        while pending:
+            directory = pending.pop()
+
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.name.startswith("."):
+                            continue
+
+                        # d_type answers this without a stat on most filesystems
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                            continue
+
+                        if os.path.splitext(entry.name)[1].lower().lstrip(".") not in extensions:
+                            continue
+
+                        try:
+                            stat = entry.stat(follow_symlinks=False)
+                        except FileNotFoundError:
+                            continue
+
+                        if entry.is_file(follow_symlinks=False):
+                            results.put((Path(entry.path), stat.st_size, stat.st_mtime_ns))
+            except (FileNotFoundError, PermissionError) as e:
+                log_event("scan_failed", f"Unable to scan {directory}. {str(e)}", directory=str(directory), error=str(e))
+    finally:
+        results.put(_end_of_root)
+
+
+def get_connection():
+    connection = sqlite3.connect(get_state_folder() / "scan_record.db")
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS seen_file (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL
+        )
+    """)
+    return connection
+
+
+def load_seen_files():
+    connection = get_connection()
+    try:
+        rows = connection.execute("SELECT path, size, mtime_ns FROM seen_file").fetchall()
+    finally:
+        connection.close()
+
+    return {path: (size, mtime_ns) for path, size, mtime_ns in rows}
+
+
+def record_seen_files(entries, scanned_roots, scanned_paths):
+    prefixes = tuple(os.path.join(str(root), "") for root in scanned_roots)
+    connection = get_connection()
+
+    try:
+        with connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO seen_file (path, size, mtime_ns) VALUES (?, ?, ?)",
+                [(str(path), size, mtime_ns) for path, size, mtime_ns in entries]
+            )
+
+            # Anything under a scanned root that was not found again has been moved or deleted
+            stale = [
+                (path,) for (path,) in connection.execute("SELECT path FROM seen_file")
+                if path.startswith(prefixes) and path not in scanned_paths
+            ]
+            connection.executemany("DELETE FROM seen_file WHERE path = ?", stale)
+    finally:
+        connection.close()
@@ -0,0 +1,187 @@
+import os
+import shutil
+import sqlite3
+import subprocess
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from src.common.configuration import (
+    get_int_configuration,
+    get_state_folder
+)
+from src.common.files import (
+    copy_file,
+    copy_file_atomically,
+    staging_path
+)
+from src.common.io_scheduler import IoScheduler
+from src.common.matroska import (
+    plan_segment_uid_injection,
+    read_segment_info,
+    write_segment_uid
+)
+from src.common.metrics import (
+    increment,
+    log_event,
+    timed
+)
+from src.processor.scanner import scan_roots
+
+SEGMENT_UID_LENGTH = 16
+
+
+class SegmentUidJournal:
+    def __init__(self, destination_folder):
+        self.destination = str(destination_folder or "")
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(get_state_folder() / "segment_uid.db", check_same_thread=False)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS fixed_file (
+                path TEXT NOT NULL,
+                destination TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                action TEXT NOT NULL,
+                PRIMARY KEY (path, destination)
+            )
+        """)
+
+    def load(self):
+        rows = self.connection.execute(
+            "SELECT path, size, mtime_ns FROM fixed_file WHERE destination = ?",
+            (self.destination,)
+        ).fetchall()
+        return {path: (size, mtime_ns) for path, size, mtime_ns in rows}
+
+    def record(self, file_path, action):
+        stat = os.stat(file_path)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO fixed_file (path, destination, size, mtime_ns, action) VALUES (?, ?, ?, ?, ?)",
+                (str(file_path), self.destination, stat.st_size, stat.st_mtime_ns, action)
+            )
+
+    def close(self):
+        self.connection.close()
+
+
+def fix_segment_uids(source_folder, destination_folder=None, inject=True, workers=None):
+    source_folder = Path(source_folder)
+    destination_folder = Path(destination_folder) if destination_folder else None
+    workers = max(1, workers or get_int_configuration("segment_uid_workers", 8))
+    scheduler = IoScheduler(get_int_configuration("segment_uid_device_concurrency", 2))
+    journal = SegmentUidJournal(destination_folder)
+    fixed_files = journal.load()
+    in_flight = threading.BoundedSemaphore(workers * 2)
+    counts = Counter()
+    counts_lock = threading.Lock()
+
+    def run(file_path, destination):
+        try:
+            action = fix_file(file_path, destination, scheduler, inject)
+            # In place the source itself changed, so that is what a resumed run compares against
+            journal.record(file_path, action)
+        except Exception as e:
+            action = "failed"
+            log_event("segment_uid_failed", f"Unable to fix the segment UID of {file_path}. {str(e)}", file=str(file_path), error=str(e))
+        finally:
+            in_flight.release()
+
+        increment("segment_uid_files_total", action=action)
+        with counts_lock:
+            counts[action] += 1
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="segment-uid") as pool:
+            for file_path, size, mtime_ns in scan_roots([source_folder]):
+                if fixed_files.get(str(file_path)) == (size, mtime_ns):
+                    counts["resumed"] += 1
+                    continue
+
+                destination = destination_folder / file_path.relative_to(source_folder) if destination_folder else None
+
+                # The walk is far ahead of the copies on a large library; keep only a few files queued
+                in_flight.acquire()
+                pool.submit(run, file_path, destination)
+    finally:
+        journal.close()
+
+    log_event(
+        "segment_uid_finished",
+        "Segment UID run finished: " + ", ".join(f"{count} {action}" for action, count in sorted(counts.items())),
+        **counts
+    )
+
+    return counts
+
+
+def fix_file(file_path, destination, scheduler, inject):
+    info = read_segment_info(file_path)
+
+    if info is None:
+        # Same as the old mkvinfo check: when the header can't be read, never rewrite the file
+        log_event("segment_info_unreadable", f"Unable to read the segment info of {file_path}", file=str(file_path))
+
+    if info is None or info["segment_uid"]:
+        if destination is None:
+            return "skipped"
+
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        # Slots are taken on the destination only; reading one shared source tree must not serialize the whole run
+        with scheduler.reserve([destination.parent], file_path.stat().st_size, destination.parent) as throttle:
+            log_event("segment_uid_copy", f"[COPY] {file_path} -> {destination} (UID present)", file=str(file_path))
+            copy_file_atomically(file_path, destination, throttle)
+        return "copied"
+
+    target = destination or file_path
+    target.parent.mkdir(parents=True, exist_ok=True)
+    writes = plan_segment_uid_injection(info, os.urandom(SEGMENT_UID_LENGTH)) if inject else None
+
+    # In place the target is the source folder; an injection writes no new bytes, a remux stages a full copy there
+    space_folder = target.parent if destination or not writes else None
+    with scheduler.reserve([target.parent], file_path.stat().st_size, space_folder) as throttle:
+        if writes:
+            log_event("segment_uid_inject", f"[INJECT] {file_path} -> {target} (no UID, written into a Void)", file=str(file_path))
+            inject_segment_uid(file_path, destination, writes, throttle)
+            return "injected"
+
+        log_event("segment_uid_remux", f"[REMUX] {file_path} -> {target} (no UID)", file=str(file_path))
+        remux_file(file_path, target)
+        return "remuxed"
+
+
+def inject_segment_uid(file_path, destination, writes, throttle=None):
+    if destination is None:
+        write_segment_uid(file_path, writes)
+        return
+
+    temp_destination = staging_path(destination)
+    try:
+        copy_file(file_path, temp_destination, throttle)
+        write_segment_uid(temp_destination, writes)
+        shutil.copystat(file_path, temp_destination)
+        os.replace(temp_destination, destination)
+    except BaseException:
+        if temp_destination.exists():
+            temp_destination.unlink()
+        raise
+
+
+def remux_file(file_path, destination):
+    # mkvmerge always writes a segment UID; the output is staged so an interrupted run never leaves half a file
+    temp_destination = staging_path(destination)
+    try:
+        with timed("tool_seconds", tool="mkvmerge"):
+            result = subprocess.run(["mkvmerge", "-o", str(temp_destination), str(file_path)], capture_output=True, text=True)
+
+        if result.returncode != 0:
+            raise RuntimeError(result.stdout or result.stderr)
+
+        increment("bytes_rewritten_total", temp_destination.stat().st_size)
+        os.replace(temp_destination, destination)
+    except BaseException:
+        if temp_destination.exists():
+            temp_destination.unlink()
+        raise
@@ -0,0 +1,280 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+
+from src.common.configuration import (
+    get_configuration,
+    get_float_configuration
+)
+from src.common.metrics import (
+    log_event,
+    set_gauge
+)
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF | IN_MOVE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+READ_SIZE = 64 * 1024
+
+
+def is_candidate(path):
+    return not path.name.startswith(".") and path.suffix.lower().lstrip(".") in {"mkv"}
+
+
+def scan_directory(folder):
+    directories, files = [], []
+
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    directories.append(Path(entry.path))
+                elif is_candidate(Path(entry.name)):
+                    files.append(Path(entry.path))
+    except FileNotFoundError:
+        pass
+
+    return directories, files
+
+
+class InotifyWatcher:
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.directories = {}
+
+    def add_tree(self, folder):
+        found = []
+        pending = [Path(folder)]
+
+        while pending:
+            directory = pending.pop()
+            watch = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+            if watch < 0:
+                error = os.strerror(ctypes.get_errno())
+                log_event("watch_failed", f"Unable to watch {directory}: {error}", folder=str(directory), error=error)
+                continue
+
+            self.directories[watch] = directory
+            directories, files = scan_directory(directory)
+            pending.extend(directories)
+            found.extend(files)
+
+        return found
+
+    def poll(self, timeout):
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return []
+
+        changed = []
+        overflowed = False
+        offset = 0
+        while offset < len(data):
+            watch, mask, _, name_length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + name_length].rstrip(b"\0")
+            offset += EVENT_HEADER.size + name_length
+
+            if mask & IN_Q_OVERFLOW:
+                overflowed = True
+                continue
+
+            directory = self.directories.get(watch)
+            if mask & IN_IGNORED:
+                self.directories.pop(watch, None)
+                continue
+            if directory is None or not name:
+                continue
+
+            path = directory / os.fsdecode(name)
+            if mask & IN_ISDIR:
+                # A whole folder (e.g. a season pack) can be moved in at once; its files never raise their own events
+                if mask & (IN_CREATE | IN_MOVED_TO) and not path.name.startswith("."):
+                    changed.extend(self.add_tree(path))
+            elif is_candidate(path):
+                changed.append(path)
+
+        if overflowed:
+            changed.extend(self.rescan())
+
+        return changed
+
+    def rescan(self):
+        # The kernel queue overflowed and dropped events, so every watched folder is listed again
+        log_event("watch_overflow", "inotify queue overflowed, rescanning watched folders", folders=len(self.directories))
+        changed = []
+        known = set(self.directories.values())
+
+        for directory in list(known):
+            directories, files = scan_directory(directory)
+            changed.extend(files)
+            for subdirectory in directories:
+                if subdirectory not in known:
+                    changed.extend(self.add_tree(subdirectory))
+
+        return changed
+
+
+class PollingWatcher:
+    def __init__(self, interval):
+        self.interval = interval
+        self.directories = {}
+
+    def add_tree(self, folder):
+        found = []
+        pending = [Path(folder)]
+
+        while pending:
+            directory = pending.pop()
+            try:
+                self.directories[directory] = os.stat(directory).st_mtime_ns
+            except FileNotFoundError:
+                continue
+
+            directories, files = scan_directory(directory)
+            pending.extend(directories)
+            found.extend(files)
+
+        return found
+
+    def poll(self, timeout):
+        time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+        changed = []
+
+        # Only folders whose entry list changed are listed again; their mtime moves whenever a file lands
+        for directory, mtime in list(self.directories.items()):
+            try:
+                current_mtime = os.stat(directory).st_mtime_ns
+            except FileNotFoundError:
+                del self.directories[directory]
+                continue
+
+            if current_mtime == mtime:
+                continue
+
+            self.directories[directory] = current_mtime
+            directories, files = scan_directory(directory)
+            changed.extend(files)
+            for subdirectory in directories:
+                if subdirectory not in self.directories:
+                    changed.extend(self.add_tree(subdirectory))
+
+        return changed
+
+
+def create_watcher(poll_seconds):
+    mode = get_configuration("watch_mode", "auto")
+
+    if mode in ("auto", "inotify") and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher()
+        except OSError as e:
+            if mode == "inotify":
+                raise
+            log_event("watcher_fallback", f"inotify unavailable, falling back to polling. {str(e)}", error=str(e))
+
+    return PollingWatcher(poll_seconds)
+
+
+def collect_settled(pending, settle_seconds):
+    now = time.monotonic()
+    settled = []
+
+    for path, state in list(pending.items()):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            del pending[path]
+            continue
+
+        signature = (stat.st_size, stat.st_mtime_ns)
+        if state is None or state[0] != signature:
+            pending[path] = (signature, now)
+        elif now - state[1] >= settle_seconds:
+            settled.append(path)
+            del pending[path]
+
+    return settled
+
+
+def read_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+
+    return stat.st_size, stat.st_mtime_ns
+
+
+def watch_folders(folders, on_ready, decisions_path):
+    settle_seconds = get_float_configuration("watch_settle_seconds", 30)
+    poll_seconds = get_float_configuration("watch_poll_seconds", 5)
+    watcher = create_watcher(poll_seconds)
+    pending = {}
+    waiting = set()
+    decisions_signature = read_signature(decisions_path)
+
+    for folder in folders:
+        for path in watcher.add_tree(folder):
+            pending[path] = None
+
+    log_event(
+        "watching",
+        f"Watching {len(watcher.directories)} folders with {type(watcher).__name__}",
+        folders=len(watcher.directories),
+        watcher=type(watcher).__name__
+    )
+
+    while True:
+        # With nothing settling or waiting there is no reason to wake up until the next event arrives
+        for path in watcher.poll(poll_seconds if pending or waiting else None):
+            pending.setdefault(path, None)
+
+        # Deferred files wait for an answer; once someone edits the decisions file they go round again
+        if waiting and read_signature(decisions_path) != decisions_signature:
+            log_event("decisions_changed", f"Decisions file changed, retrying {len(waiting)} waiting files", files=len(waiting))
+            for path in waiting:
+                pending.setdefault(path, None)
+            waiting.clear()
+
+        settled = collect_settled(pending, settle_seconds)
+        set_gauge("queue_depth", len(pending), stage="settling")
+        if not settled:
+            continue
+
+        try:
+            on_ready(sorted(settled, key=lambda f: f.name.lower()))
+        except Exception as e:
+            # A daemon outlives a failed batch; the files stay in place and are retried once they change
+            log_event("batch_failed", f"An exception occurred while processing new files. {str(e)}", error=str(e))
+
+        # Only files that left Processing are done; deferred, skipped and failed ones stay eligible.
+        # The batch itself rewrites the decisions file, so only later edits count as answers
+        waiting = {path for path in waiting.union(settled) if path.exists()}
+        decisions_signature = read_signature(decisions_path)
+        set_gauge("queue_depth", len(waiting), stage="waiting")
@@ -0,0 +1,62 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Set before any src module reads the configuration; config.env never overrides variables already set
+os.environ["ENV"] = "test"
+os.environ["DATABASE"] = "sqlite:///:memory:"
+
+
+def reset_infrastructure():
+    from src.common import configuration
+    from src.infrastructure import connection, infrastructure, reference_cache
+
+    configuration.load_configuration.cache_clear()
+    connection.get_engine.cache_clear()
+    connection.get_session_factory.cache_clear()
+    infrastructure._bootstrapped = False
+    reference_cache.clear_reference_caches()
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    from src.infrastructure.connection import get_engine
+
+    database_path = tmp_path / "media.db"
+    monkeypatch.setenv("DATABASE", f"sqlite:///{database_path}")
+    monkeypatch.setenv("STATE_FOLDER", str(tmp_path / "state"))
+
+    reset_infrastructure()
+    yield database_path
+    get_engine().dispose()
+    reset_infrastructure()
+
+
+@pytest.fixture
+def postgres_database(tmp_path, monkeypatch):
+    # Postgres-only paths run against the server named by TEST_POSTGRES_DATABASE, in a throwaway "test" schema
+    database_url = os.environ.get("TEST_POSTGRES_DATABASE")
+    if not database_url:
+        pytest.skip("TEST_POSTGRES_DATABASE is not set")
+
+    from sqlalchemy import text
+    from src.infrastructure.connection import get_engine
+
+    monkeypatch.setenv("DATABASE", database_url)
+    monkeypatch.setenv("STATE_FOLDER", str(tmp_path / "state"))
+
+    def drop_schema():
+        with get_engine().begin() as conn:
+            conn.execute(text("DROP SCHEMA IF EXISTS test CASCADE"))
+
+    reset_infrastructure()
+    drop_schema()
+    yield database_url
+    drop_schema()
+    get_engine().dispose()
+    reset_infrastructure()
@@ -0,0 +1,101 @@
+from sqlalchemy import (
+    select,
+    text
+)
+
+from src.infrastructure.bulk import format_copy_value
+
+
+def build_record(name, source_name, **media):
+    return {
+        "content_name": "Frieren",
+        "category": "Anime",
+        "source_name": source_name,
+        "media": {
+            "name": name,
+            "media_type": "Season Episode",
+            "codec": "H265",
+            "duration": 1420.5,
+            "bitrate_mode": None,
+            "overall_bitrate": None,
+            "width": 1920,
+            "height": 1080,
+            "framerate_mode": "Constant",
+            "framerate": 23.976,
+            "bitdepth": 10,
+            "file_size": 5000000000,
+            "file_extension": "mkv",
+            "fingerprint": None,
+            **media
+        },
+        "audios": [
+            {"format": "AAC", "channels": 2, "title": None, "language": "japanese"},
+            {"format": "E-AC-3", "channels": 6, "title": "", "language": "english"}
+        ],
+        "subtitles": [
+            {"title": "Signs\tSongs", "language": "portuguese", "is_forced": True},
+            {"title": None, "language": "english", "is_forced": False}
+        ]
+    }
+
+
+def test_format_copy_value_keeps_null_apart_from_empty_string():
+    assert format_copy_value(None) == "\\N"
+    assert format_copy_value("") == ""
+    assert format_copy_value("\\N") == "\\\\N"
+    assert format_copy_value("a\tb\nc\rd") == "a\\tb\\nc\\rd"
+    assert format_copy_value(23.976) == "23.976"
+
+
+def test_copy_merge_casts_values_and_keeps_nulls(postgres_database):
+    from src.infrastructure.bulk import merge_records
+    from src.infrastructure.connection import get_engine
+    from src.infrastructure.infrastructure import create_infrastructure
+    from src.infrastructure.models import (
+        Audio,
+        Media,
+        Source,
+        Subtitle
+    )
+
+    create_infrastructure()
+    engine = get_engine()
+    assert engine.dialect.driver in ("psycopg2", "psycopg")
+
+    with engine.begin() as conn:
+        source_name = conn.execute(select(Source.name).limit(1)).scalar_one()
+        records = [
+            build_record("episode 01.mkv", source_name, fingerprint="first"),
+            build_record("episode 02.mkv", source_name, overall_bitrate=8000000, bitrate_mode="Variable"),
+            build_record("episode 03.mkv", "Unknown source")
+        ]
+        assert merge_records(conn, records) == 2
+
+    with engine.connect() as conn:
+        media = {row.name: row for row in conn.execute(select(Media))}
+        assert set(media) == {"episode 01.mkv", "episode 02.mkv"}
+
+        first = media["episode 01.mkv"]
+        assert (first.framerate, first.duration, first.file_size) == (24, 1421, 5000000000)
+        assert (first.bitrate_mode, first.overall_bitrate, first.fingerprint) == (None, None, "first")
+        assert (media["episode 02.mkv"].bitrate_mode, media["episode 02.mkv"].overall_bitrate) == ("Variable", 8000000)
+
+        audios = conn.execute(
+            select(Audio.channels, Audio.title).where(Audio.media_id == first.id).order_by(Audio.channels)
+        ).all()
+        assert audios == [(2, None), (6, "")]
+
+        subtitles = conn.execute(
+            select(Subtitle.title, Subtitle.is_forced).where(Subtitle.media_id == first.id).order_by(Subtitle.language)
+        ).all()
+        assert subtitles == [(None, False), ("Signs\tSongs", True)]
+
+    # A refresh rewrites the row but keeps the fingerprint taken at ingest
+    with engine.begin() as conn:
+        refreshed = build_record("episode 01.mkv", source_name, fingerprint="edited", codec="AV1")
+        assert merge_records(conn, [refreshed], refresh=True) == 1
+
+    with engine.connect() as conn:
+        row = conn.execute(select(Media.codec, Media.fingerprint).where(Media.name == "episode 01.mkv")).one()
+        assert tuple(row) == ("AV1", "first")
+        assert conn.execute(text("SELECT count(*) FROM test.audio")).scalar_one() == 4
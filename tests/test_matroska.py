@@ -0,0 +1,86 @@
+import zlib
+
+from src.common.matroska import (
+    CLUSTER_ID,
+    CRC32_ID,
+    DOC_TYPE_ID,
+    EBML_ID,
+    INFO_ID,
+    SEGMENT_ID,
+    TIMESTAMP_SCALE_ID,
+    encode_id,
+    encode_vint,
+    encode_void,
+    plan_segment_uid_injection,
+    read_segment_info,
+    write_segment_uid
+)
+
+SEGMENT_UID = bytes(range(16))
+
+
+def element(element_id, payload, size_length=1):
+    return encode_id(element_id) + encode_vint(len(payload), size_length) + payload
+
+
+def write_matroska(path, info_children, trailing_void=0):
+    info = element(INFO_ID, b"".join(info_children))
+    segment = info + (encode_void(trailing_void) if trailing_void else b"") + element(CLUSTER_ID, bytes(32))
+    path.write_bytes(element(EBML_ID, element(DOC_TYPE_ID, b"matroska")) + element(SEGMENT_ID, segment, size_length=8))
+    return path
+
+
+def inject(path):
+    writes = plan_segment_uid_injection(read_segment_info(path), SEGMENT_UID)
+    if writes:
+        write_segment_uid(path, writes)
+    return writes
+
+
+def test_injects_into_void_inside_info(tmp_path):
+    path = write_matroska(tmp_path / "inner.mkv", [element(TIMESTAMP_SCALE_ID, b"\x0f\x42\x40"), encode_void(40)])
+    size = path.stat().st_size
+
+    assert inject(path)
+    assert read_segment_info(path)["segment_uid"] == SEGMENT_UID.hex()
+    assert path.stat().st_size == size
+
+
+def test_void_with_one_spare_byte_widens_the_uid_size(tmp_path):
+    # 20 bytes is the 19-byte UID element plus one, too short for a Void of its own
+    path = write_matroska(tmp_path / "spare.mkv", [element(TIMESTAMP_SCALE_ID, b"\x0f\x42\x40"), encode_void(20)])
+
+    assert [len(content) for _, content in inject(path)] == [20]
+    assert read_segment_info(path)["segment_uid"] == SEGMENT_UID.hex()
+
+
+def test_grows_info_into_trailing_void(tmp_path):
+    path = write_matroska(tmp_path / "trailing.mkv", [element(TIMESTAMP_SCALE_ID, b"\x0f\x42\x40")], trailing_void=64)
+    size = path.stat().st_size
+
+    assert len(inject(path)) == 2
+    info = read_segment_info(path)
+    assert info["segment_uid"] == SEGMENT_UID.hex()
+    assert info["trailing_void"][1] == 64 - 19
+    assert path.stat().st_size == size
+
+
+def test_no_room_leaves_file_untouched(tmp_path):
+    path = write_matroska(tmp_path / "full.mkv", [element(TIMESTAMP_SCALE_ID, b"\x0f\x42\x40"), encode_void(10)])
+    content = path.read_bytes()
+
+    assert inject(path) is None
+    assert path.read_bytes() == content
+
+
+def test_info_with_crc32_falls_back_to_remux(tmp_path):
+    children = element(TIMESTAMP_SCALE_ID, b"\x0f\x42\x40") + encode_void(40)
+    crc = element(CRC32_ID, zlib.crc32(children).to_bytes(4, "little"))
+    path = write_matroska(tmp_path / "crc.mkv", [crc, children], trailing_void=64)
+    content = path.read_bytes()
+
+    info = read_segment_info(path)
+    assert info["has_crc32"]
+    assert info["voids"] and info["trailing_void"]
+    assert inject(path) is None
+    assert path.read_bytes() == content
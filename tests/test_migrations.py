@@ -0,0 +1,115 @@
+import sqlite3
+import uuid
+
+from sqlalchemy import (
+    inspect,
+    text
+)
+
+BASELINE_SCHEMA = """
+    CREATE TABLE source (id CHAR(32) PRIMARY KEY, name VARCHAR NOT NULL, created_at TIMESTAMP);
+    CREATE TABLE content (id CHAR(32) PRIMARY KEY, name VARCHAR NOT NULL, category VARCHAR NOT NULL, created_at TIMESTAMP);
+    CREATE TABLE media (
+        id CHAR(32) PRIMARY KEY, source_id CHAR(32) NOT NULL REFERENCES source (id), media_type VARCHAR NOT NULL,
+        content_id CHAR(32) NOT NULL REFERENCES content (id), name VARCHAR NOT NULL, codec VARCHAR NOT NULL,
+        duration INTEGER NOT NULL, bitrate_mode VARCHAR, overall_bitrate BIGINT, width INTEGER NOT NULL,
+        height INTEGER NOT NULL, framerate_mode VARCHAR, framerate INTEGER NOT NULL, bitdepth INTEGER NOT NULL,
+        file_size BIGINT NOT NULL, file_extension VARCHAR NOT NULL, created_at TIMESTAMP
+    );
+    CREATE TABLE audio (
+        id CHAR(32) PRIMARY KEY, media_id CHAR(32) NOT NULL REFERENCES media (id), format VARCHAR NOT NULL,
+        channels INTEGER NOT NULL, title VARCHAR, language VARCHAR NOT NULL, created_at TIMESTAMP
+    );
+    CREATE TABLE subtitle (
+        id CHAR(32) PRIMARY KEY, media_id CHAR(32) NOT NULL REFERENCES media (id), title VARCHAR,
+        language VARCHAR NOT NULL, is_forced BOOLEAN NOT NULL, created_at TIMESTAMP
+    );
+"""
+
+
+def create_baseline_database(database_path):
+    # The schema lives in the attached <db>_<schema>.db file, shaped as the code before versioned migrations left it
+    schema_path = database_path.with_name(f"{database_path.stem}_test.db")
+    source_id, content_id, media_id = (uuid.uuid4().hex for _ in range(3))
+
+    with sqlite3.connect(schema_path) as conn:
+        conn.executescript(BASELINE_SCHEMA)
+        conn.execute("INSERT INTO source (id, name) VALUES (?, 'SubsPlease')", (source_id,))
+        conn.execute("INSERT INTO content (id, name, category) VALUES (?, 'Frieren', 'Anime')", (content_id,))
+        conn.execute(
+            "INSERT INTO media (id, source_id, media_type, content_id, name, codec, duration, width, height, framerate, "
+            "bitdepth, file_size, file_extension) VALUES (?, ?, 'Season Episode', ?, 'episode.mkv', 'H265', 1420, "
+            "1920, 1080, 24, 10, 1000, 'mkv')",
+            (media_id, source_id, content_id)
+        )
+        conn.execute(
+            "INSERT INTO subtitle (id, media_id, title, language, is_forced) VALUES (?, ?, 'Portuguese', 'portuguese', 0)",
+            (uuid.uuid4().hex, media_id)
+        )
+
+
+def test_upgrade_from_baseline_schema(database):
+    from src.infrastructure.connection import get_engine
+    from src.infrastructure.infrastructure import (
+        SCHEMA_VERSION,
+        create_infrastructure,
+        load_schema_state
+    )
+
+    create_baseline_database(database)
+    create_infrastructure()
+
+    assert load_schema_state().schema_version == SCHEMA_VERSION
+
+    with get_engine().connect() as conn:
+        inspector = inspect(conn)
+        assert "fingerprint" in {column["name"] for column in inspector.get_columns("media", schema="test")}
+
+        indexes = {index["name"] for index in inspector.get_indexes("media", schema="test")}
+        assert {"ux_media_name", "ix_media_fingerprint"} <= indexes
+
+        rollup = conn.execute(text("SELECT category, codec, media_count, total_size FROM test.media_rollup")).all()
+        assert rollup == [("Anime", "H265", 1, 1000)]
+        assert conn.execute(text("SELECT media_count FROM test.content_subtitle_rollup")).scalar_one() == 1
+
+
+def test_fresh_schema_matches_models(database):
+    from src.infrastructure.connection import get_engine
+    from src.infrastructure.infrastructure import create_infrastructure
+    from src.infrastructure.models import ALL_MODELS
+
+    create_infrastructure()
+
+    with get_engine().connect() as conn:
+        inspector = inspect(conn)
+        for model in ALL_MODELS:
+            table = model.__table__
+            columns = {column["name"] for column in inspector.get_columns(table.name, schema="test")}
+            indexes = {index["name"] for index in inspector.get_indexes(table.name, schema="test")}
+
+            assert columns == set(table.columns.keys()), table.name
+            assert {index.name for index in table.indexes} <= indexes, table.name
+
+
+def test_upgrade_merges_duplicate_names(database):
+    from src.infrastructure.connection import get_engine
+    from src.infrastructure.infrastructure import create_infrastructure
+
+    create_baseline_database(database)
+    schema_path = database.with_name(f"{database.stem}_test.db")
+    with sqlite3.connect(schema_path) as conn:
+        (content_id,) = conn.execute("SELECT id FROM content").fetchone()
+        duplicate_id = uuid.uuid4().hex
+        conn.execute("INSERT INTO source (id, name, created_at) VALUES (?, 'SubsPlease', '2999-01-01')", (duplicate_id,))
+        conn.execute(
+            "INSERT INTO media (id, source_id, media_type, content_id, name, codec, duration, width, height, framerate, "
+            "bitdepth, file_size, file_extension) VALUES (?, ?, 'Season Episode', ?, 'episode 2.mkv', 'H265', 1420, "
+            "1920, 1080, 24, 10, 1000, 'mkv')",
+            (uuid.uuid4().hex, duplicate_id, content_id)
+        )
+
+    create_infrastructure()
+
+    with get_engine().connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM test.source WHERE name = 'SubsPlease'")).scalar_one() == 1
+        assert conn.execute(text("SELECT count(DISTINCT source_id) FROM test.media")).scalar_one() == 1